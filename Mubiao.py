@@ -1,72 +1,145 @@
+import re
+
+from kuikong import Kuikong, RULES
+
+# 线性扫描可分配的寄存器；$t8、$t9 留作溢出变量和立即数的中转
+ALLOCATABLE_REGISTERS = ('$t0', '$t1', '$t2', '$t3', '$t4', '$t5', '$t6', '$t7',
+                         '$s0', '$s1', '$s2', '$s3', '$s4', '$s5', '$s6', '$s7')
+SCRATCH_REGISTERS = ('$t8', '$t9')
+ARITHMETIC_OPERATORS = ('+', '-', '*', '/', '%', '&', '|')
+TEMP_NAME = re.compile(r'T\d+')
+
+
+# 词法分析中数值单词的开头；常量折叠还会产生负数。标识符不会以这些字符开头
+CONSTANT_START = frozenset('0123456789.-')
+
+
+def is_constant(operand):
+    """四元式操作数是否为常数：按数值单词的写法判断，不看 float() 能否转换（inf、nan 是变量名）"""
+    return operand[0] in CONSTANT_START
+
+
 class Mubiao:
-    def __init__(self, quads):
+    def __init__(self, quads, allocator='linear', peephole=True, tongji=None, fuhao=None):
+        """allocator='linear' 为线性扫描寄存器分配，'memory' 为每条四元式都读写内存的原实现
+
+        peephole 为 True 时启用全部窥孔优化规则，也可以给出规则名的集合，False 时不优化。
+        tongji 为可选的 Tongji 统计对象。fuhao 为生成这些四元式时用的符号表，给出时用户变量和
+        临时变量直接取自符号表；不给出时扫描一遍四元式，按 T 加数字的名字识别临时变量。
+        """
         self.quads = quads
-        self.vars = set()
-        self._collect_vars()
+        self.allocator = allocator
+        self.tongji = tongji
+        self.kuikong = Kuikong(RULES if peephole is True else peephole or ())
+        self.fuhao = fuhao
+        if fuhao is not None:
+            self.vars = set(fuhao.variables())
+            self.temps = set(fuhao.temps())
+        else:
+            self.vars = set()
+            self.temps = set()
+            self._collect_vars()
+        # 变量名的全集：不在其中的操作数都是常数
+        self.names = self.vars | self.temps
 
     def _collect_vars(self):
+        """标签只出现在 label、goto 和条件跳转的结果位置，其余非常数的操作数都是变量"""
         for op, arg1, arg2, result in self.quads:
-            if op in ('label', 'goto'):
+            if op in ('label', 'goto', 'program'):
                 continue
-            for operand in (arg1, arg2, result):
-                if isinstance(operand, str) and operand is not None and not self._is_number(operand):
-                    # 修复逻辑：排除标签(L开头)和临时变量(T开头)
-                    if not (operand.startswith('L') or operand.startswith('T')):
+            for operand in (arg1, arg2) if op.startswith('if') else (arg1, arg2, result):
+                if operand is not None and not is_constant(operand):
+                    if TEMP_NAME.fullmatch(operand):
+                        self.temps.add(operand)
+                    else:
                         self.vars.add(operand)
 
-    def _is_number(self, s):
-        if s is None:
-            return False
-        try:
-            float(s)
-            return True
-        except (ValueError, TypeError):
-            return False
+    def _is_constant(self, s):
+        """操作数是否为常数：不是变量名的都是常数"""
+        return s is not None and s not in self.names
 
     def _gen_cond(self, cond, a, b, label):
         lines = []
         # 加载第一个操作数
-        if self._is_number(a):
+        if self._is_constant(a):
             lines.append(f'    li $t0, {a}')
         else:
             lines.append(f'    lw $t0, {a}')
 
         # 加载第二个操作数
-        if self._is_number(b):
+        if self._is_constant(b):
             lines.append(f'    li $t1, {b}')
         else:
             lines.append(f'    lw $t1, {b}')
 
+        lines.extend(self._branch(cond, '$t0', '$t1', label, '$t2'))
+        return lines
+
+    def _branch(self, cond, ra, rb, label, scratch):
+        """比较寄存器 ra、rb，条件成立时跳转到 label；scratch 存放 slt 的结果"""
+        lines = []
         # 使用基本的比较和跳转指令组合
         if cond == '>':
-            lines.append(f'    slt $t2, $t1, $t0')  # t2 = (b < a)
-            lines.append(f'    bne $t2, $zero, {label}')
+            lines.append(f'    slt {scratch}, {rb}, {ra}')  # scratch = (b < a)
+            lines.append(f'    bne {scratch}, $zero, {label}')
         elif cond == '<':
-            lines.append(f'    slt $t2, $t0, $t1')  # t2 = (a < b)
-            lines.append(f'    bne $t2, $zero, {label}')
+            lines.append(f'    slt {scratch}, {ra}, {rb}')  # scratch = (a < b)
+            lines.append(f'    bne {scratch}, $zero, {label}')
         elif cond == '>=':
-            lines.append(f'    slt $t2, $t0, $t1')  # t2 = (a < b)
-            lines.append(f'    beq $t2, $zero, {label}')  # 如果不小于则跳转
+            lines.append(f'    slt {scratch}, {ra}, {rb}')  # scratch = (a < b)
+            lines.append(f'    beq {scratch}, $zero, {label}')  # 如果不小于则跳转
         elif cond == '<=':
-            lines.append(f'    slt $t2, $t1, $t0')  # t2 = (b < a)
-            lines.append(f'    beq $t2, $zero, {label}')  # 如果不大于则跳转
+            lines.append(f'    slt {scratch}, {rb}, {ra}')  # scratch = (b < a)
+            lines.append(f'    beq {scratch}, $zero, {label}')  # 如果不大于则跳转
         elif cond == '==':
-            lines.append(f'    beq $t0, $t1, {label}')
+            lines.append(f'    beq {ra}, {rb}, {label}')
         elif cond == '!=':
-            lines.append(f'    bne $t0, $t1, {label}')
+            lines.append(f'    bne {ra}, {rb}, {label}')
         else:
             # 默认情况，使用相等比较
-            lines.append(f'    beq $t0, $t1, {label}')
+            lines.append(f'    beq {ra}, {rb}, {label}')
 
         return lines
 
+    def _arith(self, op, rd, ra, rb):
+        if op == '+':
+            return [f'    add {rd}, {ra}, {rb}']
+        elif op == '-':
+            return [f'    sub {rd}, {ra}, {rb}']
+        elif op == '*':
+            return [f'    mult {ra}, {rb}', f'    mflo {rd}']
+        elif op == '/':
+            return [f'    div {ra}, {rb}', f'    mflo {rd}']
+        elif op == '%':
+            return [f'    div {ra}, {rb}', f'    mfhi {rd}']
+        elif op == '&':
+            return [f'    and {rd}, {ra}, {rb}']
+        return [f'    or {rd}, {ra}, {rb}']
+
     def generate(self):
         """Generate the full assembly code as a string."""
+        if self.tongji is None:
+            return '\n'.join(self._generate())
+        with self.tongji.phase('mubiao'):
+            lines = self._generate()
+        self.tongji.asm(self.quads, lines)
+        return '\n'.join(lines)
+
+    def _generate(self):
+        if self.allocator == 'memory':
+            lines = self._generate_memory()
+        else:
+            lines = self._generate_linear()
+        if self.kuikong.rules:
+            lines = self.kuikong.optimize(lines)
+        return lines
+
+    def _generate_memory(self):
         lines = []
 
-        # 数据段
+        # 数据段：每个操作数都读写内存，临时变量也要有内存单元
         lines.append('.data')
-        for v in sorted(self.vars):
+        for v in sorted(self.names):
             lines.append(f'{v}: .word 0')
         lines.append('')
 
@@ -78,35 +151,25 @@ class Mubiao:
         for op, arg1, arg2, result in self.quads:
             if op == '=':
                 # 赋值操作
-                if self._is_number(arg1):
+                if self._is_constant(arg1):
                     lines.append(f'    li $t0, {arg1}')
                 else:
                     lines.append(f'    lw $t0, {arg1}')
                 lines.append(f'    sw $t0, {result}')
 
-            elif op in ('+', '-', '*', '/'):
+            elif op in ARITHMETIC_OPERATORS:
                 # 算术运算
-                if self._is_number(arg1):
+                if self._is_constant(arg1):
                     lines.append(f'    li $t0, {arg1}')
                 else:
                     lines.append(f'    lw $t0, {arg1}')
 
-                if self._is_number(arg2):
+                if self._is_constant(arg2):
                     lines.append(f'    li $t1, {arg2}')
                 else:
                     lines.append(f'    lw $t1, {arg2}')
 
-                if op == '+':
-                    lines.append('    add $t2, $t0, $t1')
-                elif op == '-':
-                    lines.append('    sub $t2, $t0, $t1')
-                elif op == '*':
-                    lines.append('    mult $t0, $t1')
-                    lines.append('    mflo $t2')
-                elif op == '/':
-                    lines.append('    div $t0, $t1')
-                    lines.append('    mflo $t2')
-
+                lines.extend(self._arith(op, '$t2', '$t0', '$t1'))
                 lines.append(f'    sw $t2, {result}')
 
             elif op == 'label':
@@ -131,7 +194,190 @@ class Mubiao:
                     lines.append('    li $v0, 10')  # 系统调用：退出程序
                     lines.append('    syscall')
 
-        return '\n'.join(lines)
+        return lines
+
+    def live_intervals(self):
+        """计算每个变量的活跃区间 {名字: [起点, 终点]}（四元式下标）
+
+        用户变量在出口处活跃，区间延伸到最后一条四元式；先读后写、或首次定值可能被前向跳转
+        跳过的用户变量从程序开头起活跃。
+        在循环头入口处活跃的变量，值会沿回边带回循环头，区间要覆盖整个循环，否则会被别的变量覆盖。
+        活跃信息取自 Liutu 的位向量数据流分析；循环按循环头的位置依次处理一遍，
+        每个循环只看在它入口活跃、区间还没有延伸到程序末尾的变量。
+        """
+        intervals = {}
+        labels = {}
+        loops = []
+        last = len(self.quads) - 1
+        for i, (op, arg1, arg2, result) in enumerate(self.quads):
+            if op == 'label':
+                labels[result] = i
+                continue
+            if op in ('goto', 'program'):
+                continue
+            for operand in (arg1, arg2):
+                if operand in self.names:
+                    if operand in intervals:
+                        intervals[operand][1] = i
+                    else:
+                        # 在定值之前就被读取，值来自内存中的初值
+                        intervals[operand] = [i, i, True]
+            if not op.startswith('if') and result is not None:
+                if result in intervals:
+                    intervals[result][1] = i
+                else:
+                    intervals[result] = [i, i, False]
+
+        # crossed[i] 为跨过下标 i 的前向跳转数：首次定值被跳过时，出口处的值可能仍是内存中的初值
+        crossed = [0] * (len(self.quads) + 1)
+        for i, (op, arg1, arg2, result) in enumerate(self.quads):
+            if op == 'goto' or op.startswith('if'):
+                target = labels.get(result, i)
+                if target <= i:
+                    loops.append((target, i))
+                elif target > i + 1:
+                    crossed[i + 1] += 1
+                    crossed[target] -= 1
+        for i in range(1, len(crossed)):
+            crossed[i] += crossed[i - 1]
+
+        for name, interval in intervals.items():
+            if name not in self.temps:
+                if interval[2] or crossed[interval[0]]:
+                    interval[0] = 0
+                interval[1] = last
+
+        # 循环按回边求出；Mubiao 被 Liutu 导入，这里用到时再导入 Liutu
+        from liutu import Liutu
+        liutu = Liutu(self.quads, self.fuhao)
+        live_in = [block_in for block_in, _ in liutu.liveness()]
+        block_at = {start: b for b, (start, _) in enumerate(liutu.blocks)}
+        names = {}
+        candidates = 0
+        for name, interval in intervals.items():
+            i = liutu.ids.get(name)
+            if i is not None and (interval[0] > 0 or interval[1] < last):
+                names[i] = name
+                candidates |= 1 << i
+        for head, tail in sorted(loops):
+            if head not in block_at:
+                continue
+            bits = live_in[block_at[head]] & candidates
+            while bits:
+                low = bits & -bits
+                bits ^= low
+                interval = intervals[names[low.bit_length() - 1]]
+                interval[0] = min(interval[0], head)
+                interval[1] = max(interval[1], tail)
+                if interval[1] == last:
+                    # 之后的循环头都不在它之前，区间已经覆盖
+                    candidates ^= low
+        return {name: (start, end) for name, (start, end, _) in intervals.items()}
+
+    def allocate_registers(self, intervals=None):
+        """线性扫描寄存器分配，返回 ({变量: 寄存器}, 溢出变量集合)
+
+        寄存器不够时溢出活跃区间结束得最晚的那个变量。
+        """
+        if intervals is None:
+            intervals = self.live_intervals()
+        intervals = sorted(intervals.items(), key=lambda item: item[1][0])
+        free = list(reversed(ALLOCATABLE_REGISTERS))
+        active = []  # (终点, 变量)，按终点排序
+        registers = {}
+        spilled = set()
+        for name, (start, end) in intervals:
+            while active and active[0][0] < start:
+                free.append(registers[active.pop(0)[1]])
+            if free:
+                registers[name] = free.pop()
+            else:
+                spill_end, spill = active[-1]
+                if spill_end > end:
+                    registers[name] = registers.pop(spill)
+                    spilled.add(spill)
+                    active.pop()
+                else:
+                    spilled.add(name)
+                    continue
+            position = len(active)
+            while position and active[position - 1][0] > end:
+                position -= 1
+            active.insert(position, (end, name))
+        return registers, spilled
+
+    def _generate_linear(self):
+        intervals = self.live_intervals()
+        registers, spilled = self.allocate_registers(intervals)
+        # 溢出的变量和出口处活跃的用户变量才需要内存单元
+        memory = sorted(spilled | {name for name in registers if name not in self.temps})
+        scratch1, scratch2 = SCRATCH_REGISTERS
+
+        def source(operand, scratch):
+            """把操作数放进寄存器，返回寄存器名"""
+            if operand in registers:
+                return registers[operand]
+            if self._is_constant(operand):
+                lines.append(f'    li {scratch}, {operand}')
+            else:
+                lines.append(f'    lw {scratch}, {operand}')
+            return scratch
+
+        lines = ['.data']
+        for v in memory:
+            lines.append(f'{v}: .word 0')
+        lines.append('')
+        lines.append('.text')
+        lines.append('.globl main')
+        lines.append('main:')
+
+        # 先读后写（或首次定值可能被跳过）的用户变量在开头从内存装入寄存器
+        for name in sorted(registers):
+            if intervals[name][0] == 0 and name not in self.temps:
+                lines.append(f'    lw {registers[name]}, {name}')
+
+        for op, arg1, arg2, result in self.quads:
+            if op == '=':
+                if result in registers:
+                    rd = registers[result]
+                    if arg1 in registers:
+                        if registers[arg1] != rd:
+                            lines.append(f'    move {rd}, {registers[arg1]}')
+                    elif self._is_constant(arg1):
+                        lines.append(f'    li {rd}, {arg1}')
+                    else:
+                        lines.append(f'    lw {rd}, {arg1}')
+                else:
+                    lines.append(f'    sw {source(arg1, scratch1)}, {result}')
+
+            elif op in ARITHMETIC_OPERATORS:
+                ra = source(arg1, scratch1)
+                rb = source(arg2, scratch2)
+                rd = registers.get(result, scratch1)
+                lines.extend(self._arith(op, rd, ra, rb))
+                if result not in registers:
+                    lines.append(f'    sw {rd}, {result}')
+
+            elif op == 'label':
+                lines.append(f'{result}:')
+
+            elif op == 'goto':
+                lines.append(f'    j {result}')
+
+            elif op.startswith('if'):
+                ra = source(arg1, scratch1)
+                rb = source(arg2, scratch2)
+                lines.extend(self._branch(op[2:], ra, rb, result, scratch1))
+
+            elif op == 'program' and result == 'end':
+                # 寄存器中的用户变量在出口处写回内存
+                for name in sorted(registers):
+                    if name not in self.temps:
+                        lines.append(f'    sw {registers[name]}, {name}')
+                lines.append('    li $v0, 10')
+                lines.append('    syscall')
+
+        return lines
 
 
 # 测试代码
@@ -140,7 +386,7 @@ if __name__ == '__main__':
     test_quads = [
         ('program', None, None, 'start'),
         ('=', '5', None, 'a'),
-        ('>', 'a', '0', 'L1'),
+        ('if>', 'a', '0', 'L1'),
         ('goto', None, None, 'L2'),
         ('label', None, None, 'L1'),
         ('+', 'a', '1', 'T1'),
@@ -157,3 +403,44 @@ if __name__ == '__main__':
     asm_code = mubiao.generate()
     print("生成的MIPS汇编代码：")
     print(asm_code)
+
+    from moni import Moni
+
+    print("\n分配方式\t动态指令数\t访存次数\t周期数\t最终内存")
+    for allocator in ('memory', 'linear'):
+        moni = Moni(Mubiao(test_quads, allocator).generate())
+        memory = moni.run()
+        print(f"{allocator}\t\t{moni.instructions}\t\t{moni.memory_accesses}\t\t{moni.cycles}\t{memory}")
+
+    # 循环前定值、循环内使用的临时变量：区间要覆盖整个循环，寄存器不能在回边之前让给 T3
+    carried = [('program', None, None, 'start'), ('=', '5', None, 'a'), ('+', 'a', '1', 'T1'),
+               ('label', None, None, 'L1'), ('+', 'T1', 'y', 'T2'), ('=', 'T2', None, 'y'),
+               ('*', 'y', '2', 'T3'), ('=', 'T3', None, 'z'), ('if<', 'y', '100', 'L1'),
+               ('program', None, None, 'end')]
+    assert Moni(Mubiao(carried, 'linear').generate()).run()['y'] == 102
+
+    # 随机程序：两种分配方式的用户变量终值相同
+    import random
+    import time
+    from moni import run
+    from zhongjian import Zhongjian, random_program
+    from yufa import Yufa
+    from cifa import Cifa
+
+    random.seed(9)
+    for _ in range(300):
+        quads = Zhongjian().generate(Yufa().parse(Cifa().cifafenxi(random_program(random))))
+        memory = run(Mubiao(quads, 'memory').generate())[2]
+        linear = run(Mubiao(quads, 'linear').generate())[2]
+        assert all(linear.get(name, 0) == value for name, value in memory.items() if not TEMP_NAME.fullmatch(name)), quads
+    print("\n300 个随机程序两种分配方式的执行结果一致")
+
+    # 规模：许多前后相接的小循环，活跃区间的计算应与循环数成线性关系
+    print("\n循环数\t四元式数\t耗时(ms)")
+    for n in (500, 1000, 2000, 4000):
+        source = 'main() {\n' + ''.join(f'i{k} = 0; while (i{k} < 3) {{ s = s + i{k}; i{k} = i{k} + 1; }}\n'
+                                        for k in range(n)) + '}\n'
+        quads = Zhongjian().generate(Yufa().parse(Cifa().cifafenxi(source)))
+        start = time.perf_counter()
+        Mubiao(quads).generate()
+        print(f"{n}\t{len(quads)}\t\t{(time.perf_counter() - start) * 1000:.0f}")
@@ -0,0 +1,168 @@
+"""命令行编译器：不依赖 PyQt5 和 pandas，可在脚本和 CI 中使用
+
+    python bianyi.py test.c                      MIPS 汇编输出到标准输出
+    python bianyi.py a.c b.c -d out              每个文件生成 out/a.s、out/b.s
+    python bianyi.py test.c --emit tokens        单词序列（JSON）
+    python bianyi.py test.c --emit ast -o t.json 语法树（JSON）
+    python bianyi.py test.c --stats stats.json   导出各阶段统计
+    python bianyi.py test.c --table tokens.csv   单词表（需要 pandas，.xlsx 还需要 openpyxl）
+    python bianyi.py test.c --no-cache           不使用磁盘缓存（默认缓存在 huancun.DEFAULT_DIRECTORY）
+    python bianyi.py --gui                       启动图形界面（需要 PyQt5）
+
+有词法、语法或语义错误时错误信息以“文件:行:列: 说明”的形式写到标准错误，退出码为1；
+未声明变量等警告以“文件:行: 警告：说明”的形式写到标准错误，不影响退出码。
+"""
+import argparse
+import json
+import os
+import sys
+
+from cifa import Cifa
+from yufa import Yufa
+from yuyi import Yuyi
+from hangbiao import Hangbiao, Zhenduan
+from tongji import Tongji
+from huancun import Huancun, DEFAULT_DIRECTORY, cached_bianyi
+
+EMITS = ('asm', 'quads', 'ast', 'tokens')
+SUFFIXES = {'asm': '.s', 'quads': '.quads.json', 'ast': '.ast.json', 'tokens': '.tokens.json'}
+
+
+def lex_errors(tokens):
+    """单词序列中的非法单词，说明用单词自己的类型：非法字符、非法数字、非法浮点数、未闭合的引号等"""
+    return [Zhenduan(tokens.line(i), f"{tokens[i][1]} {tokens[i][2]}", *tokens.span(i))
+            for i, code in enumerate(tokens.codes) if code == 0]
+
+
+def compile_source(source, emit='asm', tongji=None, huancun=None):
+    """编译一段源程序到 emit 指定的阶段，返回 (输出文本, 错误列表, 警告列表)；huancun 为可选的磁盘缓存
+
+    无论 emit 是什么，错误列表都先列出词法错误，再列出语法、语义错误。
+    """
+    if emit in ('tokens', 'ast'):
+        def lex():
+            return Cifa(tongji=tongji).cifafenxi_buffer(source)
+        tokens = huancun.lookup('cifa', source, lex) if huancun else lex()
+        if emit == 'tokens':
+            return json.dumps([list(token) for token in tokens], ensure_ascii=False, indent=1), lex_errors(tokens), []
+
+        def parse():
+            return Yufa(tongji=tongji).parse(tokens)
+        ast = huancun.lookup('yufa', source, parse) if huancun else parse()
+        errors = list(ast.errors)
+        warnings = []
+        if not errors:
+            # 语义分析不改动语法树，缓存中的语法树也可以直接分析
+            yuyi = Yuyi(tongji=tongji)
+            errors = yuyi.check(ast)
+            warnings = yuyi.warnings
+        return json.dumps(ast.to_dict(), ensure_ascii=False, indent=1), lex_errors(tokens) + errors, warnings
+    result = cached_bianyi(source, huancun, tongji)
+    errors = lex_errors(result['tokens']) + result['errors']
+    if emit == 'quads':
+        return json.dumps(result['quads'], ensure_ascii=False, indent=1), errors, result['warnings']
+    return result['asm'], errors, result['warnings']
+
+
+def format_error(path, error, hangbiao, kind=''):
+    """带位置的诊断写成 文件:行:列: 说明，便于编辑器跳转；只有行号的写成 文件:行: 说明，其余照原样输出
+
+    kind 为说明前的类别，如“警告：”。
+    """
+    if isinstance(error, Zhenduan):
+        if error.start is not None:
+            line, column = hangbiao.position(error.start)
+            return f"{path}:{line}:{column}: {kind}{error.message}"
+        return f"{path}:{error.line}: {kind}{error.message}"
+    return f"{path}: {kind}{error}"
+
+
+def write_table(tokens, path):
+    """用 pandas 导出单词表，只有要求导出表格时才导入 pandas"""
+    import pandas as pd
+    df = pd.DataFrame([list(token) for token in tokens], columns=['种别码', '类型', '值', '行数'])
+    if path.endswith(('.xlsx', '.xls')):
+        df.to_excel(path, index=False)
+    else:
+        df.to_csv(path, index=False)
+
+
+def _read(path):
+    if path == '-':
+        return sys.stdin.read()
+    with open(path, encoding='utf-8') as f:
+        return f.read()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='bianyi', description="小小编译器命令行：词法、语法分析，生成四元式和 MIPS 汇编")
+    parser.add_argument('files', nargs='*', help="源文件，- 表示标准输入")
+    parser.add_argument('--emit', choices=EMITS, default='asm', help="输出内容（默认 %(default)s）")
+    parser.add_argument('-o', '--output', help="输出文件，只能有一个源文件")
+    parser.add_argument('-d', '--outdir', help="输出目录，每个源文件生成一个同名文件")
+    parser.add_argument('--stats', metavar='PATH', help="把各文件各阶段的统计写成 JSON")
+    parser.add_argument('--table', metavar='PATH', help="把单词表导出为 CSV 或 Excel（需要 pandas），只能有一个源文件")
+    parser.add_argument('--no-cache', action='store_true', help="不使用磁盘缓存")
+    parser.add_argument('--cache-dir', default=DEFAULT_DIRECTORY, help="缓存目录（默认 %(default)s）")
+    parser.add_argument('--gui', action='store_true', help="启动图形界面")
+    args = parser.parse_args(argv)
+
+    if args.gui:
+        import main as gui
+        return gui.main()
+    if not args.files:
+        parser.error("没有给出源文件")
+    if (args.output or args.table) and len(args.files) > 1:
+        parser.error("-o 和 --table 只能用于一个源文件")
+
+    huancun = None if args.no_cache else Huancun(args.cache_dir)
+    stats = {}
+    failed = False
+    for path in args.files:
+        try:
+            source = _read(path)
+        except OSError as e:
+            print(f"{path}: 无法读取：{e.strerror}", file=sys.stderr)
+            failed = True
+            continue
+        tongji = Tongji() if args.stats else None
+        output, errors, warnings = compile_source(source, args.emit, tongji, huancun)
+        hangbiao = Hangbiao(source) if errors else None
+        for error in errors:
+            print(format_error(path, error, hangbiao), file=sys.stderr)
+        for warning in warnings:
+            print(format_error(path, warning, hangbiao, '警告：'), file=sys.stderr)
+        failed = failed or bool(errors)
+        if tongji is not None:
+            stats[path] = tongji.to_dict()
+        if args.table:
+            write_table(Cifa().cifafenxi(source), args.table)
+        # 有错误时不生成代码，也不留下空的输出文件；单词和语法树仍然输出
+        if errors and args.emit in ('asm', 'quads'):
+            continue
+
+        if args.output:
+            target = args.output
+        elif args.outdir:
+            os.makedirs(args.outdir, exist_ok=True)
+            name = 'stdin' if path == '-' else os.path.splitext(os.path.basename(path))[0]
+            target = os.path.join(args.outdir, name + SUFFIXES[args.emit])
+        else:
+            target = '-'
+        if target == '-':
+            if len(args.files) > 1:
+                print(f"# {path}")
+            print(output)
+        else:
+            with open(target, 'w', encoding='utf-8') as f:
+                f.write(output + '\n')
+
+    if args.stats:
+        with open(args.stats, 'w', encoding='utf-8') as f:
+            json.dump({'files': stats, 'huancun': huancun.stats() if huancun else None},
+                      f, ensure_ascii=False, indent=2)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
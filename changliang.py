@@ -0,0 +1,459 @@
+from Mubiao import ARITHMETIC_OPERATORS
+from liutu import Liutu
+
+# 折叠结果须在 32 位有符号整数范围内，否则留到运行时计算
+INT_MIN = -2 ** 31
+INT_MAX = 2 ** 31 - 1
+
+COMPARE = {
+    '>': lambda a, b: a > b,
+    '<': lambda a, b: a < b,
+    '>=': lambda a, b: a >= b,
+    '<=': lambda a, b: a <= b,
+    '==': lambda a, b: a == b,
+    '!=': lambda a, b: a != b,
+}
+
+
+def fold(op, a, b):
+    """按 MIPS 整数运算的语义计算 a op b，不能在编译时确定时返回 None"""
+    if op == '+':
+        value = a + b
+    elif op == '-':
+        value = a - b
+    elif op == '*':
+        value = a * b
+    elif op in ('/', '%'):
+        if b == 0:
+            # 除以零保持原样，由运行时处理
+            return None
+        # div 向零取整，余数与被除数同号
+        quotient = abs(a) // abs(b)
+        if (a < 0) != (b < 0):
+            quotient = -quotient
+        value = quotient if op == '/' else a - b * quotient
+    elif op == '&':
+        value = a & b
+    elif op == '|':
+        value = a | b
+    else:
+        return None
+    if INT_MIN <= value <= INT_MAX:
+        return value
+    return None
+
+
+def literal(operand):
+    """整数字面量的值；变量、浮点数返回 None"""
+    if operand is None:
+        return None
+    try:
+        return int(operand)
+    except ValueError:
+        return None
+
+
+# 格值：TOP 表示尚未确定（还没有可执行的定值），BOTTOM 表示不是常量，其余为整数常量
+TOP = 'top'
+BOTTOM = 'bottom'
+
+
+def meet(a, b):
+    if a == TOP:
+        return b
+    if b == TOP or a == b:
+        return a
+    return BOTTOM
+
+
+class Changliang:
+    """四元式上的稀疏条件常量传播（Wegman-Zadeck）
+
+    先把四元式转换成 SSA 形式：用 Liutu 的控制流图求支配树和支配边界，在支配边界上为
+    跨基本块的变量插入 φ 结点，再沿支配树重命名，每个定值得到一个版本号。然后用两个
+    工作表求不动点：控制流边表只沿可执行的边推进，分支条件能在编译时确定时只有走到的
+    那条边可执行；SSA 边表把值的变化沿定值-使用链传给使用它的四元式和 φ 结点。每个
+    版本只会从 TOP 降到常量再降到 BOTTOM，所以总工作量与定值-使用边数成正比。
+    用户变量在入口处的值来自内存，视为 BOTTOM。
+
+    optimize() 用求得的常量改写原来的四元式（并不输出 SSA 形式）：折叠算术运算、把常量
+    操作数替换为字面量、把结果确定的条件跳转改成 goto 或删除，并删除不可执行的基本块。
+    除以零和超出 32 位的结果不折叠。
+    """
+
+    def __init__(self, quads, fuhao=None):
+        # fuhao: 可选的符号表，交给 Liutu 确定变量编号
+        self.quads = list(quads)
+        self.liutu = Liutu(self.quads, fuhao)
+        self.folded = 0
+        self.branches_resolved = 0
+        self.removed_unreachable = 0
+        self._to_ssa()
+
+    def _to_ssa(self):
+        liutu = self.liutu
+        quads = self.quads
+        count = len(liutu.blocks)
+        # 去掉重复的边（条件跳转的目标恰好是下一个基本块）
+        self.cfg = [list(dict.fromkeys(successors)) for successors in liutu.successors]
+        self.predecessors = [[] for _ in range(count)]
+        for b in range(count):
+            for s in self.cfg[b]:
+                self.predecessors[s].append(b)
+
+        # 逆后序编号
+        order = []
+        seen = [False] * count
+        if count:
+            seen[0] = True
+            stack = [(0, iter(self.cfg[0]))]
+            while stack:
+                b, successors = stack[-1]
+                for s in successors:
+                    if not seen[s]:
+                        seen[s] = True
+                        stack.append((s, iter(self.cfg[s])))
+                        break
+                else:
+                    order.append(b)
+                    stack.pop()
+        order.reverse()
+        rpo = {b: i for i, b in enumerate(order)}
+
+        # 支配树（Cooper-Harvey-Kennedy 迭代算法）
+        idom = {order[0]: order[0]} if order else {}
+        changed = True
+        while changed:
+            changed = False
+            for b in order[1:]:
+                new = None
+                for p in self.predecessors[b]:
+                    if p not in idom:
+                        continue
+                    if new is None:
+                        new = p
+                        continue
+                    x, y = p, new
+                    while x != y:
+                        while rpo[x] > rpo[y]:
+                            x = idom[x]
+                        while rpo[y] > rpo[x]:
+                            y = idom[y]
+                    new = x
+                if idom.get(b) != new:
+                    idom[b] = new
+                    changed = True
+
+        # 支配边界
+        frontier = {b: set() for b in order}
+        for b in order:
+            reachable_preds = [p for p in self.predecessors[b] if p in idom]
+            if len(reachable_preds) >= 2:
+                for p in reachable_preds:
+                    runner = p
+                    while runner != idom[b]:
+                        frontier[runner].add(b)
+                        runner = idom[runner]
+
+        # 每个变量的定值基本块；在某个基本块中先用后定值的变量才需要 φ 结点
+        ids = liutu.ids
+        names = [None] * len(ids)
+        for name, i in ids.items():
+            names[i] = name
+        def_blocks = [set() for _ in names]
+        global_names = set()
+        for b in order:
+            start, end = liutu.blocks[b]
+            defined = set()
+            for i in range(start, end):
+                op, arg1, arg2, result = quads[i]
+                if op in ('label', 'goto', 'program'):
+                    continue
+                for operand in (arg1, arg2):
+                    if operand in ids and ids[operand] not in defined:
+                        global_names.add(ids[operand])
+                if op == '=' or op in ARITHMETIC_OPERATORS:
+                    defined.add(ids[result])
+                    def_blocks[ids[result]].add(b)
+
+        # φ 结点：每项为 [变量, 目标版本, {前驱: 参数版本}]
+        self.phis = {b: [] for b in order}
+        for var in global_names:
+            work = list(def_blocks[var])
+            placed = set()
+            while work:
+                for f in frontier[work.pop()]:
+                    if f not in placed and f != order[0]:
+                        placed.add(f)
+                        self.phis[f].append([var, None, {}])
+                        if f not in def_blocks[var]:
+                            work.append(f)
+
+        # 沿支配树重命名；版本 0..len(names)-1 为各变量在入口处的初值
+        children = {b: [] for b in order}
+        for b in order[1:]:
+            children[idom[b]].append(b)
+        self.values = [BOTTOM] * len(names)
+        self.uses = [[] for _ in names]        # 版本 -> 使用它的四元式下标或 φ 结点
+        self.def_version = {}                   # 四元式下标 -> 定值版本
+        self.use_versions = {}                  # 四元式下标 -> (arg1 版本, arg2 版本)
+        self.phi_of = {}                        # φ 目标版本 -> (基本块, φ 结点)
+        stacks = [[v] for v in range(len(names))]
+
+        def new_version(var):
+            v = len(self.values)
+            self.values.append(TOP)
+            self.uses.append([])
+            stacks[var].append(v)
+            return v
+
+        pushed = {}
+        work = [(order[0], False)] if order else []
+        while work:
+            b, leaving = work.pop()
+            if leaving:
+                for var in pushed[b]:
+                    stacks[var].pop()
+                continue
+            pushed_here = []
+            for phi in self.phis[b]:
+                phi[1] = new_version(phi[0])
+                self.phi_of[phi[1]] = (b, phi)
+                pushed_here.append(phi[0])
+            start, end = liutu.blocks[b]
+            for i in range(start, end):
+                op, arg1, arg2, result = quads[i]
+                if op in ('label', 'goto', 'program'):
+                    continue
+                versions = tuple(stacks[ids[operand]][-1] if operand in ids else None for operand in (arg1, arg2))
+                self.use_versions[i] = versions
+                for v in versions:
+                    if v is not None:
+                        self.uses[v].append(i)
+                if op == '=' or op in ARITHMETIC_OPERATORS:
+                    self.def_version[i] = new_version(ids[result])
+                    pushed_here.append(ids[result])
+            for s in self.cfg[b]:
+                for phi in self.phis.get(s, ()):
+                    v = stacks[phi[0]][-1]
+                    phi[2][b] = v
+                    self.uses[v].append(phi)
+            pushed[b] = pushed_here
+            work.append((b, True))
+            work.extend((c, False) for c in children[b])
+        self.block_of_quad = {}
+        for b, (start, end) in enumerate(liutu.blocks):
+            for i in range(start, end):
+                self.block_of_quad[i] = b
+
+    def _operand(self, operand, version):
+        if version is not None:
+            return self.values[version]
+        value = literal(operand)
+        return BOTTOM if value is None else value
+
+    def _evaluate(self, i):
+        """重新计算四元式 i，返回分支结果：None 表示不是条件跳转或尚未确定，否则为后继列表"""
+        op, arg1, arg2, result = self.quads[i]
+        v1, v2 = self.use_versions[i]
+        a = self._operand(arg1, v1)
+        if op == '=':
+            self._set(self.def_version[i], a)
+            return None
+        b = self._operand(arg2, v2)
+        if op in ARITHMETIC_OPERATORS:
+            if a == TOP or b == TOP:
+                return None
+            if a == BOTTOM or b == BOTTOM:
+                value = BOTTOM
+            else:
+                value = fold(op, a, b)
+                if value is None:
+                    value = BOTTOM
+            self._set(self.def_version[i], value)
+        return None
+
+    def _set(self, version, value):
+        """格值只会下降；变化时把这个版本放进 SSA 边工作表"""
+        old = self.values[version]
+        new = meet(old, value)
+        if new != old:
+            self.values[version] = new
+            self.ssa_work.append(version)
+
+    def _branch_targets(self, b):
+        """基本块 b 末尾跳转当前可确定的可执行后继"""
+        start, end = self.liutu.blocks[b]
+        op, arg1, arg2, result = self.quads[end - 1]
+        if not op.startswith('if') or op[2:] not in COMPARE:
+            return self.cfg[b]
+        v1, v2 = self.use_versions[end - 1]
+        a = self._operand(arg1, v1)
+        c = self._operand(arg2, v2)
+        if a == TOP or c == TOP:
+            return []
+        if a == BOTTOM or c == BOTTOM:
+            return self.cfg[b]
+        if COMPARE[op[2:]](a, c):
+            return [self.liutu.label_blocks[result]]
+        return [b + 1] if b + 1 < len(self.liutu.blocks) else []
+
+    def _evaluate_phi(self, b, phi):
+        value = TOP
+        for p, v in phi[2].items():
+            if (p, b) in self.executable_edges:
+                value = meet(value, self.values[v])
+        self._set(phi[1], value)
+
+    def solve(self):
+        """求不动点，返回可执行基本块集合"""
+        blocks = self.liutu.blocks
+        self.executable_edges = set()
+        executable = set()
+        self.ssa_work = []
+        flow_work = [(None, 0)] if blocks else []
+        while flow_work or self.ssa_work:
+            while flow_work:
+                edge = flow_work.pop()
+                if edge in self.executable_edges:
+                    continue
+                self.executable_edges.add(edge)
+                b = edge[1]
+                for phi in self.phis.get(b, ()):
+                    self._evaluate_phi(b, phi)
+                if b in executable:
+                    continue
+                executable.add(b)
+                start, end = blocks[b]
+                for i in range(start, end):
+                    if i in self.def_version:
+                        self._evaluate(i)
+                flow_work.extend((b, s) for s in self._branch_targets(b))
+            while self.ssa_work and not flow_work:
+                version = self.ssa_work.pop()
+                for use in self.uses[version]:
+                    if isinstance(use, list):
+                        b = self.phi_of[use[1]][0]
+                        if b in executable:
+                            self._evaluate_phi(b, use)
+                        continue
+                    b = self.block_of_quad[use]
+                    if b not in executable:
+                        continue
+                    if use in self.def_version:
+                        self._evaluate(use)
+                    else:
+                        flow_work.extend((b, s) for s in self._branch_targets(b))
+        return executable
+
+    def optimize(self):
+        """返回常量传播、折叠后的四元式列表"""
+        executable = self.solve()
+        quads = []
+        for b, (start, end) in enumerate(self.liutu.blocks):
+            if b not in executable:
+                for quad in self.quads[start:end]:
+                    # 程序开始、结束标记始终保留
+                    if quad[0] == 'program':
+                        quads.append(quad)
+                    else:
+                        self.removed_unreachable += 1
+                continue
+            for i in range(start, end):
+                quad = self.quads[i]
+                op, arg1, arg2, result = quad
+                if i not in self.use_versions:
+                    quads.append(quad)
+                    continue
+                v1, v2 = self.use_versions[i]
+                a = self._operand(arg1, v1)
+                c = self._operand(arg2, v2)
+                if i in self.def_version:
+                    value = self.values[self.def_version[i]]
+                    if value not in (TOP, BOTTOM):
+                        if op != '=' or arg1 != str(value):
+                            self.folded += 1
+                        quads.append(('=', str(value), None, result))
+                        continue
+                elif a not in (TOP, BOTTOM) and c not in (TOP, BOTTOM) and op[2:] in COMPARE:
+                    self.branches_resolved += 1
+                    if COMPARE[op[2:]](a, c):
+                        quads.append(('goto', None, None, result))
+                    continue
+                # 已知为常量的操作数换成字面量
+                if a not in (TOP, BOTTOM):
+                    arg1 = str(a)
+                if arg2 is not None and c not in (TOP, BOTTOM):
+                    arg2 = str(c)
+                quads.append((op, arg1, arg2, result))
+        return quads
+
+
+# 测试代码
+if __name__ == '__main__':
+    import random
+    from cifa import Cifa
+    from yufa import Yufa
+    from zhongjian import Zhongjian, random_program
+    from Mubiao import Mubiao
+    from moni import run
+
+    def compile_quads(source):
+        ast = Yufa().parse(Cifa().cifafenxi(source))
+        assert not ast.errors, ast.errors
+        return Zhongjian().generate(ast)
+
+    def instructions(asm):
+        return sum(1 for line in asm.splitlines() if line.startswith('    '))
+
+    source = '''
+    main() {
+        a = 5;
+        b = a * 4 - 2;
+        if (b > 10) {
+            c = b / 2;
+        } else {
+            c = 0;
+        }
+        i = 0;
+        while (i < 3) {
+            d = a + c;
+            i = i + 1;
+        }
+        e = b / (a - 5);
+    }
+    '''
+    quads = compile_quads(source)
+    changliang = Changliang(quads)
+    optimized = changliang.optimize()
+    print(f"折叠 {changliang.folded} 处，确定分支 {changliang.branches_resolved} 个，"
+          f"删除不可执行四元式 {changliang.removed_unreachable} 条：")
+    for quad in Liutu(optimized).optimize():
+        print(quad)
+
+    # 等价性检查
+    random.seed(12)
+    for _ in range(300):
+        quads = compile_quads(random_program(random))
+        optimized = Liutu(Changliang(quads).optimize()).optimize()
+        _, _, memory = run(Mubiao(quads).generate())
+        _, _, memory2 = run(Mubiao(optimized).generate())
+        assert all(memory.get(name, 0) == memory2.get(name, 0) for name in memory.keys() | memory2.keys()), quads
+    print("\n300 个随机程序常量传播前后执行结果一致")
+
+    # test2.c 中正确的表达式，以及算术密集的输入
+    with open('test2.c', encoding='utf-8') as f:
+        cases = [line.split('//')[0].strip().rstrip(';') for line in f if '//正确' in line and ';' in line]
+    integer_cases = [case for case in cases if '.' not in case and 'e' not in case]
+    inputs = {
+        'test2.c 表达式': 'main() { ' + ' '.join(f'r{i} = {case};' for i, case in enumerate(integer_cases)) + ' }',
+        '常量链': 'main() { a = 3; ' + ' '.join(f'a{i} = (a + {i}) * 2 - {i} % 5;' for i in range(200)) + ' }',
+        '确定的分支': 'main() { n = 4; ' + ' '.join(f'if (n * {i} > {i * 3}) {{ x = x + {i}; }} else {{ x = x - n; }}'
+                                                  for i in range(200)) + ' }',
+    }
+    print("\n输入\t\t指令数(前/后)\t动态指令数(前/后)")
+    for name, source in inputs.items():
+        quads = compile_quads(source)
+        before = Mubiao(Liutu(quads).optimize()).generate()
+        after = Mubiao(Liutu(Changliang(quads).optimize()).optimize()).generate()
+        print(f"{name}\t{instructions(before)}/{instructions(after)}\t\t{run(before)[0]}/{run(after)[0]}")
@@ -1,5 +1,266 @@
+import re
+from array import array
+from collections.abc import Sequence
+
+from hangbiao import Hangbiao
+
+# 主正则：先吞掉行内空白，再由各分支切出一类单词；可能从同一字符开始的分支按逐字符引擎的判定顺序排列
+_MASTER = re.compile(r"""
+  [^\S\n]*(?:
+    (?P<ident>[A-Za-z_]\w*)
+  | (?P<nl>\n)
+  | (?P<sep>[()\[\]{};,\\])
+  | (?P<line_comment>//[^\n]*)
+  | (?P<block_comment>/\*(?:[^*]*\*+(?:[^/*][^*]*\*+)*/|[\s\S]*(?=[\s\S]\Z)|\Z))
+  | (?P<op>[=!<>]=|[-+*/=<>!%|&])
+  | (?P<hex>0[xX][0-9a-fA-F]*)
+  | (?P<oct>0[0-9]+)
+  | (?P<num>(?=\.?[0-9])[0-9A-DF-Za-df-z_]*(?:\.[0-9A-DF-Za-df-z_]*)?(?:[eE](?=[\s\S])[+-]?[0-9A-Za-z_]*)?)
+  | (?P<str>"[^"\n]*"?)
+  | (?P<chr>'[^'\n]*'?)
+  | (?P<other>\S)
+  )
+""", re.VERBOSE)
+# 合法数字的形状（只含一个小数点和一个指数部分）
+_NUM_SHAPE = re.compile(r'[0-9]*(?:\.[0-9]*)?(?:[eE][+-]?[0-9]*)?')
+# 非ASCII字母开头的标识符
+_WORD = re.compile(r'\w*')
+
+
+
+def _strip_span(data):
+    """返回 data.strip() 在 data 中的起止位置，不复制字符串"""
+    lo, hi = 0, len(data)
+    while lo < hi and data[lo].isspace():
+        lo += 1
+    while hi > lo and data[hi - 1].isspace():
+        hi -= 1
+    return lo, hi
+
+
+def _first_line(data, lo):
+    """data[lo] 所在的行号：strip() 去掉的开头空行也计入行号"""
+    return data.count('\n', 0, lo) + 1
+
+
+def _content_end(data):
+    """返回 data.rstrip() 的长度，不复制字符串"""
+    end = len(data)
+    while end and data[end - 1].isspace():
+        end -= 1
+    return end
+
+
+class Cancelled(Exception):
+    """分析被 cancel 函数取消"""
+
+
+CANCEL_INTERVAL = 4096
+
+
+def _cancellable(tokens, cancel):
+    for count, token in enumerate(tokens):
+        if not count % CANCEL_INTERVAL and cancel():
+            raise Cancelled()
+        yield token
+
+
+class TokenBuffer(Sequence):
+    """紧凑的单词序列：种别码、类型、行号和起止位置按列存放在 array 中
+
+    单词的值是源文本的切片，在取用时才生成。按下标访问返回与 cifafenxi 相同的
+    (种别码, 类型, 值, 行号) 元组，因此可以直接交给 Yufa.parse 或界面使用。
+    span() 给出单词在源文本中的偏移，position() 经源文本的行首偏移表（hangbiao）求出行号和列号。
+    """
+    KINDS = ('关键字', '标识符', '运算符', '分隔符', '注释', '整数', '浮点数', '十六进制数', '八进制数',
+             '字符串常量', '字符常量', '非法字符', '非法数字', '非法浮点数', '非法十六进制数', '非法八进制数',
+             '非法字符常量', '未闭合的引号')
+    KIND_IDS = {kind: index for index, kind in enumerate(KINDS)}
+
+    def __init__(self, source):
+        self.source = source
+        self.codes = array('H')
+        self.kinds = array('B')
+        self.lines = array('I')
+        self.starts = array('I')
+        self.ends = array('I')
+        # 增量分析留下的位移：下标不小于 _shift_at 的单词，位置还要加 _shift_offset、行号还要加 _shift_line
+        self._shift_at = 0
+        self._shift_offset = 0
+        self._shift_line = 0
+        self._hangbiao = None
+
+    @property
+    def hangbiao(self):
+        """源文本的行首偏移表，第一次用到时建立，源文本改变（增量分析）后重建"""
+        if self._hangbiao is None or self._hangbiao.source is not self.source:
+            self._hangbiao = Hangbiao(self.source)
+        return self._hangbiao
+
+    def __getstate__(self):
+        # 行首偏移表可以随时重建，不随单词序列序列化（如写入磁盘缓存）
+        state = self.__dict__.copy()
+        state['_hangbiao'] = None
+        return state
+
+    def position(self, index):
+        """第index个单词起始处的 (行号, 列号)"""
+        return self.hangbiao.position(self.span(index)[0])
+
+    def append(self, code, kind, start, end, line):
+        self.flush()
+        self.codes.append(code)
+        self.kinds.append(self.KIND_IDS[kind])
+        self.lines.append(line)
+        self.starts.append(start)
+        self.ends.append(end)
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        start, end, line = self.starts[index], self.ends[index], self.lines[index]
+        if index >= self._shift_at:
+            start += self._shift_offset
+            end += self._shift_offset
+            line += self._shift_line
+        return self.codes[index], self.KINDS[self.kinds[index]], self.source[start:end], line
+
+    def __iter__(self):
+        self.flush()
+        source = self.source
+        kinds = self.KINDS
+        for code, kind, start, end, line in zip(self.codes, self.kinds, self.starts, self.ends, self.lines):
+            yield code, kinds[kind], source[start:end], line
+
+    def copy(self):
+        """独立的副本：各列数组整块复制，可交给其他线程做增量分析而不影响本对象"""
+        other = TokenBuffer(self.source)
+        other.codes, other.kinds, other.lines = self.codes[:], self.kinds[:], self.lines[:]
+        other.starts, other.ends = self.starts[:], self.ends[:]
+        other._shift_at, other._shift_offset, other._shift_line = self._shift_at, self._shift_offset, self._shift_line
+        other._hangbiao = self._hangbiao
+        return other
+
+    def span(self, index):
+        """第index个单词在源文本中的 (起始位置, 结束位置)"""
+        if index < 0:
+            index += len(self)
+        if index >= self._shift_at:
+            return self.starts[index] + self._shift_offset, self.ends[index] + self._shift_offset
+        return self.starts[index], self.ends[index]
+
+    def line(self, index):
+        """第index个单词的行号"""
+        if index < 0:
+            index += len(self)
+        if index >= self._shift_at:
+            return self.lines[index] + self._shift_line
+        return self.lines[index]
+
+    def nbytes(self):
+        """各列占用的字节数（不含源文本本身）"""
+        return sum(column.itemsize * len(column)
+                   for column in (self.codes, self.kinds, self.lines, self.starts, self.ends))
+
+    def flush(self):
+        """把增量分析留下的位移写回各列，直接读取各列前需要先调用"""
+        self._apply_shift(self._shift_at, len(self), self._shift_offset, self._shift_line)
+        self._shift_at, self._shift_offset, self._shift_line = len(self), 0, 0
+
+    def _apply_shift(self, lo, hi, offset, line):
+        if lo >= hi:
+            return
+        if offset:
+            self.starts[lo:hi] = array('I', [start + offset for start in self.starts[lo:hi]])
+            self.ends[lo:hi] = array('I', [end + offset for end in self.ends[lo:hi]])
+        if line:
+            self.lines[lo:hi] = array('I', [old + line for old in self.lines[lo:hi]])
+
+    def splice(self, source, lo, hi, tokens, offset, line):
+        """用 tokens 替换第 lo 到 hi-1 个单词，之后的单词位置平移 offset、行号平移 line
+
+        tokens 为 (种别码, 类型, 起始位置, 结束位置, 行号) 序列。位移不立即写回各列，
+        只把与上次位移之间的单词补写一次，所以连续在同一处编辑时代价与编辑量成正比。
+        """
+        shift_at, shift_offset, shift_line = self._shift_at, self._shift_offset, self._shift_line
+        if shift_at <= lo:
+            self._apply_shift(shift_at, lo, shift_offset, shift_line)
+            shift_at = lo + len(tokens)
+        elif shift_at <= hi:
+            shift_at = lo + len(tokens)
+        else:
+            self._apply_shift(hi, shift_at, offset, line)
+            shift_at += lo + len(tokens) - hi
+
+        kind_ids = self.KIND_IDS
+        self.codes[lo:hi] = array('H', [token[0] for token in tokens])
+        self.kinds[lo:hi] = array('B', [kind_ids[token[1]] for token in tokens])
+        self.starts[lo:hi] = array('I', [token[2] for token in tokens])
+        self.ends[lo:hi] = array('I', [token[3] for token in tokens])
+        self.lines[lo:hi] = array('I', [token[4] for token in tokens])
+        self.source = source
+        self._shift_at, self._shift_offset, self._shift_line = shift_at, shift_offset + offset, shift_line + line
+
+
+class TokenView(Sequence):
+    """TokenBuffer 中部分单词的只读视图：按下标数组 indices 取单词，元组在读取时才生成
+
+    Yufa 用它跳过注释，不必为全部单词建元组放进列表（每个单词约 120 字节，
+    而 TokenBuffer 中只占 15 字节）。语法分析基本是顺序向前读的，这里每次生成 WINDOW 个单词的元组，
+    读到窗口之外再换下一段，同一时刻只有一个窗口的元组。建立视图时先把位移写回各列。
+    """
+    WINDOW = 4096
+
+    def __init__(self, buffer, skip=600):
+        buffer.flush()
+        self.buffer = buffer
+        codes = buffer.codes
+        if skip in codes:
+            self.indices = array('I', (i for i, code in enumerate(codes) if code != skip))
+        else:
+            self.indices = range(len(codes))
+        self._base = 0
+        self._window = []
+
+    def __len__(self):
+        return len(self.indices)
+
+    def __getitem__(self, index):
+        offset = index - self._base
+        if 0 <= offset < len(self._window):
+            return self._window[offset]
+        if index < 0:
+            index += len(self.indices)
+        if not 0 <= index < len(self.indices):
+            raise IndexError('TokenView index out of range')
+        self._base = index
+        self._window = self._tokens(index, index + self.WINDOW)
+        return self._window[0]
+
+    def _tokens(self, lo, hi):
+        buffer = self.buffer
+        codes, kinds, names, source = buffer.codes, buffer.kinds, buffer.KINDS, buffer.source
+        starts, ends, lines = buffer.starts, buffer.ends, buffer.lines
+        return [(codes[i], names[kinds[i]], source[starts[i]:ends[i]], lines[i]) for i in self.indices[lo:hi]]
+
+    def span(self, index):
+        """第index个单词在源文本中的 (起始位置, 结束位置)"""
+        return self.buffer.span(self.indices[index])
+
+
 class Cifa:
-    def __init__(self):
+    def __init__(self, engine='dfa', tongji=None, cancel=None):
+        # engine: 'dfa' 为正则驱动的切片引擎，'loop' 为原来的逐字符引擎
+        self.engine = engine
+        # tongji: 可选的 Tongji 统计对象
+        self.tongji = tongji
+        # cancel: 可选的无参函数，返回真时中止分析并抛出 Cancelled，供后台线程协作式取消
+        self.cancel = cancel
         self.token_types = {
             'KEYWORD': 1,    # 关键字
             'IDENTIFIER': 700, # 标识符
@@ -13,11 +274,278 @@ class Cifa:
         self.operators = {'+':201, '-':202, '*':203, '/':204, '=':205, '==':206, '!=':207, '<':208, '>':209, '<=':210, '>=':211, '!':212, '%':213, '|':214, '&':215}
         self.separators = {'(':301, ')':302, '{':303, '}':304, '[':305, ']':306, ';':307, ',':308, '\'':309, '\"':310, '\\':311}
         
+    def _observed(self, scan, *args):
+        """有统计对象时计时并统计各类单词数"""
+        if self.tongji is None:
+            return scan(*args)
+        with self.tongji.phase('cifa'):
+            tokens = scan(*args)
+        self.tongji.tokens(tokens)
+        return tokens
+
     def cifafenxi(self, data):
+        return self._observed(self._cifafenxi, data)
+
+    def _cifafenxi(self, data):
+        if self.engine == 'loop':
+            return self._cifafenxi_loop(data)
+        lo, hi = _strip_span(data)
+        return [(code, kind, data[start:end], line)
+                for code, kind, start, end, line in self._scan(data, lo, _first_line(data, lo), hi)]
+
+    def cifafenxi_buffer(self, data):
+        """与 cifafenxi 相同的分析结果，以 TokenBuffer 形式返回，位置相对于原始的 data"""
+        return self._observed(self._cifafenxi_buffer, data)
+
+    def _cifafenxi_buffer(self, data):
+        lo, hi = _strip_span(data)
+        tokens = TokenBuffer(data)
+        codes, kinds, lines, starts, ends = (tokens.codes.append, tokens.kinds.append, tokens.lines.append,
+                                             tokens.starts.append, tokens.ends.append)
+        kind_ids = TokenBuffer.KIND_IDS
+        for code, kind, start, end, line in self._scan(data, lo, _first_line(data, lo), hi):
+            codes(code)
+            kinds(kind_ids[kind])
+            lines(line)
+            starts(start)
+            ends(end)
+        return tokens
+
+    def relex(self, tokens, offset, removed, inserted):
+        """增量词法分析：源文本从 offset 起删去 removed 个字符并插入 inserted 后，就地更新 TokenBuffer
+
+        从受编辑影响的第一个单词之前重新分析，新单词流与原单词流在编辑区之后对齐时即停止，
+        其后的单词只平移位置和行号。返回更新后的 tokens。
+        """
+        return self._observed(self._relex, tokens, offset, removed, inserted)
+
+    def _relex(self, tokens, offset, removed, inserted):
+        old = tokens.source
+        source = old[:offset] + inserted + old[offset + removed:]
+        count = len(tokens)
+        if not count or offset <= tokens.span(0)[0]:
+            # 编辑落在第一个单词之前，开头的空白可能改变，整体重新分析
+            lo, hi = _strip_span(source)
+            tokens.splice(source, 0, count, list(self._scan(source, lo, _first_line(source, lo), hi)), 0, 0)
+            return tokens
+
+        old_end = _content_end(old)
+        end = _content_end(source)
+        delta = len(inserted) - removed
+        # 单词的识别最多要看到结束位置后一个字符，也与有效内容的末尾有关
+        limit = min(offset, old_end, end)
+        lo, hi = 0, count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if tokens.span(mid)[1] + 2 > limit:
+                hi = mid
+            else:
+                lo = mid + 1
+        first = lo
+        if first:
+            restart, line_num = tokens.span(first - 1)[1], tokens.line(first - 1)
+        else:
+            # 第一个单词之前只有空白；块注释单词记的是结束行，不能用它的行号
+            restart = tokens.span(0)[0]
+            line_num = _first_line(source, restart)
+
+        resync = old_end + delta == end
+        edit_end = offset + len(inserted)
+        fresh = []
+        j = first
+        for token in self._scan(source, restart, line_num, end):
+            start = token[2]
+            if resync and start >= edit_end:
+                while j < count and tokens.span(j)[0] < start - delta:
+                    j += 1
+                if j < count and tokens.span(j)[0] == start - delta:
+                    tokens.splice(source, first, j, fresh, delta, token[4] - tokens.line(j))
+                    return tokens
+            fresh.append(token)
+        tokens.splice(source, first, count, fresh, 0, 0)
+        return tokens
+
+    def iter_tokens(self, fileobj, chunk_size=65536):
+        """流式词法分析：按块读取文件对象，逐个产生与 cifafenxi 相同的单词元组
+
+        每次只保留当前块和跨块未完成的单词，内存占用与块大小相关而与文件大小无关。
+        """
+        carry = ''
+        line_num = 1
+        # 与 cifafenxi 一致：跳过文件开头的空白，其中的换行照样计入行号
+        while True:
+            chunk = fileobj.read(chunk_size)
+            if not chunk:
+                return
+            carry = chunk.lstrip()
+            line_num += chunk.count('\n', 0, len(chunk) - len(carry))
+            if carry:
+                break
+
+        while True:
+            chunk = fileobj.read(max(chunk_size, len(carry)))
+            final = not chunk
+            data = carry.rstrip() if final else carry + chunk
+            # 距有效内容末尾不足两个字符的单词可能被下一块改变（如 '<' 与 '='、末尾的 e），留到下一轮
+            limit = len(data) if final else len(data.rstrip()) - 2
+            restart = 0
+            for code, kind, start, end, line in self._dfa_scan(data, 0, line_num):
+                if end > limit:
+                    restart = start
+                    line_num = line - data.count('\n', start, end)
+                    break
+                yield code, kind, data[start:end], line
+                restart = end
+                line_num = line
+            if final:
+                return
+            carry = data[restart:]
+
+    def lex_block(self, text, in_comment=False):
+        """分析一行文本（编辑器中的一个文本块），供逐行语法高亮使用
+
+        in_comment 表示行首仍在上一行开始的 /* */ 注释中。返回 ([(种别码, 类型, 起始位置, 结束位置)], 行末是否仍在注释中)。
+        只有块注释会跨行；行首注释的剩余部分和行内未闭合的注释各记为一个到行尾为止的注释单词。
+        """
         tokens = []
         i = 0
-        data = data.strip()
-        line_num = 1
+        if in_comment:
+            i = text.find('*/')
+            if i < 0:
+                return ([(600, '注释', 0, len(text))] if text else []), True
+            i += 2
+            tokens.append((600, '注释', 0, i))
+        for code, kind, start, end, _ in self._dfa_scan(text, i):
+            if code == 600 and text.startswith('/*', start) and (end - start < 4 or not text.endswith('*/', start, end)):
+                tokens.append((600, kind, start, len(text)))
+                return tokens, True
+            tokens.append((code, kind, start, end))
+        return tokens, False
+
+    def _scan(self, data, i=0, line_num=1, n=None):
+        """_dfa_scan，有 cancel 时每 CANCEL_INTERVAL 个单词检查一次是否已取消"""
+        if self.cancel is None:
+            return self._dfa_scan(data, i, line_num, n)
+        return _cancellable(self._dfa_scan(data, i, line_num, n), self.cancel)
+
+    def _dfa_scan(self, data, i=0, line_num=1, n=None):
+        """正则驱动的词法分析，逐个产生 (种别码, 类型, 起始位置, 结束位置, 行号)
+
+        只分析 data[i:n]，n 之后的内容视为不存在（默认为整个字符串）。
+        """
+        if n is None:
+            n = len(data)
+        keywords = self.keywords
+        operators = self.operators
+        separators = self.separators
+        match = _MASTER.scanner(data, i, n).match
+        while True:
+            m = match()
+            if m is None:
+                return
+            kind = m.lastgroup
+            start, i = m.span(kind)
+
+            if kind == 'ident':
+                code = keywords.get(data[start:i])
+                if code is None:
+                    yield 700, '标识符', start, i, line_num
+                else:
+                    yield code, '关键字', start, i, line_num
+                continue
+            if kind == 'nl':
+                line_num += 1
+                continue
+            if kind == 'sep':
+                yield separators[data[start]], '分隔符', start, i, line_num
+                continue
+            if kind == 'op':
+                yield operators[data[start:i]], '运算符', start, i, line_num
+                continue
+            if kind == 'line_comment':
+                yield 600, '注释', start, i, line_num
+                continue
+            if kind == 'block_comment':
+                line_num += data.count('\n', start, i)
+                yield 600, '注释', start, i, line_num
+                continue
+
+            if kind in ('hex', 'oct', 'num'):
+                # 数字后紧跟非ASCII字符时交给逐字符识别，保证与原引擎的Unicode判定一致
+                if i < n and data[i] >= '\x80':
+                    i = yield from self._dfa_slow_number(data, start, line_num, n)
+                    match = _MASTER.scanner(data, i, n).match
+                    continue
+                number = data[start:i]
+                if kind == 'hex':
+                    if len(number) > 2:
+                        yield 400, '十六进制数', start, i, line_num
+                    else:
+                        yield 0, '非法十六进制数', start, i, line_num
+                elif kind == 'oct':
+                    if '8' in number or '9' in number:
+                        yield 0, '非法八进制数', start, i, line_num
+                    else:
+                        yield 400, '八进制数', start, i, line_num
+                elif number.endswith('.'):
+                    yield 0, '非法浮点数', start, i, line_num
+                elif i < n and data[i] in 'eE':
+                    # 数据末尾落单的e不属于数字，数字本身记为非法
+                    yield 0, '非法数字', start, i, line_num
+                elif number.isdigit():
+                    yield 400, '整数', start, i, line_num
+                elif not _NUM_SHAPE.fullmatch(number):
+                    yield 0, '非法数字', start, i, line_num
+                else:
+                    try:
+                        float(number)
+                        yield 400, '浮点数', start, i, line_num
+                    except ValueError:
+                        yield 0, '非法数字', start, i, line_num
+                continue
+
+            if kind == 'str':
+                if i - start > 1 and data[i - 1] == '"':
+                    yield 310, '字符串常量', start, i, line_num
+                else:
+                    yield 0, '未闭合的引号', start, i, line_num
+                continue
+            if kind == 'chr':
+                if i - start > 1 and data[i - 1] == "'":
+                    if i - start == 3:
+                        yield 309, '字符常量', start, i, line_num
+                    else:
+                        yield 0, '非法字符常量', start, i, line_num
+                else:
+                    yield 0, '未闭合的引号', start, i, line_num
+                continue
+
+            # 其余单个字符：非ASCII的字母/数字或非法字符
+            char = data[start]
+            if char.isalpha():
+                i = _WORD.match(data, start, n).end()
+                yield 700, '标识符', start, i, line_num
+                match = _MASTER.scanner(data, i, n).match
+            elif char.isdigit() or (char == '.' and i < n and data[i].isdigit()):
+                i = yield from self._dfa_slow_number(data, start, line_num, n)
+                match = _MASTER.scanner(data, i, n).match
+            else:
+                yield 0, '非法字符', start, i, line_num
+
+    def _dfa_slow_number(self, data, start, line_num, n):
+        """按原引擎规则识别含非ASCII字符的数字，返回结束位置"""
+        found = []
+        end = self._scan_number(data, start, line_num, found, n)
+        for code, kind, number, line in found:
+            yield code, kind, start, start + len(number), line
+        return end
+
+    def _cifafenxi_loop(self, data):
+        tokens = []
+        i = 0
+        stripped = data.lstrip()
+        line_num = _first_line(data, len(data) - len(stripped))
+        data = stripped.rstrip()
 
         while i < len(data):
             char = data[i]
@@ -70,84 +598,7 @@ class Cifa:
 
             # 处理数字（包括整数、浮点数、十六进制、八进制）
             if char.isdigit() or (char == '.' and i + 1 < len(data) and data[i+1].isdigit()):
-                number = ''
-                is_valid = True
-                has_dot = False
-                has_e = False
-                
-                # 处理十六进制
-                if char == '0' and i + 1 < len(data) and (data[i+1] == 'x' or data[i+1] == 'X'):
-                    number = '0'
-                    i += 1
-                    number += data[i]
-                    i += 1
-                    has_hex = False
-                    while i < len(data) and (data[i].isdigit() or data[i].lower() in 'abcdef'):
-                        has_hex = True
-                        number += data[i]
-                        i += 1
-                    if has_hex and all(c.lower() in '0123456789abcdef' for c in number[2:]):
-                        tokens.append((self.token_types['NUMBER'], '十六进制数', number, line_num))
-                    else:
-                        tokens.append((0, '非法十六进制数', number, line_num))
-                    continue
-
-                # 处理八进制
-                if char == '0' and i + 1 < len(data) and data[i+1].isdigit():
-                    number = '0'
-                    i += 1
-                    is_valid_octal = True
-                    while i < len(data) and data[i].isdigit():
-                        if data[i] in '89':
-                            is_valid_octal = False
-                        number += data[i]
-                        i += 1
-                    if is_valid_octal and len(number) > 1:
-                        tokens.append((self.token_types['NUMBER'], '八进制数', number, line_num))
-                    else:
-                        tokens.append((0, '非法八进制数', number, line_num))
-                    continue
-
-                # 处理浮点数和整数
-                while i < len(data):
-                    if data[i].isdigit():
-                        number += data[i]
-                    elif data[i] == '.' and not has_dot and not has_e:
-                        if not number and (i + 1 >= len(data) or not data[i+1].isdigit()):
-                            tokens.append((0, '非法浮点数', '.', line_num))
-                            i += 1
-                            break
-                        number += data[i]
-                        has_dot = True
-                    elif (data[i] == 'e' or data[i] == 'E') and not has_e:
-                        if i + 1 >= len(data):
-                            is_valid = False
-                            break
-                        number += data[i]
-                        has_e = True
-                        if i + 1 < len(data) and (data[i+1] == '+' or data[i+1] == '-'):
-                            i += 1
-                            number += data[i]
-                    elif data[i].isalpha() or data[i] == '_':
-                        number += data[i]
-                        is_valid = False
-                    else:
-                        break
-                    i += 1
-
-                if number.endswith('.'):
-                    tokens.append((0, '非法浮点数', number, line_num))
-                elif is_valid:
-                    try:
-                        if 'e' in number.lower() or '.' in number:
-                            float(number)
-                            tokens.append((self.token_types['NUMBER'], '浮点数', number, line_num))
-                        else:
-                            tokens.append((self.token_types['NUMBER'], '整数', number, line_num))
-                    except ValueError:
-                        tokens.append((0, '非法数字', number, line_num))
-                else:
-                    tokens.append((0, '非法数字', number, line_num))
+                i = self._scan_number(data, i, line_num, tokens)
                 continue
 
             # 处理字符串和字符常量
@@ -204,6 +655,94 @@ class Cifa:
 
         return tokens
 
+    def _scan_number(self, data, i, line_num, tokens, n=None):
+        """从位置i开始识别一个数字（包括整数、浮点数、十六进制、八进制），返回结束位置
+
+        n 为数据的有效长度，默认为整个字符串。
+        """
+        if n is None:
+            n = len(data)
+        char = data[i]
+        number = ''
+        is_valid = True
+        has_dot = False
+        has_e = False
+        
+        # 处理十六进制
+        if char == '0' and i + 1 < n and (data[i+1] == 'x' or data[i+1] == 'X'):
+            number = '0'
+            i += 1
+            number += data[i]
+            i += 1
+            has_hex = False
+            while i < n and (data[i].isdigit() or data[i].lower() in 'abcdef'):
+                has_hex = True
+                number += data[i]
+                i += 1
+            if has_hex and all(c.lower() in '0123456789abcdef' for c in number[2:]):
+                tokens.append((self.token_types['NUMBER'], '十六进制数', number, line_num))
+            else:
+                tokens.append((0, '非法十六进制数', number, line_num))
+            return i
+
+        # 处理八进制
+        if char == '0' and i + 1 < n and data[i+1].isdigit():
+            number = '0'
+            i += 1
+            is_valid_octal = True
+            while i < n and data[i].isdigit():
+                if data[i] in '89':
+                    is_valid_octal = False
+                number += data[i]
+                i += 1
+            if is_valid_octal and len(number) > 1:
+                tokens.append((self.token_types['NUMBER'], '八进制数', number, line_num))
+            else:
+                tokens.append((0, '非法八进制数', number, line_num))
+            return i
+
+        # 处理浮点数和整数
+        while i < n:
+            if data[i].isdigit():
+                number += data[i]
+            elif data[i] == '.' and not has_dot and not has_e:
+                if not number and (i + 1 >= n or not data[i+1].isdigit()):
+                    tokens.append((0, '非法浮点数', '.', line_num))
+                    i += 1
+                    break
+                number += data[i]
+                has_dot = True
+            elif (data[i] == 'e' or data[i] == 'E') and not has_e:
+                if i + 1 >= n:
+                    is_valid = False
+                    break
+                number += data[i]
+                has_e = True
+                if i + 1 < n and (data[i+1] == '+' or data[i+1] == '-'):
+                    i += 1
+                    number += data[i]
+            elif data[i].isalpha() or data[i] == '_':
+                number += data[i]
+                is_valid = False
+            else:
+                break
+            i += 1
+
+        if number.endswith('.'):
+            tokens.append((0, '非法浮点数', number, line_num))
+        elif is_valid:
+            try:
+                if 'e' in number.lower() or '.' in number:
+                    float(number)
+                    tokens.append((self.token_types['NUMBER'], '浮点数', number, line_num))
+                else:
+                    tokens.append((self.token_types['NUMBER'], '整数', number, line_num))
+            except ValueError:
+                tokens.append((0, '非法数字', number, line_num))
+        else:
+            tokens.append((0, '非法数字', number, line_num))
+        return i
+
 # 测试代码
 if __name__ == "__main__":
     cifa = Cifa()
@@ -223,4 +762,96 @@ abc45  _ab    //测试正常标识符
     print("-" * 50)
     for token in tokens:
         if token[0] == 0:  # 只输出种别码为0的token
-            print(f"{token[0]}\t{token[1]}\t{token[2]}\t\t{token[3]}")
\ No newline at end of file
+            print(f"{token[0]}\t{token[1]}\t{token[2]}\t\t{token[3]}")
+
+    # 两种引擎的等价性与吞吐量对比
+    import io
+    import os
+    import sys
+    import tempfile
+    import time
+    import tracemalloc
+    here = os.path.dirname(os.path.abspath(__file__))
+    sources = []
+    for name in ('test.c', 'test2.c'):
+        with open(os.path.join(here, name), 'r', encoding='utf-8') as f:
+            source = f.read()
+        assert Cifa(engine='dfa').cifafenxi(source) == Cifa(engine='loop').cifafenxi(source), name
+        print(f"{name}：两种引擎输出一致")
+        for chunk_size in (1, 7, 4096):
+            streamed = list(Cifa().iter_tokens(io.StringIO(source), chunk_size=chunk_size))
+            assert streamed == Cifa().cifafenxi(source), (name, chunk_size)
+        print(f"{name}：流式分析输出一致")
+        tokens = Cifa().cifafenxi_buffer(source)
+        edited = source
+        for offset, removed, inserted in ((10, 0, 'x'), (40, 3, ''), (len(edited) // 2, 1, '\n/* a\n*/'), (5, 0, '\n'),
+                                           (0, 0, '\n\n')):
+            edited = edited[:offset] + inserted + edited[offset + removed:]
+            Cifa().relex(tokens, offset, removed, inserted)
+            assert [tokens[i] for i in range(len(tokens))] == Cifa().cifafenxi(edited), (name, offset)
+        print(f"{name}：增量分析输出一致")
+        sources.append(source)
+
+    # 随机字符串：两种引擎对各种非法单词（非法数字、非法浮点数、非法十六进制数/八进制数、未闭合的引号）的分类一致
+    import random
+    random.seed(1)
+    alphabet = ['0', '1', '7', '8', '9', '0x', '0X', 'e', 'E', '.', 'a', 'f', 'g', '_', 'x', '+', '-', '*', '/',
+                '=', '!', '<', '>', '&', '|', '(', ')', '{', '}', ';', ',', '"', "'", '\\', '@', '#', ' ', '\n',
+                '/*', '*/', '//', 'if', 'int', 'while']
+    for _ in range(3000):
+        source = ''.join(random.choice(alphabet) for _ in range(random.randint(1, 40)))
+        assert Cifa(engine='dfa').cifafenxi(source) == Cifa(engine='loop').cifafenxi(source), source
+    print("3000 个随机字符串：两种引擎输出一致")
+
+    samples = {
+        '测试用例': '\n'.join(sources) * 500,
+        '长注释与长字符串': ('/* ' + 'x' * 4000 + ' */\nint a = "' + 'y' * 2000 + '";\n') * 200,
+    }
+    for label, source in samples.items():
+        size = len(source.encode('utf-8')) / 1e6
+        speeds = []
+        outputs = []
+        for engine in ('loop', 'dfa'):
+            begin = time.perf_counter()
+            outputs.append(Cifa(engine=engine).cifafenxi(source))
+            speeds.append(size / (time.perf_counter() - begin))
+        assert outputs[0] == outputs[1], label
+        print(f"{label}：逐字符 {speeds[0]:.2f} MB/s，正则切片 {speeds[1]:.2f} MB/s")
+    # 长注释和长字符串按切片取出，不随长度逐字符拼接
+    assert speeds[1] > 5 * speeds[0], speeds
+
+    # 流式分析的内存峰值只与块大小有关
+    with tempfile.TemporaryFile('w+', encoding='utf-8') as f:
+        for _ in range(4):
+            f.write(samples['测试用例'])
+        f.seek(0)
+        tracemalloc.start()
+        count = sum(1 for _ in Cifa().iter_tokens(f, chunk_size=65536))
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        print(f"流式分析 {f.tell() / 1e6:.1f} MB 源文件：{count} 个单词，内存峰值 {peak / 1e6:.2f} MB")
+
+    # 元组列表与 TokenBuffer 的每单词内存占用（值字符串与行号对象按实际对象去重统计）
+    source = samples['测试用例']
+    tuples = Cifa().cifafenxi(source)
+    seen = set()
+    tuple_bytes = sys.getsizeof(tuples)
+    for token in tuples:
+        for part in (token, token[2], token[3]):
+            if id(part) not in seen:
+                seen.add(id(part))
+                tuple_bytes += sys.getsizeof(part)
+    buffer = Cifa().cifafenxi_buffer(source)
+    assert list(buffer) == tuples
+    print(f"元组列表：{tuple_bytes / len(tuples):.1f} 字节/单词，TokenBuffer：{buffer.nbytes() / len(buffer):.1f} 字节/单词")
+
+    # 增量分析：在大文件中间逐字输入
+    tokens = Cifa().cifafenxi_buffer(source)
+    offset = len(source) // 2
+    begin = time.perf_counter()
+    for k, char in enumerate('count = count + 1;\n'):
+        Cifa().relex(tokens, offset + k, 0, char)
+    cost = (time.perf_counter() - begin) / (k + 1)
+    begin = time.perf_counter()
+    Cifa().cifafenxi_buffer(tokens.source)
+    print(f"增量分析：每次输入 {cost * 1e3:.2f} ms，整体重新分析 {(time.perf_counter() - begin) * 1e3:.0f} ms")
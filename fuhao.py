@@ -0,0 +1,158 @@
+"""带作用域的符号表
+
+每个名字只驻留一次：Zhongjian 生成的四元式中，同一个变量的操作数都是同一个 str 对象，
+后续各阶段比较操作数时多半在身份比较一步就得出结果。
+
+每次声明得到一个符号，编号从 0 开始连续分配，记录名字、类型、声明行号和存储单元。
+存储单元是四元式和汇编中使用的名字，也连续编号并记录种类（用户变量、临时变量、函数）；
+语义分析把每个标识符、赋值和声明结点引用的符号记在 refs 中（结点 → 符号编号），不改动语法树；
+Zhongjian 生成的临时变量和标签也由符号表分配，Liutu、Mubiao 据此区分用户变量、临时变量和常数，
+不必再按名字猜测，也不必逐个操作数试着转成数。
+"""
+from array import array
+
+# 存储单元的种类
+VARIABLE, TEMP, FUNCTION = range(3)
+
+
+class Fuhao:
+    """符号表：作用域栈，符号和存储单元的属性按编号存放在平行列表中
+
+    每个符号有自己的存储单元：某个名字的第一个符号用名字本身，之后同名的第 k 个符号用 名字.k。
+    不能按遮蔽层数复用存储名：语句体结束后在全局作用域中隐式声明的同名变量会拿到
+    已出作用域的局部变量的存储单元，读到它留下的值。
+    “.”不会出现在标识符中，汇编的标签里却是合法字符，不会与用户变量、临时变量或标签重名。
+    """
+
+    def __init__(self):
+        # 符号编号 → 名字、类型、声明行号、存储单元编号
+        self.names = []
+        self.types = []
+        self.lines = array('I')
+        self.slots = array('I')
+        # 存储名 → 存储单元编号；存储单元编号 → 存储名、种类
+        self.ids = {}
+        self.storage = []
+        self.kinds = bytearray()
+        # 作用域栈，每层为 名字 → 符号编号；第 0 层是全局作用域
+        self.scopes = [{}]
+        # 语法树结点 → 它引用的符号编号
+        self.refs = {}
+        # 名字驻留表，以及每个名字已声明的符号个数
+        self._interned = {}
+        self._count = {}
+        self.temp_count = 0
+        self.label_count = 0
+
+    def __len__(self):
+        return len(self.names)
+
+    def intern(self, name):
+        """同一个名字总是返回第一次见到的那个 str 对象"""
+        return self._interned.setdefault(name, name)
+
+    def enter(self):
+        self.scopes.append({})
+
+    def leave(self):
+        self.scopes.pop()
+
+    def lookup(self, name):
+        """由内向外查找名字，返回符号编号，找不到时为 None"""
+        for scope in reversed(self.scopes):
+            i = scope.get(name)
+            if i is not None:
+                return i
+        return None
+
+    def local(self, name):
+        """只在当前作用域中查找"""
+        return self.scopes[-1].get(name)
+
+    def declare(self, name, type='int', line=0, kind=VARIABLE, scope=-1):
+        """在第 scope 层作用域中声明名字，返回新符号的编号；重复声明由调用者先用 local() 检查"""
+        name = self.intern(name)
+        count = self._count[name] = self._count.get(name, 0) + 1
+        slot = self._slot(name if count == 1 else f'{name}.{count}', kind)
+        i = len(self.names)
+        self.names.append(name)
+        self.types.append(type)
+        self.lines.append(line)
+        self.slots.append(slot)
+        self.scopes[scope][name] = i
+        return i
+
+    def _slot(self, storage, kind):
+        slot = len(self.storage)
+        self.ids[storage] = slot
+        self.storage.append(storage)
+        self.kinds.append(kind)
+        return slot
+
+    def storage_name(self, i):
+        """符号的存储名"""
+        return self.storage[self.slots[i]]
+
+    def resolved(self, node):
+        """结点引用的变量的存储名"""
+        return self.storage[self.slots[self.refs[node]]]
+
+    def kind(self, i):
+        """符号的种类"""
+        return self.kinds[self.slots[i]]
+
+    def new_temp(self):
+        """新的临时变量，名字避开源程序中出现过的名字，返回存储名"""
+        while True:
+            self.temp_count += 1
+            name = f'T{self.temp_count}'
+            if name not in self._interned:
+                self._slot(name, TEMP)
+                return name
+
+    def new_label(self):
+        """新的标签名，同样避开源程序中的名字（汇编中标签与变量共用一个名字空间）"""
+        while True:
+            self.label_count += 1
+            label = f'L{self.label_count}'
+            if label not in self._interned:
+                return label
+
+    def is_temp(self, name):
+        slot = self.ids.get(name)
+        return slot is not None and self.kinds[slot] == TEMP
+
+    def variables(self):
+        """用户变量的存储名"""
+        return [name for name, kind in zip(self.storage, self.kinds) if kind == VARIABLE]
+
+    def temps(self):
+        return [name for name, kind in zip(self.storage, self.kinds) if kind == TEMP]
+
+
+# 测试代码
+if __name__ == '__main__':
+    fuhao = Fuhao()
+    fuhao.declare('main', 'int', 1, FUNCTION, scope=0)
+    x = fuhao.declare('x', 'int', 2)
+    fuhao.enter()
+    inner = fuhao.declare('x', 'float', 3)
+    assert fuhao.lookup('x') == inner and fuhao.storage_name(inner) == 'x.2'
+    fuhao.leave()
+    assert fuhao.lookup('x') == x and fuhao.lookup('y') is None
+    fuhao.enter()
+    sibling = fuhao.declare('x', 'int', 4)
+    assert fuhao.storage_name(sibling) == 'x.3'
+    fuhao.leave()
+    # 语句体结束后隐式声明的全局变量不与已出作用域的局部变量共用存储单元
+    fuhao.enter()
+    local = fuhao.declare('z', 'int', 5)
+    fuhao.leave()
+    implicit = fuhao.declare('z', 'int', 6, scope=0)
+    assert fuhao.slots[implicit] != fuhao.slots[local]
+    fuhao.declare('T1', 'int', 7)
+    assert fuhao.new_temp() == 'T2' and fuhao.is_temp('T2') and not fuhao.is_temp('T1')
+    print("用户变量：", fuhao.variables(), "临时变量：", fuhao.temps())
+    print("编号\t名字\t类型\t行号\t存储名\t种类")
+    for i in range(len(fuhao)):
+        print(f"{i}\t{fuhao.names[i]}\t{fuhao.types[i]}\t{fuhao.lines[i]}\t{fuhao.storage_name(i)}\t{fuhao.kind(i)}")
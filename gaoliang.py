@@ -0,0 +1,114 @@
+"""语法高亮：每个文本块（行）单独调用 Cifa.lex_block，块状态记录行末是否仍在 /* */ 注释中
+
+QSyntaxHighlighter 只重新高亮内容改变了的块；一块高亮后若块状态与原来不同，Qt 接着高亮下一块，
+直到某块的状态不再变化。所以键入一个字符通常只分析一行，只有加上或去掉 /* 、*/ 时才一路
+重新分析到注释的另一端。
+
+打开大文件时 Qt 会把每一块都高亮一遍。视口附近以外、从未着色的块只推算注释状态：行中没有
+/* 或 */ 时状态不变，不必词法分析；这些块滚动到视口中时再着色。块状态的第 1 位为注释状态，
+第 2 位表示已着色，已着色的块被连带重新高亮时总是完整分析，不会丢掉颜色。
+"""
+from PyQt5.QtCore import QTimer
+from PyQt5.QtGui import QColor, QFont, QSyntaxHighlighter, QTextCharFormat
+
+from cifa import Cifa
+
+# 块状态的两位（Qt 中从未高亮过的块状态为 -1）
+IN_COMMENT = 1
+COLOURED = 2
+# 视口上下各多少块也立即着色
+MARGIN = 50
+
+# 各类单词的颜色，与单词表中的类型对应
+COLORS = {
+    '关键字': '#569cd6',
+    '标识符': '#9cdcfe',
+    '数值': '#b5cea8',
+    '运算符': '#d7ba7d',
+    '注释': '#6a9955',
+    '字符串': '#ce9178',
+    '非法': '#f44747',
+}
+
+
+def _coloured(state):
+    return state > 0 and bool(state & COLOURED)
+
+
+def _format(category):
+    fmt = QTextCharFormat()
+    fmt.setForeground(QColor(COLORS[category]))
+    if category == '关键字':
+        fmt.setFontWeight(QFont.Bold)
+    elif category == '注释':
+        fmt.setFontItalic(True)
+    elif category == '非法':
+        fmt.setUnderlineStyle(QTextCharFormat.WaveUnderline)
+        fmt.setUnderlineColor(QColor(COLORS[category]))
+    return fmt
+
+
+class Gaoliang(QSyntaxHighlighter):
+    """按 Cifa 的单词分类着色：关键字、标识符、数值、运算符、注释、字符串/字符常量、种别码为0的非法单词
+
+    分隔符不着色，保持编辑器的默认颜色。editor 为 QPlainTextEdit，高亮它的文档并跟随它的视口。
+    """
+
+    def __init__(self, editor):
+        super().__init__(editor.document())
+        self.editor = editor
+        self.cifa = Cifa()
+        formats = {category: _format(category) for category in COLORS}
+        # 种别码 → 格式
+        self.formats = {code: formats['关键字'] for code in self.cifa.keywords.values()}
+        self.formats.update((code, formats['运算符']) for code in self.cifa.operators.values())
+        self.formats.update({700: formats['标识符'], 400: formats['数值'], 600: formats['注释'],
+                             309: formats['字符串'], 310: formats['字符串'], 0: formats['非法']})
+        # 需要立即着色的块号范围
+        self.first = 0
+        self.last = MARGIN * 2
+        self._pending = False
+        editor.updateRequest.connect(self._schedule)
+
+    def highlightBlock(self, text):
+        state = self.previousBlockState()
+        in_comment = state > 0 and bool(state & IN_COMMENT)
+        number = self.currentBlock().blockNumber()
+        if not self.first <= number <= self.last and not _coloured(self.currentBlockState()):
+            # 视口外从未着色的块只推算注释状态
+            if '*/' not in text if in_comment else '/*' not in text:
+                self.setCurrentBlockState(IN_COMMENT if in_comment else 0)
+                return
+            self.setCurrentBlockState(IN_COMMENT if self.cifa.lex_block(text, in_comment)[1] else 0)
+            return
+        tokens, in_comment = self.cifa.lex_block(text, in_comment)
+        formats = self.formats
+        set_format = self.setFormat
+        for code, _, start, end in tokens:
+            fmt = formats.get(code)
+            if fmt is not None:
+                set_format(start, end - start, fmt)
+        self.setCurrentBlockState(COLOURED | IN_COMMENT if in_comment else COLOURED)
+
+    def _schedule(self, *args):
+        # 视口滚动或重绘后在下一轮事件循环中着色，不在绘制过程中修改文档格式
+        if not self._pending:
+            self._pending = True
+            QTimer.singleShot(0, self.colour_visible)
+
+    def colour_visible(self):
+        """给视口附近尚未着色的块着色"""
+        self._pending = False
+        document = self.document()
+        if document is None:
+            return
+        editor = self.editor
+        first = editor.firstVisibleBlock().blockNumber()
+        last = editor.cursorForPosition(editor.viewport().rect().bottomLeft()).blockNumber()
+        self.first, self.last = max(first - MARGIN, 0), last + MARGIN
+        block = document.findBlockByNumber(self.first)
+        while block.isValid() and block.blockNumber() <= self.last:
+            if not _coloured(block.userState()):
+                # 着色后状态改变，Qt 会接着处理后面的块，循环随即跳过它们
+                self.rehighlightBlock(block)
+            block = block.next()
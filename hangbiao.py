@@ -0,0 +1,105 @@
+"""行首偏移表与带位置的诊断信息
+
+源文本的每一行第一个字符的偏移预先算好存成数组，之后由偏移求行号、列号只需二分查找，
+由行列号求偏移只需查表，几兆字节的文件也不必重新扫描文本。
+"""
+from array import array
+from bisect import bisect_right
+from itertools import accumulate
+
+
+class Hangbiao:
+    """源文本的行首偏移表，行号、列号都从 1 开始，列号按字符计"""
+
+    def __init__(self, source):
+        self.source = source
+        # 第 k 行（从 0 计）的行首偏移；最后一项是末行之后的位置，不是一行
+        self.starts = array('I', accumulate((len(line) + 1 for line in source.split('\n')), initial=0))
+        self.starts.pop()
+
+    def __len__(self):
+        return len(self.starts)
+
+    def line(self, offset):
+        """偏移所在的行号"""
+        return bisect_right(self.starts, offset)
+
+    def position(self, offset):
+        """偏移对应的 (行号, 列号)"""
+        line = bisect_right(self.starts, offset)
+        return line, offset - self.starts[line - 1] + 1
+
+    def offset(self, line, column=1):
+        """(行号, 列号) 对应的偏移"""
+        return self.starts[line - 1] + column - 1
+
+    def line_text(self, line):
+        """第 line 行的文本，不含换行符"""
+        start = self.starts[line - 1]
+        end = self.starts[line] - 1 if line < len(self.starts) else len(self.source)
+        return self.source[start:end]
+
+
+class Zhenduan(str):
+    """带位置的诊断信息
+
+    本身仍是原来的“第N行：说明”字符串，照旧可以显示、拼接、写入 JSON；另外记录行号 line、
+    说明 message，以及出错单词在源文本中的起止偏移 start、end（单词序列不带偏移时为 None）。
+    """
+
+    def __new__(cls, line, message, start=None, end=None):
+        self = super().__new__(cls, f"第{line}行：{message}")
+        self.line = line
+        self.message = message
+        self.start = start
+        self.end = end
+        return self
+
+    def __reduce__(self):
+        return Zhenduan, (self.line, self.message, self.start, self.end)
+
+    def position(self, hangbiao):
+        """出错位置的 (行号, 列号)，没有偏移时列号为 None"""
+        if self.start is None:
+            return self.line, None
+        return hangbiao.position(self.start)
+
+    def to_dict(self, hangbiao=None):
+        result = {'line': self.line, 'column': None, 'start': self.start, 'end': self.end, 'message': self.message}
+        if hangbiao is not None and self.start is not None:
+            result['line'], result['column'] = hangbiao.position(self.start)
+        return result
+
+
+# 测试代码
+if __name__ == '__main__':
+    import pickle
+    import random
+    import time
+    from jizhun import Yuliao
+
+    source = '\n\nmain() {\n  a = 1;\n\n  b = a + 2;\n}\n'
+    hangbiao = Hangbiao(source)
+    for offset in range(len(source) + 1):
+        line = source.count('\n', 0, offset) + 1
+        column = offset - (source.rfind('\n', 0, offset) + 1) + 1
+        assert hangbiao.position(offset) == (line, column), offset
+        assert hangbiao.offset(line, column) == offset
+    assert [hangbiao.line_text(line) for line in range(1, len(hangbiao) + 1)] == source.split('\n')
+
+    error = Zhenduan(4, '缺少分号', 13, 14)
+    assert error == '第4行：缺少分号' and pickle.loads(pickle.dumps(error)).to_dict(hangbiao) == error.to_dict(hangbiao)
+    print(error, error.to_dict(hangbiao))
+
+    # 大文件：建表一次，之后每次查找为二分查找
+    big = Yuliao(0).generate('mixed', 10 << 20)
+    start = time.perf_counter()
+    hangbiao = Hangbiao(big)
+    built = time.perf_counter() - start
+    offsets = [random.randrange(len(big)) for _ in range(100000)]
+    start = time.perf_counter()
+    for offset in offsets:
+        hangbiao.position(offset)
+    lookup = time.perf_counter() - start
+    print(f"{len(big) / 2 ** 20:.0f} MB，{len(hangbiao)} 行：建表 {built * 1000:.0f} ms，"
+          f"每次查找 {lookup / len(offsets) * 1e6:.2f} µs")
@@ -0,0 +1,164 @@
+import threading
+
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+
+from cifa import Cifa, Cancelled, TokenBuffer
+from yufa import Yufa, Node
+from shutu import structure_hash
+from tongji import Tongji
+
+# 超过该长度的文本不查磁盘缓存：pickle 读写大对象期间一直持有 GIL，界面会卡住
+CACHE_LIMIT = 1 << 20
+RELEASE_CHUNK = 4096
+
+
+def release(*objects):
+    """逐步拆开大列表和语法树再丢弃
+
+    一次释放几百万个对象（单词元组列表、整棵语法树）是一串连续的 C 调用，期间一直持有 GIL，
+    界面线程会卡住几百毫秒。这里分批删除列表元素、先摘下结点的子结点，每一步只释放少量对象，
+    其间解释器可以切换到界面线程。
+    """
+    stack = list(objects)
+    while stack:
+        item = stack.pop()
+        if isinstance(item, list):
+            while item:
+                chunk = item[-RELEASE_CHUNK:]
+                del item[-RELEASE_CHUNK:]
+                stack.extend(value for value in chunk if isinstance(value, (Node, list)))
+        elif isinstance(item, Node):
+            for field in item.__slots__:
+                value = getattr(item, field)
+                if isinstance(value, (Node, list)):
+                    stack.append(value)
+                    setattr(item, field, None)
+
+
+def release_later(*objects):
+    """在后台线程中 release()，调用方随即丢掉自己的引用即可"""
+    threading.Thread(target=release, args=objects, daemon=True).start()
+
+
+class _Signals(QObject):
+    finished = pyqtSignal(int, object)
+    failed = pyqtSignal(int, str)
+
+
+class FenxiJob(QRunnable):
+    """一次后台分析：对文本快照做词法分析（可选再做语法分析，并算出语法树的结构哈希）
+
+    text 是提交时取下的字符串快照，不可变；previous 是上次结果 TokenBuffer 的副本，
+    dirty 是此后的修改范围 (不变前缀长度, 不变后缀长度)，两者都给出时只重新分析修改的区域。
+    cancel() 之后，Cifa 每隔一批单词、Yufa 每条语句检查一次，抛出 Cancelled 后尽快结束。
+    """
+
+    def __init__(self, serial, text, parse=False, previous=None, dirty=None, huancun=None):
+        super().__init__()
+        self.serial = serial
+        self.text = text
+        self.parse = parse
+        self.previous = previous
+        self.dirty = dirty
+        self.huancun = huancun if len(text) <= CACHE_LIMIT else None
+        self.signals = _Signals()
+        self._cancelled = threading.Event()
+
+    def cancel(self):
+        self._cancelled.set()
+
+    def run(self):
+        try:
+            result = self._analyse()
+        except Cancelled:
+            # 被取消的任务不发结果，调度方已经不再等它
+            pass
+        except Exception as e:
+            self.signals.failed.emit(self.serial, f'{type(e).__name__}: {e}')
+        else:
+            self.signals.finished.emit(self.serial, result)
+
+    def _analyse(self):
+        text = self.text
+        tongji = Tongji()
+        cancel = self._cancelled.is_set
+        cifa = Cifa(tongji=tongji, cancel=cancel)
+        tokens = self.previous
+        if isinstance(tokens, TokenBuffer) and self.dirty is not None:
+            prefix, suffix = self.dirty
+            removed = len(tokens.source) - prefix - suffix
+            if removed >= 0 and prefix <= len(text) - suffix:
+                cifa.relex(tokens, prefix, removed, text[prefix:len(text) - suffix])
+        if not isinstance(tokens, TokenBuffer) or tokens.source != text:
+            if self.huancun:
+                tokens = self.huancun.lookup('cifa_buffer', text, lambda: cifa.cifafenxi_buffer(text))
+            else:
+                tokens = cifa.cifafenxi_buffer(text)
+
+        ast = None
+        structure = None
+        if self.parse:
+            # Yufa 经 TokenView 读单词，不再另建一份单词元组列表
+            yufa = Yufa(tongji=tongji, cancel=cancel)
+            if self.huancun:
+                ast = self.huancun.lookup('yufa', text, lambda: yufa.parse(tokens))
+            else:
+                ast = yufa.parse(tokens)
+            # 语法树图按结构哈希缓存布局；大文件上要算几秒，放在后台和语法分析一起做
+            if self.huancun:
+                structure = self.huancun.lookup('jiegou', text, lambda: structure_hash(ast, cancel))
+            else:
+                structure = structure_hash(ast, cancel)
+        return {'text': text, 'tokens': tokens, 'ast': ast, 'structure': structure, 'tongji': tongji}
+
+
+class Houtai(QObject):
+    """后台分析调度：单线程的 QThreadPool，同一时间只有一个有效任务
+
+    submit() 先取消正在进行的任务再提交新任务；invalidate() 只取消，用于用户又修改了文本。
+    只有最新一次提交的结果会通过 finished 发出，被取消或过期的结果直接丢弃。
+    """
+    finished = pyqtSignal(object)
+    failed = pyqtSignal(str)
+    busy = pyqtSignal(bool)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.pool = QThreadPool(self)
+        # 分析本身是 CPU 密集的，多个线程只会争抢 GIL
+        self.pool.setMaxThreadCount(1)
+        self.serial = 0
+        self.job = None
+
+    def submit(self, text, parse=False, previous=None, dirty=None, huancun=None):
+        self.invalidate()
+        job = FenxiJob(self.serial, text, parse, previous, dirty, huancun)
+        job.signals.finished.connect(self._finished)
+        job.signals.failed.connect(self._failed)
+        self.job = job
+        self.busy.emit(True)
+        self.pool.start(job)
+        return job
+
+    def invalidate(self):
+        """取消正在进行的任务，并使其尚未送达的结果作废"""
+        self.serial += 1
+        if self.job is not None:
+            self.job.cancel()
+            self.job = None
+            self.busy.emit(False)
+
+    def _finished(self, serial, result):
+        if serial == self.serial:
+            self.job = None
+            self.busy.emit(False)
+            self.finished.emit(result)
+
+    def _failed(self, serial, message):
+        if serial == self.serial:
+            self.job = None
+            self.busy.emit(False)
+            self.failed.emit(message)
+
+    def wait(self, msecs=-1):
+        return self.pool.waitForDone(msecs)
@@ -0,0 +1,234 @@
+import hashlib
+import os
+import pickle
+import tempfile
+import zlib
+
+from zhongjian import bianyi
+
+# 参与编译的模块；它们的源码一变，缓存键就变，旧条目自然失效
+COMPILER_MODULES = ('cifa.py', 'hangbiao.py', 'yufa.py', 'fuhao.py', 'yuyi.py', 'zhongjian.py', 'changliang.py',
+                    'liutu.py', 'Mubiao.py', 'kuikong.py')
+DEFAULT_DIRECTORY = os.environ.get('BIANYI_CACHE') or os.path.join(
+    os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache'), 'xiaoxiao-bianyi')
+DEFAULT_MAX_BYTES = 256 * 2 ** 20
+
+_version = None
+
+
+def compiler_version():
+    """编译器版本：各编译器模块源码的哈希"""
+    global _version
+    if _version is None:
+        digest = hashlib.sha256()
+        root = os.path.dirname(os.path.abspath(__file__))
+        for name in COMPILER_MODULES:
+            try:
+                with open(os.path.join(root, name), 'rb') as f:
+                    digest.update(f.read())
+            except OSError:
+                digest.update(name.encode())
+        _version = digest.hexdigest()[:16]
+    return _version
+
+
+class Huancun:
+    """按内容寻址的磁盘缓存：键为 源程序 + 编译器版本 + 阶段 + 选项 的哈希
+
+    值用 pickle 序列化再经 zlib 压缩，每个条目一个文件，按键的前两位分子目录。
+    写入时先写同目录下的临时文件再 os.replace，多个批量编译进程共用一个目录也不会读到半个文件。
+    命中时更新文件的修改时间，总大小超过 max_bytes 时按修改时间淘汰最久未用的条目（LRU）。
+    各进程各自估计目录大小，第一次写入时才扫描目录得出初值，估计超限时再扫描目录，淘汰到上限的 90%。
+
+    条目读出时直接 pickle.loads，能写入缓存目录的人就能让编译器执行任意代码。
+    目录按 0700 创建，默认位于用户自己的缓存目录下；不要把缓存目录设在其他用户可写的位置。
+    """
+
+    def __init__(self, directory=DEFAULT_DIRECTORY, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.evictions = 0
+        self.errors = 0
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+        # 目录中条目的总大小，第一次写入或查看统计时才扫描目录
+        self.size = None
+
+    def key(self, stage, source, options=()):
+        digest = hashlib.sha256()
+        digest.update(f'{compiler_version()}\0{stage}\0{options!r}\0'.encode())
+        digest.update(source.encode('utf-8', 'surrogatepass'))
+        return digest.hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], key[2:])
+
+    def get(self, key):
+        """取出缓存的值，没有时返回 None"""
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            value = pickle.loads(zlib.decompress(data))
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        except Exception:
+            # 损坏的条目当作未命中，随后会被覆盖
+            self.errors += 1
+            self.misses += 1
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        """写入一个条目；无法序列化的值（如嵌套过深的语法树）不缓存，返回 False"""
+        try:
+            data = zlib.compress(pickle.dumps(value, pickle.HIGHEST_PROTOCOL), 1)
+        except (RecursionError, pickle.PicklingError, TypeError):
+            self.errors += 1
+            return False
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, temp = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(temp, path)
+        except OSError:
+            self.errors += 1
+            try:
+                os.unlink(temp)
+            except OSError:
+                pass
+            return False
+        self.writes += 1
+        if self.size is None:
+            self.size = sum(size for _, size, _ in self._entries())
+        else:
+            self.size += len(data)
+        if self.size > self.max_bytes:
+            self.evict()
+        return True
+
+    def lookup(self, stage, source, compute, options=()):
+        """取缓存的结果，未命中时调用 compute() 计算并写入"""
+        key = self.key(stage, source, options)
+        value = self.get(key)
+        if value is None:
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def _entries(self):
+        """目录中的 (路径, 大小, 修改时间)，跳过写到一半的临时文件"""
+        for sub in os.scandir(self.directory):
+            if not sub.is_dir():
+                continue
+            for entry in os.scandir(sub.path):
+                if entry.name.startswith('.tmp'):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                yield entry.path, stat.st_size, stat.st_mtime
+
+    def evict(self, target=None):
+        """按最近使用时间淘汰条目，直到总大小不超过 target（默认为上限的 90%）"""
+        target = self.max_bytes * 9 // 10 if target is None else target
+        entries = sorted(self._entries(), key=lambda entry: entry[2])
+        size = sum(entry[1] for entry in entries)
+        for path, length, _ in entries:
+            if size <= target:
+                break
+            try:
+                os.unlink(path)
+                self.evictions += 1
+            except FileNotFoundError:
+                # 其他进程已经删除
+                pass
+            size -= length
+        self.size = size
+
+    def clear(self):
+        self.evict(0)
+
+    def stats(self):
+        if self.size is None:
+            self.size = sum(size for _, size, _ in self._entries())
+        lookups = self.hits + self.misses
+        return {'hits': self.hits, 'misses': self.misses, 'hit_rate': self.hits / lookups if lookups else 0.0,
+                'writes': self.writes, 'evictions': self.evictions, 'errors': self.errors,
+                'bytes': self.size, 'max_bytes': self.max_bytes}
+
+
+def cached_bianyi(source, huancun=None, tongji=None):
+    """带缓存的 zhongjian.bianyi：单词序列、语法树、四元式和汇编作为一个条目缓存
+
+    给出 tongji 时用另一个键，条目中同时存下各阶段的统计记录；命中时把它们复制到 tongji 中，
+    这些记录标上 cached 且不带耗时（阶段并没有执行），tongji 的总耗时只含查缓存的时间。
+    """
+    if huancun is None:
+        return bianyi(source, tongji)
+    if tongji is None:
+        key = huancun.key('bianyi', source)
+        result = huancun.get(key)
+        if result is None:
+            result = bianyi(source)
+            huancun.put(key, result)
+        return result
+
+    key = huancun.key('bianyi', source, ('tongji',))
+    with tongji.phase('huancun') as record:
+        entry = huancun.get(key)
+    record['hit'] = entry is not None
+    if entry is None:
+        result = bianyi(source, tongji)
+        phases = {name: dict(phase) for name, phase in tongji.phases.items() if name != 'huancun'}
+        huancun.put(key, (result, phases))
+        return result
+    result, phases = entry
+    for name, phase in phases.items():
+        phase.pop('seconds', None)
+        phase['cached'] = True
+        tongji.phases[name] = phase
+    return result
+
+
+# 测试代码
+if __name__ == '__main__':
+    import shutil
+    import time
+    from jizhun import Yuliao
+
+    directory = tempfile.mkdtemp()
+    try:
+        huancun = Huancun(directory, max_bytes=2 * 2 ** 20)
+        sources = [Yuliao(seed).generate('mixed', 16 * 1024) for seed in range(40)]
+        for label in ("冷", "热"):
+            start = time.perf_counter()
+            results = [cached_bianyi(source, huancun) for source in sources]
+            print(f"{label}缓存：{(time.perf_counter() - start) * 1000:.0f} ms，{huancun.stats()}")
+        assert all(result['asm'] == cached_bianyi(source)['asm'] for source, result in zip(sources, results))
+
+        # 命中时仍给出各阶段的统计
+        from tongji import Tongji
+        cold, warm = Tongji(), Tongji()
+        cached_bianyi(sources[0], huancun, cold)
+        cached_bianyi(sources[0], huancun, warm)
+        assert warm.phases['huancun']['hit'] and warm.phases['yufa']['nodes'] == cold.phases['yufa']['nodes']
+        print("命中时的统计：", warm.summary())
+
+        # 淘汰：只保留最近用过的条目
+        small = Huancun(directory, max_bytes=200 * 1024)
+        small.evict()
+        print(f"上限 200 KB 时淘汰 {small.evictions} 个条目，剩余 {small.size} 字节")
+    finally:
+        shutil.rmtree(directory)
@@ -0,0 +1,6 @@
+"""编译器各阶段的基准测试：合成不同形状、不同大小的 C 语料，分阶段测耗时、吞吐量、峰值内存和规模指数
+
+命令行用法见 python -m jizhun --help。
+"""
+from .yuliao import SHAPES, Yuliao, parse_size, format_size
+from .yunxing import PHASES, benchmark, compare, exponent, measure
@@ -0,0 +1,62 @@
+import argparse
+import json
+
+from .yuliao import SHAPES, parse_size
+from .yunxing import PHASES, benchmark, compare
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m jizhun', description="分阶段基准测试")
+    parser.add_argument('--sizes', default='1K,10K,100K,1M',
+                        help="语料大小，逗号分隔，可用 K/M/G 后缀（1024 进制），最大可到 100M（默认 %(default)s）")
+    parser.add_argument('--shapes', default=','.join(SHAPES),
+                        help="语料形状，逗号分隔（默认全部：%(default)s）")
+    parser.add_argument('--repeat', type=int, default=3, help="计时重复次数，取最小值（默认 %(default)s）")
+    parser.add_argument('--seed', type=int, default=0, help="语料随机种子（默认 %(default)s）")
+    parser.add_argument('--no-memory', action='store_true', help="不用 tracemalloc 测峰值内存（大语料时省时间）")
+    parser.add_argument('-o', '--output', default='jizhun.json', help="结果 JSON 文件（默认 %(default)s）")
+    parser.add_argument('--compare', metavar='OLD.json', help="与之前保存的结果比较耗时")
+    args = parser.parse_args(argv)
+
+    shapes = [shape.strip() for shape in args.shapes.split(',') if shape.strip()]
+    for shape in shapes:
+        if shape not in SHAPES:
+            parser.error(f"未知的语料形状：{shape}，可选 {', '.join(SHAPES)}")
+    sizes = [parse_size(size) for size in args.sizes.split(',') if size.strip()]
+
+    print(f"{'形状':<12}{'大小':>6}  " + ''.join(f'{phase:>26}' for phase in PHASES))
+    print(f"{'':<12}{'':>6}  " + ''.join(f'{"秒 / MB/s / 峰值MB":>22}' for _ in PHASES))
+
+    def progress(entry):
+        cells = []
+        for phase in PHASES:
+            result = entry['phases'].get(phase)
+            if result is None:
+                cells.append(f'{"-":>26}')
+                continue
+            peak = f"{result['peak_mb']:.1f}" if result['peak_mb'] is not None else '-'
+            cells.append(f"{result['seconds']:>10.4f} {result['mb_per_s'] or 0:>8.2f} {peak:>6}")
+        print(f"{entry['shape']:<12}{entry['size']:>6}  " + ''.join(cells), flush=True)
+
+    report = benchmark(shapes, sizes, args.repeat, not args.no_memory, args.seed, progress)
+
+    print("\n规模指数（耗时 ∝ 大小^k）")
+    for shape, exponents in report['exponents'].items():
+        print(f"{shape:<12}" + ''.join(f'{phase}={k:.2f}  ' if k is not None else f'{phase}=-  '
+                                       for phase, k in exponents.items()))
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\n结果已保存到 {args.output}")
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            old = json.load(f)
+        print(f"\n与 {args.compare}（{old['meta'].get('commit')}）比较：")
+        for shape, size, phase, before, after, ratio in compare(old, report):
+            mark = '  变慢' if ratio and ratio > 1.1 else ('  变快' if ratio and ratio < 0.9 else '')
+            print(f"{shape:<12}{size:>6} {phase:<12} {before:.4f} -> {after:.4f} s  ({ratio:.2f}x){mark}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+"""命令行编译器的冷启动检查：python -m jizhun.qidong [--budget 毫秒]
+
+在新的解释器进程中运行 bianyi.py 编译一个小程序，取多次中的最短耗时与预算比较，
+并确认导入 bianyi 不会连带导入 PyQt5 或 pandas。超出预算或导入了重依赖时退出码为1，可放进 CI。
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = ('PyQt5', 'pandas', 'numpy')
+SOURCE = 'main() { int a = 5; if (a > 0) { a = a + 1; } else { a = a - 1; } while (a < 10) { a = a * 2; } }\n'
+
+
+def cold_start(path, runs=5):
+    """在新进程中编译 path 的最短耗时（秒）
+
+    不使用磁盘缓存：否则第一次之后都是命中缓存，量的不是冷启动编译，还会写进用户的缓存目录。
+    """
+    best = None
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, os.path.join(ROOT, 'bianyi.py'), '--no-cache', path], check=True,
+                       stdout=subprocess.DEVNULL, cwd=ROOT)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def cold_start_interpreter(runs=5):
+    """空解释器的启动耗时（秒），作为参照"""
+    best = None
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, '-c', 'pass'], check=True)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def heavy_imports():
+    """导入 bianyi 后已载入的重依赖"""
+    check = f'import sys, bianyi; print(" ".join(m for m in {HEAVY_MODULES!r} if m in sys.modules))'
+    output = subprocess.run([sys.executable, '-c', check], check=True, capture_output=True, text=True, cwd=ROOT)
+    return output.stdout.split()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m jizhun.qidong', description="命令行编译器冷启动检查")
+    parser.add_argument('--budget', type=float, default=250, help="冷启动预算，毫秒（默认 %(default)s）")
+    parser.add_argument('--runs', type=int, default=5, help="运行次数，取最短（默认 %(default)s）")
+    args = parser.parse_args(argv)
+
+    with tempfile.NamedTemporaryFile('w', suffix='.c', delete=False, encoding='utf-8') as f:
+        f.write(SOURCE)
+    try:
+        baseline = cold_start_interpreter(args.runs)
+        elapsed = cold_start(f.name, args.runs)
+    finally:
+        os.unlink(f.name)
+    heavy = heavy_imports()
+
+    print(f"空解释器 {baseline * 1000:.0f} ms，bianyi.py 冷启动并编译 {elapsed * 1000:.0f} ms，"
+          f"预算 {args.budget:.0f} ms")
+    ok = True
+    if heavy:
+        print(f"失败：导入 bianyi 时载入了 {', '.join(heavy)}")
+        ok = False
+    if elapsed * 1000 > args.budget:
+        print("失败：超出冷启动预算")
+        ok = False
+    if ok:
+        print("通过")
+    return 0 if ok else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,147 @@
+"""合成 C 语料：按形状和大小生成测试程序"""
+import random
+
+SHAPES = ('mixed', 'comment', 'expression', 'nesting', 'errors', 'numeric')
+UNITS = {'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3}
+OPERATORS = ('+', '-', '*', '/', '%', '&', '|')
+COMPARISONS = ('>', '<', '>=', '<=', '==', '!=')
+
+
+def parse_size(text):
+    """'1K'、'10M'、'4096' 之类的大小换算成字节数"""
+    text = text.strip().upper().rstrip('B')
+    if text and text[-1] in UNITS:
+        return int(float(text[:-1]) * UNITS[text[-1]])
+    return int(text)
+
+
+def format_size(size):
+    for unit in ('G', 'M', 'K'):
+        if size >= UNITS[unit] and size % UNITS[unit] == 0:
+            return f'{size // UNITS[unit]}{unit}'
+    return str(size)
+
+
+class Yuliao:
+    """按形状生成合成 C 程序
+
+    mixed       一般的赋值、if/while 语句
+    comment     大量 // 与 /* */ 注释，代码稀疏
+    expression  每条语句几百个运算对象的长表达式
+    nesting     深层嵌套的 if/while 与多层括号
+    errors      大量语法错误：缺分号、缺运算对象、括号不配对、多余的右大括号
+    numeric     密集的数值常量：整数、小数、科学计数法（Yufa 还不接受十六进制、八进制，不生成）
+    """
+
+    def __init__(self, seed=0):
+        self.rng = random.Random(seed)
+        self.names = [f'v{i}' for i in range(64)]
+
+    def generate(self, shape, size):
+        """生成约 size 字节的程序"""
+        if shape not in SHAPES:
+            raise ValueError(f"未知的语料形状：{shape}")
+        unit = {'mixed': self._mixed, 'comment': self._comment, 'expression': self._long_expression,
+                'nesting': self._nesting, 'errors': self._errors, 'numeric': self._numeric}[shape]
+        parts = ['main() {\n']
+        total = len(parts[0])
+        # 先生成有限个不同的片段再循环使用，大文件也能很快生成
+        pieces = []
+        while total < size:
+            if len(pieces) < 256:
+                piece = unit()
+                pieces.append(piece)
+            else:
+                piece = pieces[self.rng.randrange(len(pieces))]
+            parts.append(piece)
+            total += len(piece.encode('utf-8'))
+        parts.append('}\n')
+        return ''.join(parts)
+
+    def _name(self):
+        return self.rng.choice(self.names)
+
+    def _operand(self):
+        return self._name() if self.rng.random() < 0.6 else str(self.rng.randint(0, 999))
+
+    def _expression(self, operands):
+        rng = self.rng
+        out = [self._operand()]
+        for _ in range(operands - 1):
+            out.append(rng.choice(OPERATORS))
+            out.append(self._operand())
+        return ' '.join(out)
+
+    def _condition(self):
+        # & 和 | 的优先级低于比较运算，左侧加括号
+        return f'({self._expression(2)}) {self.rng.choice(COMPARISONS)} {self._operand()}'
+
+    def _mixed(self):
+        rng = self.rng
+        lines = []
+        for _ in range(8):
+            r = rng.random()
+            if r < 0.6:
+                lines.append(f'    {self._name()} = {self._expression(rng.randint(1, 6))};\n')
+            elif r < 0.8:
+                lines.append(f'    if ({self._condition()}) {{\n        {self._name()} = {self._expression(3)};\n'
+                             f'    }} else {{\n        {self._name()} = {self._operand()};\n    }}\n')
+            else:
+                lines.append(f'    while ({self._condition()}) {{\n        {self._name()} = {self._expression(2)};\n'
+                             f'    }}\n')
+        return ''.join(lines)
+
+    def _comment(self):
+        rng = self.rng
+        words = ' '.join(rng.choice(('注释', 'comment', 'TODO', '计算', 'value', 'x = y + 1;', '/ * *'))
+                         for _ in range(rng.randint(8, 30)))
+        if rng.random() < 0.5:
+            return f'    // {words}\n    /* {words}\n       {words} */\n    {self._name()} = {self._operand()};\n'
+        return f'    /* {words} */ {self._name()} = {self._expression(2)}; // {words}\n'
+
+    def _long_expression(self):
+        return f'    {self._name()} = {self._expression(self.rng.randint(100, 400))};\n'
+
+    def _nesting(self):
+        rng = self.rng
+        depth = rng.randint(10, 40)
+        out = []
+        for level in range(depth):
+            indent = '    ' * (level + 1)
+            keyword = 'if' if rng.random() < 0.7 else 'while'
+            out.append(f'{indent}{keyword} ({self._condition()}) {{\n')
+        parens = rng.randint(20, 200)
+        out.append('    ' * (depth + 1) + f'{self._name()} = ' + '(' * parens + self._operand()
+                   + ''.join(f' {rng.choice(OPERATORS)} {self._operand()})' for _ in range(parens)) + ';\n')
+        for level in range(depth - 1, -1, -1):
+            out.append('    ' * (level + 1) + '}\n')
+        return ''.join(out)
+
+    def _errors(self):
+        rng = self.rng
+        kind = rng.randrange(6)
+        if kind == 0:
+            return f'    {self._name()} = {self._expression(3)}\n'
+        if kind == 1:
+            return f'    {self._name()} = {self._operand()} * ;\n'
+        if kind == 2:
+            return f'    {self._name()} = ({self._expression(3)};\n'
+        if kind == 3:
+            return f'    if {self._condition()} {{ {self._name()} = 1; }}\n'
+        if kind == 4:
+            return '    }\n'
+        return f'    {self._name()} = {self._expression(2)};\n'
+
+    def _numeric(self):
+        rng = self.rng
+        literals = []
+        for _ in range(rng.randint(10, 30)):
+            kind = rng.randrange(3)
+            if kind == 0:
+                literals.append(str(rng.randint(0, 10 ** 9)))
+            elif kind == 1:
+                literals.append(f'{rng.uniform(0, 1000):.{rng.randint(1, 8)}f}')
+            else:
+                literals.append(f'{rng.randint(1, 9)}.{rng.randint(0, 99)}e{rng.choice("+-")}{rng.randint(0, 30)}')
+        return f'    {self._name()} = ' + ' + '.join(literals) + ';\n'
+
@@ -0,0 +1,158 @@
+"""分阶段计时、测峰值内存、拟合规模指数"""
+import gc
+import math
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+from cifa import Cifa
+from yufa import Yufa
+from zhongjian import Zhongjian
+from Mubiao import Mubiao
+
+from .yuliao import Yuliao, format_size
+
+PHASES = ('cifa', 'yufa', 'zhongjian', 'mubiao')
+
+
+def _phases(source):
+    """依次执行各阶段，逐个产出 (阶段名, 要调用的函数)；函数的返回值作为下一阶段的输入"""
+    tokens = yield 'cifa', lambda: Cifa().cifafenxi(source)
+    ast = yield 'yufa', lambda: Yufa().parse(tokens)
+    # 有语法错误时与 bianyi 一致，不再生成代码
+    if ast.errors:
+        return
+    quads = yield 'zhongjian', lambda: Zhongjian(len(tokens) * 2).generate(ast)
+    yield 'mubiao', lambda: Mubiao(quads).generate()
+
+
+def _drive(source, measure):
+    results = {}
+    phases = _phases(source)
+    value = None
+    try:
+        while True:
+            phase, call = phases.send(value)
+            value, results[phase] = measure(call)
+    except StopIteration:
+        pass
+    return results
+
+
+def _timed(call):
+    gc.collect()
+    start = time.perf_counter()
+    value = call()
+    return value, time.perf_counter() - start
+
+
+def _traced(call):
+    gc.collect()
+    tracemalloc.start()
+    try:
+        value = call()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return value, peak
+
+
+def measure(source, repeat=1, memory=True):
+    """对一份源程序分阶段计时（取 repeat 次中的最小值），另跑一遍用 tracemalloc 测各阶段峰值内存
+
+    返回 {阶段: {'seconds', 'mb_per_s', 'peak_mb'}}。有语法错误时只有 cifa 和 yufa 两个阶段。
+    """
+    megabytes = len(source.encode('utf-8')) / 2 ** 20
+    best = {}
+    for _ in range(repeat):
+        for phase, seconds in _drive(source, _timed).items():
+            best[phase] = min(seconds, best.get(phase, seconds))
+    # tracemalloc 会显著拖慢执行，内存单独测一遍，不影响计时
+    peaks = _drive(source, _traced) if memory else {}
+    results = {}
+    for phase, seconds in best.items():
+        results[phase] = {
+            'seconds': seconds,
+            'mb_per_s': megabytes / seconds if seconds else None,
+            'peak_mb': peaks[phase] / 2 ** 20 if phase in peaks else None,
+        }
+    return results
+
+
+def exponent(points):
+    """最小二乘拟合 log(耗时) = k·log(大小) + c，返回规模指数 k；k≈1 为线性，k≈2 为平方"""
+    points = [(math.log(size), math.log(seconds)) for size, seconds in points if size > 0 and seconds > 0]
+    if len(points) < 2:
+        return None
+    mean_x = sum(x for x, _ in points) / len(points)
+    mean_y = sum(y for _, y in points) / len(points)
+    spread = sum((x - mean_x) ** 2 for x, _ in points)
+    if not spread:
+        return None
+    return sum((x - mean_x) * (y - mean_y) for x, y in points) / spread
+
+
+def _commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def benchmark(shapes, sizes, repeat=1, memory=True, seed=0, progress=None):
+    """对每种形状、每个大小生成语料并分阶段测量，返回可直接写成 JSON 的结果
+
+    progress 为回调函数，每测完一项调用一次，参数为该项结果。
+    """
+    results = []
+    for shape in shapes:
+        for size in sizes:
+            source = Yuliao(seed).generate(shape, size)
+            entry = {'shape': shape, 'size': format_size(size), 'bytes': len(source.encode('utf-8')),
+                     'phases': measure(source, repeat, memory)}
+            del source
+            results.append(entry)
+            if progress:
+                progress(entry)
+
+    exponents = {}
+    for shape in shapes:
+        entries = [entry for entry in results if entry['shape'] == shape]
+        exponents[shape] = {}
+        for phase in PHASES:
+            points = [(entry['bytes'], entry['phases'][phase]['seconds'])
+                      for entry in entries if phase in entry['phases']]
+            exponents[shape][phase] = exponent(points)
+
+    return {
+        'meta': {
+            'commit': _commit(),
+            'time': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'python': sys.version.split()[0],
+            'platform': platform.platform(),
+            'repeat': repeat,
+            'seed': seed,
+        },
+        'results': results,
+        'exponents': exponents,
+    }
+
+
+def compare(old, new):
+    """比较两次测量结果，返回 [(形状, 大小, 阶段, 旧耗时, 新耗时, 新/旧)]"""
+    previous = {(entry['shape'], entry['size']): entry['phases'] for entry in old['results']}
+    rows = []
+    for entry in new['results']:
+        phases = previous.get((entry['shape'], entry['size']))
+        if phases is None:
+            continue
+        for phase in PHASES:
+            if phase in phases and phase in entry['phases']:
+                before = phases[phase]['seconds']
+                after = entry['phases'][phase]['seconds']
+                rows.append((entry['shape'], entry['size'], phase, before, after, after / before if before else None))
+    return rows
@@ -0,0 +1,155 @@
+import re
+
+# 窥孔优化规则
+RULES = ('store_load', 'redundant_load', 'redundant_store', 'redundant_li', 'self_move', 'jump_to_next')
+
+# 写目的寄存器（第一个操作数）的指令
+WRITES_FIRST = {'li', 'lw', 'move', 'add', 'sub', 'and', 'or', 'slt', 'mflo', 'mfhi'}
+INSTRUCTION = re.compile(r'\s+(\w+)\s*(.*)')
+
+
+class Kuikong:
+    """对 Mubiao 生成的 MIPS 指令序列做窥孔优化
+
+    在每个基本块内记录各寄存器中已知的值（某个变量的内存值或某个立即数），据此删除
+    冗余的 lw/sw/li，把从刚存过的变量读回改成寄存器传送；另外删除自传送和跳到紧随其后
+    标签的跳转。counts 记录每条规则生效的次数。
+    """
+
+    def __init__(self, rules=RULES):
+        unknown = set(rules) - set(RULES)
+        if unknown:
+            raise ValueError(f"未知的窥孔优化规则：{', '.join(sorted(unknown))}")
+        self.rules = set(rules)
+        self.counts = dict.fromkeys(RULES, 0)
+
+    def optimize(self, lines):
+        """返回优化后的指令行列表
+
+        删除和改写都在同一遍扫描中反映到已知值和输出上，一遍之后不会再有规则生效。
+        """
+        return self._pass(lines)
+
+    def _fire(self, rule):
+        if rule in self.rules:
+            self.counts[rule] += 1
+            return True
+        return False
+
+    def _pass(self, lines):
+        out = []
+        known = {}  # 寄存器 -> ('mem', 变量, 来源指令) 或 ('imm', 立即数)
+        for line in lines:
+            match = INSTRUCTION.match(line)
+            if not match:
+                if line.endswith(':'):
+                    # 标签是基本块的入口，其他位置可能跳转过来
+                    label = line[:-1]
+                    i = len(out) - 1
+                    while i >= 0 and out[i].endswith(':'):
+                        i -= 1
+                    if i >= 0 and out[i].strip() == f'j {label}' and self._fire('jump_to_next'):
+                        del out[i]
+                known.clear()
+                out.append(line)
+                continue
+
+            op = match.group(1)
+            args = [arg.strip() for arg in match.group(2).split(',')] if match.group(2) else []
+            if op == 'lw':
+                reg, var = args
+                value = known.get(reg)
+                if value and value[0] == 'mem' and value[1] == var:
+                    if self._fire('store_load' if value[2] == 'sw' else 'redundant_load'):
+                        continue
+                holder = next((r for r, v in known.items() if r != reg and v[0] == 'mem' and v[1] == var), None)
+                if holder is not None and self._fire('store_load' if known[holder][2] == 'sw' else 'redundant_load'):
+                    line = f'    move {reg}, {holder}'
+                    known[reg] = known[holder]
+                else:
+                    known[reg] = ('mem', var, 'lw')
+            elif op == 'sw':
+                reg, var = args
+                value = known.get(reg)
+                if value and value[0] == 'mem' and value[1] == var and self._fire('redundant_store'):
+                    continue
+                for r in [r for r, v in known.items() if v[0] == 'mem' and v[1] == var]:
+                    del known[r]
+                known[reg] = ('mem', var, 'sw')
+            elif op == 'li':
+                reg, imm = args
+                if known.get(reg) == ('imm', imm) and self._fire('redundant_li'):
+                    continue
+                known[reg] = ('imm', imm)
+            elif op == 'move':
+                rd, rs = args
+                if rd == rs:
+                    if self._fire('self_move'):
+                        continue
+                elif rs in known:
+                    known[rd] = known[rs]
+                else:
+                    known.pop(rd, None)
+            elif op in WRITES_FIRST:
+                known.pop(args[0], None)
+            out.append(line)
+        return out
+
+
+# 测试代码
+if __name__ == '__main__':
+    import random
+    from cifa import Cifa
+    from yufa import Yufa
+    from zhongjian import Zhongjian, random_program
+    from Mubiao import Mubiao
+    from moni import run
+
+    # 每条规则：手写的含各类冗余的指令序列，每条规则都要生效，优化前后执行结果相同
+    wasteful = [
+        '.data', 'a: .word 0', 'b: .word 0', '', '.text', '.globl main', 'main:',
+        '    lw $t2, b', '    lw $t2, b',            # redundant_load
+        '    li $t0, 5', '    li $t0, 5',            # redundant_li
+        '    sw $t0, a', '    lw $t0, a',            # store_load
+        '    sw $t0, a',                             # redundant_store
+        '    lw $t1, a', '    lw $t1, a',            # redundant_load
+        '    move $t1, $t1',                         # self_move
+        '    add $t1, $t1, $t0', '    sw $t1, b',
+        '    j L1', 'L1:',                           # jump_to_next
+        '    li $v0, 10', '    syscall',
+    ]
+    kuikong = Kuikong()
+    optimized = kuikong.optimize(wasteful)
+    assert all(kuikong.counts[rule] for rule in RULES), kuikong.counts
+    assert run('\n'.join(wasteful))[2] == run('\n'.join(optimized))[2] == {'a': 5, 'b': 10}
+    assert len(optimized) == len(wasteful) - 7, optimized
+    print("每条规则都生效，优化前后执行结果一致：", kuikong.counts)
+
+    # 等价性检查：随机程序优化前后执行结果相同
+    random.seed(2024)
+    totals = {allocator: [0, 0, 0, 0] for allocator in ('memory', 'linear')}
+    counts = {allocator: dict.fromkeys(RULES, 0) for allocator in ('memory', 'linear')}
+    for _ in range(300):
+        ast = Yufa().parse(Cifa().cifafenxi(random_program(random)))
+        quads = Zhongjian().generate(ast)
+        for allocator in ('memory', 'linear'):
+            plain = Mubiao(quads, allocator, peephole=False)
+            optimized = Mubiao(quads, allocator)
+            executed, accesses, memory = run(plain.generate())
+            executed2, accesses2, memory2 = run(optimized.generate())
+            assert memory == memory2, quads
+            assert executed2 <= executed and accesses2 <= accesses, quads
+            totals[allocator][0] += executed
+            totals[allocator][1] += executed2
+            totals[allocator][2] += accesses
+            totals[allocator][3] += accesses2
+            for rule, n in optimized.kuikong.counts.items():
+                counts[allocator][rule] += n
+    print("300 个随机程序优化前后执行结果一致\n")
+
+    print("分配方式\t动态指令数(前/后)\t访存次数(前/后)")
+    for allocator, (executed, executed2, accesses, accesses2) in totals.items():
+        print(f"{allocator}\t\t{executed}/{executed2}\t\t{accesses}/{accesses2}")
+    print("\n规则\t\t\tmemory\tlinear")
+    for rule in RULES:
+        print(f"{rule:<16}\t{counts['memory'][rule]}\t{counts['linear'][rule]}")
@@ -0,0 +1,237 @@
+from Mubiao import TEMP_NAME, ARITHMETIC_OPERATORS, is_constant
+from fuhao import VARIABLE
+
+
+class Liutu:
+    """四元式的控制流图：划分基本块，用位向量迭代求活跃变量，删除死代码和不可达基本块
+
+    变量集合用 Python 整数表示，第 i 位对应编号为 i 的变量，并、差运算都是整数位运算，
+    几万条四元式也能很快收敛。与 Mubiao 一致，用户变量（非 T 开头的临时变量）在出口处活跃。
+    给出符号表 fuhao 时，变量编号就是存储单元的编号，不在符号表中的操作数是常数，
+    出口处活跃的是符号表中的用户变量，不再按名字区分。
+    """
+
+    def __init__(self, quads, fuhao=None):
+        self.quads = list(quads)
+        self.fuhao = fuhao
+        self.removed_dead = 0
+        self.removed_unreachable = 0
+        self._build()
+
+    def _build(self):
+        quads = self.quads
+        n = len(quads)
+        # 基本块入口：第一条四元式、标签、跳转的下一条
+        leaders = {0} if n else set()
+        labels = {}
+        for i, (op, arg1, arg2, result) in enumerate(quads):
+            if op == 'label':
+                leaders.add(i)
+                labels[result] = i
+            elif op == 'goto' or op.startswith('if'):
+                leaders.add(i + 1)
+        starts = sorted(s for s in leaders if s < n)
+        self.blocks = list(zip(starts, starts[1:] + [n]))
+        block_of = {start: b for b, (start, _) in enumerate(self.blocks)}
+        self.label_blocks = {label: block_of[i] for label, i in labels.items()}
+
+        self.successors = []
+        for b, (start, end) in enumerate(self.blocks):
+            op, _, _, result = quads[end - 1]
+            successors = []
+            if op == 'goto' or op.startswith('if'):
+                if result in labels:
+                    successors.append(self.label_blocks[result])
+            if op != 'goto' and not (op == 'program' and result == 'end') and b + 1 < len(self.blocks):
+                successors.append(b + 1)
+            self.successors.append(successors)
+
+        # 变量编号及每条四元式的使用、定值位向量
+        fuhao = self.fuhao
+        if fuhao is not None:
+            self.ids = fuhao.ids
+            number = _not_in(fuhao.ids)
+            variable_id = fuhao.ids.__getitem__
+        else:
+            self.ids = {}
+            number = is_constant
+            variable_id = self._id
+        self.uses = [0] * n
+        self.defs = [0] * n
+        for i, (op, arg1, arg2, result) in enumerate(quads):
+            if op in ('label', 'goto', 'program'):
+                continue
+            use = 0
+            for operand in (arg1, arg2):
+                if operand is not None and not number(operand):
+                    use |= 1 << variable_id(operand)
+            self.uses[i] = use
+            if op == '=' or op in ARITHMETIC_OPERATORS:
+                self.defs[i] = 1 << variable_id(result)
+        self.exit_live = 0
+        if fuhao is not None:
+            for i, kind in enumerate(fuhao.kinds):
+                if kind == VARIABLE:
+                    self.exit_live |= 1 << i
+        else:
+            for name, i in self.ids.items():
+                if not TEMP_NAME.fullmatch(name):
+                    self.exit_live |= 1 << i
+
+    def _id(self, name):
+        i = self.ids.get(name)
+        if i is None:
+            i = self.ids[name] = len(self.ids)
+        return i
+
+    def reachable(self):
+        """从入口可达的基本块集合"""
+        seen = {0} if self.blocks else set()
+        stack = list(seen)
+        while stack:
+            for s in self.successors[stack.pop()]:
+                if s not in seen:
+                    seen.add(s)
+                    stack.append(s)
+        return seen
+
+    def liveness(self):
+        """迭代求解活跃变量，返回每个基本块的 (入口活跃, 出口活跃) 位向量列表"""
+        gen = []
+        kill = []
+        for start, end in self.blocks:
+            use = 0
+            define = 0
+            for i in range(end - 1, start - 1, -1):
+                use = (use & ~self.defs[i]) | self.uses[i]
+                define |= self.defs[i]
+            gen.append(use)
+            kill.append(define)
+
+        count = len(self.blocks)
+        live_in = [0] * count
+        live_out = [0] * count
+        exits = [not successors for successors in self.successors]
+        changed = True
+        while changed:
+            changed = False
+            # 逆序扫描，结构化程序通常两三轮就收敛
+            for b in range(count - 1, -1, -1):
+                out = self.exit_live if exits[b] else 0
+                for s in self.successors[b]:
+                    out |= live_in[s]
+                new_in = gen[b] | (out & ~kill[b])
+                if new_in != live_in[b] or out != live_out[b]:
+                    live_in[b] = new_in
+                    live_out[b] = out
+                    changed = True
+        return list(zip(live_in, live_out))
+
+    def optimize(self):
+        """删除不可达基本块和死赋值，返回新的四元式列表"""
+        keep = [True] * len(self.quads)
+        reachable = self.reachable()
+        for b, (start, end) in enumerate(self.blocks):
+            if b not in reachable:
+                for i in range(start, end):
+                    # 程序开始、结束标记始终保留
+                    if self.quads[i][0] != 'program':
+                        keep[i] = False
+                        self.removed_unreachable += 1
+                self.successors[b] = []
+
+        # 删除一条赋值可能让它的操作数也变成死的，反复求解直到不再删除
+        while True:
+            removed = 0
+            for b, (_, live_out) in enumerate(self.liveness()):
+                if b not in reachable:
+                    continue
+                start, end = self.blocks[b]
+                live = live_out
+                for i in range(end - 1, start - 1, -1):
+                    if not keep[i]:
+                        continue
+                    define = self.defs[i]
+                    if define and not live & define:
+                        keep[i] = False
+                        self.uses[i] = self.defs[i] = 0
+                        removed += 1
+                        continue
+                    live = (live & ~define) | self.uses[i]
+            self.removed_dead += removed
+            if not removed:
+                break
+        return [quad for quad, k in zip(self.quads, keep) if k]
+
+
+def _not_in(ids):
+    """有符号表时的常数判断：不是符号表中的名字"""
+    def number(operand):
+        return operand not in ids
+    return number
+
+
+# 测试代码
+if __name__ == '__main__':
+    import random
+    import time
+    from cifa import Cifa
+    from yufa import Yufa
+    from zhongjian import Zhongjian, random_program
+    from Mubiao import Mubiao
+    from moni import run
+
+    source = '''
+    main() {
+        a = 5;
+        b = a * 2;
+        b = 7;
+        a + b;
+        c = (a > b) + 1;
+        while (a < 10) {
+            t = a * 3;
+            a = a + 1;
+        }
+        d = a;
+    }
+    '''
+    quads = Zhongjian().generate(Yufa().parse(Cifa().cifafenxi(source)))
+    liutu = Liutu(quads)
+    optimized = liutu.optimize()
+    print(f"{len(liutu.blocks)} 个基本块")
+    for b, (start, end) in enumerate(liutu.blocks):
+        print(f"B{b}: 四元式 {start}-{end - 1}，后继 {liutu.successors[b]}")
+    print(f"\n删除死赋值 {liutu.removed_dead} 条，不可达四元式 {liutu.removed_unreachable} 条：")
+    for quad in optimized:
+        print(quad)
+
+    # 等价性检查
+    random.seed(7)
+    before = after = 0
+    for _ in range(300):
+        quads = Zhongjian().generate(Yufa().parse(Cifa().cifafenxi(random_program(random))))
+        optimized = Liutu(quads).optimize()
+        executed, _, memory = run(Mubiao(quads).generate())
+        executed2, _, memory2 = run(Mubiao(optimized).generate())
+        # 只在死代码里出现的变量不再分配内存，它的值始终是初值0
+        assert all(memory.get(name, 0) == memory2.get(name, 0) for name in memory.keys() | memory2.keys()), quads
+        before += executed
+        after += executed2
+    print(f"\n300 个随机程序删除死代码前后执行结果一致，动态指令数 {before} -> {after}")
+
+    # 形如浮点数特殊值的变量名也是变量，被读取的赋值不能删
+    quads = Zhongjian().generate(Yufa().parse(Cifa().cifafenxi('main() { inf = 3; y = inf + 1; inf = 5; }')))
+    assert run(Mubiao(Liutu(quads).optimize()).generate())[2]['y'] == 4
+
+    # 规模：循环、分支和被覆盖的赋值
+    print("\n四元式数\t基本块数\t变量数\t耗时(ms)\t删除数")
+    for n in (2500, 5000, 10000, 20000, 40000):
+        body = ''.join(f'x{i} = x{i - 1} * 3 + {i} % 7;\nx{i} + y;\nt = x{i} * 2;\n'
+                       f'while (y < {i}) {{ y = y + x{i}; t = {i}; }}\n'
+                       for i in range(1, n // 14 + 1))
+        quads = Zhongjian().generate(Yufa().parse(Cifa().cifafenxi('main() {\nx0 = 1;\ny = 0;\n' + body + '}\n')))
+        start = time.perf_counter()
+        liutu = Liutu(quads)
+        optimized = liutu.optimize()
+        elapsed = (time.perf_counter() - start) * 1000
+        print(f"{len(quads)}\t\t{len(liutu.blocks)}\t\t{len(liutu.ids)}\t{elapsed:.1f}\t\t{len(quads) - len(optimized)}")
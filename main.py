@@ -1,22 +1,23 @@
-from PyQt5.QtWidgets import (QMainWindow, QApplication, QTextEdit, QTableWidget, QTableWidgetItem,
-                           QFileDialog, QMessageBox, QAction, QStyleFactory, QVBoxLayout, QWidget,
-                           QDialog, QLabel)
-from PyQt5.QtGui import QFont, QPixmap
-from PyQt5.QtCore import Qt
+from PyQt5.QtWidgets import (QMainWindow, QApplication, QPlainTextEdit, QTableView, QTreeView, QHeaderView,
+                           QFileDialog, QMessageBox, QAction, QStyleFactory, QVBoxLayout, QHBoxLayout, QWidget,
+                           QDialog, QLineEdit, QCheckBox, QStackedWidget)
+from PyQt5.QtGui import QFont, QTextCursor
+from PyQt5.QtCore import Qt, QTimer
 import sys
-import pandas as pd
-from cifa import Cifa
-from yufa import Yufa
-# import graphviz
-import tempfile
-import os
+from cifa import TokenBuffer
+from moxing import TokenModel, AstModel
+from shutu import ShutuView
+from gaoliang import Gaoliang
+from hangbiao import Zhenduan
+from houtai import Houtai, release_later
+from tongji import Tongji
+from huancun import Huancun
 
 class SyntaxTreeDialog(QDialog):
-    """语法树显示对话框"""
+    """语法树显示对话框：点击结点折叠/展开，滚轮缩放，拖动平移"""
     def __init__(self, parent=None):
         super().__init__(parent)
         self.setWindowTitle('语法树可视化')
-        self.setModal(True)
         
         # 设置对话框大小
         self.resize(800, 600)
@@ -25,40 +26,62 @@ class SyntaxTreeDialog(QDialog):
         layout = QVBoxLayout()
         self.setLayout(layout)
         
-        # 创建图片标签
-        self.image_label = QLabel()
-        self.image_label.setAlignment(Qt.AlignCenter)
-        layout.addWidget(self.image_label)
+        # 语法树图：只绘制展开的部分，布局按树的结构缓存
+        self.view = ShutuView()
+        layout.addWidget(self.view)
         
         # 设置样式
         self.setStyleSheet("""
             QDialog {
                 background-color: #252525;
             }
-            QLabel {
-                color: #e0e0e0;
+            QGraphicsView {
+                border: 1px solid #404040;
             }
         """)
 
-    def show_tree(self, dot):
-        """显示语法树图片"""
-        # 创建临时文件
-        temp_dir = tempfile.gettempdir()
-        temp_path = os.path.join(temp_dir, 'syntax_tree')
-        
-        # 渲染图片
-        dot.render(temp_path, format='png', cleanup=True)
-        
-        # 加载并显示图片
-        pixmap = QPixmap(temp_path + '.png')
-        scaled_pixmap = pixmap.scaled(self.size(), Qt.KeepAspectRatio, Qt.SmoothTransformation)
-        self.image_label.setPixmap(scaled_pixmap)
+    def show_tree(self, ast, structure=None):
+        """显示语法树；structure 为后台分析算出的结构哈希。对话框打开期间一直持有这棵树"""
+        self.view.set_root(ast, structure)
+
+    def root(self):
+        return self.view.root
 
 class TextEditor(QMainWindow):
+    LIVE_DELAY = 300
+    # 子结点超过这个数的结点不自动展开
+    AUTO_EXPAND_LIMIT = 2000
+
     def __init__(self):
         super().__init__()
         self.data = ""
         self.tokens = []
+        # 自上次词法分析以来文本的修改范围：(不变前缀长度, 不变后缀长度)
+        self.dirty = None
+        # 最近一次语法分析的错误，以及“下一个错误”上次选中的是第几个（或第几个单词）
+        self.diagnostics = []
+        self.error_index = -1
+        # 当前语法树的结构哈希，以及打开着的语法树图对话框
+        self.structure = None
+        self.treeDialogs = []
+        # 最近一次分析的各阶段统计，显示在状态栏
+        self.tongji = Tongji()
+        # 磁盘缓存：未改动的文本直接取缓存的单词序列和语法树
+        try:
+            self.huancun = Huancun()
+        except OSError:
+            self.huancun = None
+        # 分析在后台线程进行；interactive 为真时分析结束后弹窗提示错误
+        self.houtai = Houtai(self)
+        self.houtai.finished.connect(self.on_analysed)
+        self.houtai.failed.connect(self.on_analysis_failed)
+        self.houtai.busy.connect(self.on_busy)
+        self.interactive = False
+        # 实时分析：最后一次输入后停顿 LIVE_DELAY 毫秒再分析
+        self.liveTimer = QTimer(self)
+        self.liveTimer.setSingleShot(True)
+        self.liveTimer.setInterval(self.LIVE_DELAY)
+        self.liveTimer.timeout.connect(lambda: self.analyse(parse=True, interactive=False))
         self.initUI()
 
     def initUI(self):
@@ -72,11 +95,11 @@ class TextEditor(QMainWindow):
         self.layout.setSpacing(10)  # 控件间距
         self.layout.setContentsMargins(10, 10, 10, 10)  # 外边距
 
-        # 输入文本编辑区
-        self.textEdit = QTextEdit()
+        # 输入文本编辑区：QPlainTextEdit 按块布局，大文件中输入也不必重排整个文档
+        self.textEdit = QPlainTextEdit()
         self.textEdit.setFont(QFont('Consolas', 12))
         self.textEdit.setStyleSheet("""
-            QTextEdit {
+            QPlainTextEdit {
                 background-color: #1e1e1e;
                 color: #e0e0e0;
                 border: 1px solid #404040;
@@ -85,16 +108,18 @@ class TextEditor(QMainWindow):
                 selection-background-color: #4a90e2;
                 selection-color: #ffffff;
             }
-            QTextEdit:focus {
+            QPlainTextEdit:focus {
                 border: 1px solid #4a90e2;
             }
         """)
+        # 语法高亮：逐行词法分析，只重新高亮改动的行
+        self.highlighter = Gaoliang(self.textEdit)
+        self.textEdit.document().contentsChange.connect(self.on_contents_change)
         self.layout.addWidget(self.textEdit)
 
-        # 结果展示表格
-        self.tableWidget = QTableWidget()
-        self.tableWidget.setStyleSheet("""
-            QTableWidget {
+        # 结果展示：单词表和语法树都是模型/视图，只生成可见的行
+        view_style = """
+            QTableView, QTreeView {
                 background-color: #1e1e1e;
                 color: #e0e0e0;
                 border: 1px solid #404040;
@@ -111,14 +136,53 @@ class TextEditor(QMainWindow):
                 border-bottom: 1px solid #404040;
                 font-weight: bold;
             }
-            QTableWidget::item {
+            QTableView::item, QTreeView::item {
                 padding: 4px;
             }
-            QTableWidget::item:selected {
+            QTableView::item:selected, QTreeView::item:selected {
                 background-color: #4a90e2;
             }
-        """)
-        self.layout.addWidget(self.tableWidget)
+        """
+        self.tokenModel = TokenModel()
+        self.tokenView = QTableView()
+        self.tokenView.setModel(self.tokenModel)
+        # 默认不排序：否则每次载入新结果都要按第一列排一遍
+        self.tokenView.horizontalHeader().setSortIndicator(-1, Qt.AscendingOrder)
+        self.tokenView.setSortingEnabled(True)
+        # 表头不按内容计算宽度，否则要遍历所有行
+        self.tokenView.horizontalHeader().setSectionResizeMode(QHeaderView.Interactive)
+        self.tokenView.horizontalHeader().setStretchLastSection(True)
+        self.tokenView.verticalHeader().setDefaultSectionSize(24)
+        self.tokenView.setStyleSheet(view_style)
+
+        self.astModel = AstModel()
+        self.astView = QTreeView()
+        self.astView.setModel(self.astModel)
+        self.astView.setUniformRowHeights(True)
+        # 固定第一列宽度：按内容调整要遍历所有展开的行
+        self.astView.setColumnWidth(0, 240)
+        self.astView.setStyleSheet(view_style)
+
+        # 单词表筛选
+        filter_style = "color: #e0e0e0; background-color: #1e1e1e; border: 1px solid #404040; padding: 4px;"
+        self.filterEdit = QLineEdit()
+        self.filterEdit.setPlaceholderText('筛选单词的值或类型')
+        self.filterEdit.setStyleSheet(filter_style)
+        self.filterEdit.textChanged.connect(self.apply_filter)
+        self.illegalOnly = QCheckBox('只显示非法单词')
+        self.illegalOnly.setStyleSheet("color: #e0e0e0;")
+        self.illegalOnly.toggled.connect(self.apply_filter)
+        self.filterBar = QWidget()
+        filter_layout = QHBoxLayout(self.filterBar)
+        filter_layout.setContentsMargins(0, 0, 0, 0)
+        filter_layout.addWidget(self.filterEdit)
+        filter_layout.addWidget(self.illegalOnly)
+        self.layout.addWidget(self.filterBar)
+
+        self.resultStack = QStackedWidget()
+        self.resultStack.addWidget(self.tokenView)
+        self.resultStack.addWidget(self.astView)
+        self.layout.addWidget(self.resultStack)
 
         # 菜单栏
         menubar = self.menuBar()
@@ -166,6 +230,17 @@ class TextEditor(QMainWindow):
         
         yufaFenxi = QAction('语法分析', self)
         yufaFenxi.triggered.connect(self.yufa_fenxi)
+
+        treeAction = QAction('语法树图', self)
+        treeAction.triggered.connect(self.show_syntax_tree)
+
+        nextError = QAction('下一个错误', self)
+        nextError.setShortcut('F8')
+        nextError.triggered.connect(self.next_error)
+
+        self.liveAction = QAction('实时分析', self)
+        self.liveAction.setCheckable(True)
+        self.liveAction.toggled.connect(self.toggle_live)
         
         # 工具栏
         toolbar = self.addToolBar('工具栏')
@@ -189,10 +264,23 @@ class TextEditor(QMainWindow):
             }
         """)
         
+        # 状态栏：显示各阶段耗时和计数
+        self.statusBar().setStyleSheet("""
+            QStatusBar {
+                background-color: #2d2d2d;
+                color: #e0e0e0;
+                border-top: 1px solid #404040;
+            }
+        """)
+
         fileMenu.addAction(newFile)
         fileMenu.addAction(openFile)
         FenxiMenu.addAction(cifaFenxi)
         FenxiMenu.addAction(yufaFenxi)
+        FenxiMenu.addAction(treeAction)
+        FenxiMenu.addAction(nextError)
+        FenxiMenu.addSeparator()
+        FenxiMenu.addAction(self.liveAction)
         
         # 窗口设置
         self.setGeometry(100, 100, 800, 600)
@@ -208,84 +296,220 @@ class TextEditor(QMainWindow):
         if not hasattr(self, 'tokens') or not self.tokens:
             QMessageBox.warning(self, '警告', '请先进行词法分析！')
             return
-        
-        yufa = Yufa()
-        ast = yufa.parse(self.tokens)
-        
-        # 显示语法分析结果
-        if ast:
-            # 创建结果表格
-            self.tableWidget.clear()
-            self.tableWidget.setRowCount(0)
-            self.tableWidget.setColumnCount(3)
-            self.tableWidget.setHorizontalHeaderLabels(['类型', '运算符/值', '说明'])
-            
-            # 递归显示语法树结果
-            def show_ast(node, description=''):
-                if not node or not isinstance(node, dict):
-                    return
-                
-                row = self.tableWidget.rowCount()
-                self.tableWidget.insertRow(row)
-                
-                if node['type'] == 'binary_expression':
-                    self.tableWidget.setItem(row, 0, QTableWidgetItem('运算符'))
-                    self.tableWidget.setItem(row, 1, QTableWidgetItem(node['operator']))
-                    self.tableWidget.setItem(row, 2, QTableWidgetItem(description))
-                    
-                    show_ast(node.get('left'), '左操作数')
-                    show_ast(node.get('right'), '右操作数')
-                    
-                elif node['type'] == 'number':
-                    self.tableWidget.setItem(row, 0, QTableWidgetItem('数值'))
-                    self.tableWidget.setItem(row, 1, QTableWidgetItem(node['value']))
-                    self.tableWidget.setItem(row, 2, QTableWidgetItem(description))
-            
-            show_ast(ast)
-            self.tableWidget.resizeColumnsToContents()
-        
-        # 显示错误信息
-        if ast and ast.get('errors'):
-            error_msg = '\n'.join(ast['errors'])
-            QMessageBox.warning(self, '语法错误', error_msg)
+        self.analyse(parse=True, interactive=True)
 
-   
     def cifa_fenxi(self):
         if not self.textEdit.toPlainText():
             QMessageBox.warning(self, '警告', '请先输入或打开文件！')
             return
-        
-        cifa = Cifa()
-        self.data = self.textEdit.toPlainText()
-        self.tokens = cifa.cifafenxi(self.data)
-        
-        # 收集非法字符信息
-        illegal_tokens = []
-        for token in self.tokens:
-            if token[0] == 0:  # 种别码为0的token
-                illegal_tokens.append(f"第{token[3]}行: {token[2]} \t类型: {token[1]}")
-        
-        # 如果有非法字符，显示弹窗
-        if illegal_tokens:
-            error_message = "发现非法字符：\n\n" + "\n".join(illegal_tokens)
-            QMessageBox.warning(self, '非法字符提示', error_message)
-        
-        # 显示词法分析结果
-        df = pd.DataFrame(self.tokens, columns=['种别码', '类型', '值', '行数'])
-        self.tableWidget.setRowCount(df.shape[0])
-        self.tableWidget.setColumnCount(df.shape[1])
-        self.tableWidget.setHorizontalHeaderLabels(df.columns)
-        for i in range(df.shape[0]):
-            for j in range(df.shape[1]):
-                self.tableWidget.setItem(i, j, QTableWidgetItem(str(df.iloc[i, j])))
-        self.tableWidget.resizeColumnsToContents()
+        self.analyse(parse=False, interactive=True)
+
+    def show_syntax_tree(self):
+        if self.astModel.root is None:
+            QMessageBox.warning(self, '警告', '请先进行语法分析！')
+            return
+        # 不设为模态，可以同时打开几个窗口对照
+        dialog = SyntaxTreeDialog(self)
+        dialog.setAttribute(Qt.WA_DeleteOnClose)
+        dialog.show_tree(self.astModel.root, self.structure)
+        self.treeDialogs.append(dialog)
+        dialog.finished.connect(lambda _: self.tree_dialog_closed(dialog))
+        dialog.show()
+
+    def tree_dialog_closed(self, dialog):
+        self.treeDialogs.remove(dialog)
+        root = dialog.root()
+        if root is not self.astModel.root:
+            self.release_tree(root)
+
+    def release_tree(self, root):
+        """交给后台线程逐步释放语法树；还有语法树图对话框在显示它时不释放，等对话框关闭再说"""
+        if root is not None and not any(dialog.root() is root for dialog in self.treeDialogs):
+            release_later(root)
+
+    def analyse(self, parse, interactive):
+        """把当前文本的快照交给后台线程分析，结果由 on_analysed 显示"""
+        text = self.textEdit.toPlainText()
+        if not text:
+            return
+        self.interactive = interactive
+        # 上次的单词序列复制一份给后台做增量分析，界面上的模型仍使用原来的
+        previous = self.tokens.copy() if isinstance(self.tokens, TokenBuffer) else None
+        self.houtai.submit(text, parse, previous, self.dirty, self.huancun)
+
+    def on_analysed(self, result):
+        # 只有提交之后文本没有再改动时结果才会送达，修改范围可以清空
+        self.data = result['text']
+        self.tokens = result['tokens']
+        self.dirty = None
+        self.tongji = result['tongji']
+        self.show_status()
+        self.tokenModel.set_tokens(self.tokens)
+        ast = result['ast']
+        self.diagnostics = ast.errors if ast is not None else []
+        self.error_index = -1
+        if ast is not None:
+            # 显示语法分析结果：树视图按需展开，不预先生成所有结点的行；
+            # 旧的语法树可能有上百万个结点，交给后台线程逐步释放
+            old = self.astModel.root
+            self.astModel.set_root(ast)
+            self.structure = result['structure']
+            self.release_tree(old)
+            if self.interactive:
+                # 只展开程序和不太大的函数定义；展开几十万条语句时视图要逐行布局
+                root = self.astModel.index(0, 0)
+                self.astView.expand(root)
+                for row in range(self.astModel.rowCount(root)):
+                    index = self.astModel.index(row, 0, root)
+                    if self.astModel.rowCount(index) <= self.AUTO_EXPAND_LIMIT:
+                        self.astView.expand(index)
+                self.resultStack.setCurrentWidget(self.astView)
+                self.filterBar.hide()
+        elif self.interactive:
+            self.resultStack.setCurrentWidget(self.tokenView)
+            self.filterBar.show()
+        if not self.interactive:
+            # 实时分析不弹窗，错误数显示在状态栏
+            return
+
+        if ast is None:
+            # 收集非法字符信息：在种别码列中查找，只为非法单词生成元组
+            codes = self.tokens.codes if isinstance(self.tokens, TokenBuffer) else [token[0] for token in self.tokens]
+            count = codes.count(0)
+            if count:
+                lines = []
+                i = -1
+                for _ in range(min(count, 50)):
+                    i = codes.index(0, i + 1)
+                    token = self.tokens[i]
+                    lines.append(f"第{token[3]}行: {token[2]} \t类型: {token[1]}")
+                if count > 50:
+                    lines.append(f"……共 {count} 个，勾选“只显示非法单词”查看全部")
+                error_message = "发现非法字符：\n\n" + "\n".join(lines)
+                self.next_error()
+                QMessageBox.warning(self, '非法字符提示', error_message)
+        elif ast.errors:
+            # 显示错误信息
+            error_msg = '\n'.join(ast.errors[:50])
+            if len(ast.errors) > 50:
+                error_msg += f"\n……共 {len(ast.errors)} 个错误"
+            self.next_error()
+            QMessageBox.warning(self, '语法错误', error_msg)
+
+    def next_error(self):
+        """在编辑器中选中下一处错误：语法分析后为下一个语法错误的单词，词法分析后为下一个非法单词"""
+        if not isinstance(self.tokens, TokenBuffer):
+            return
+        if self.dirty is not None:
+            self.statusBar().showMessage('文本已修改，请重新分析后再定位错误')
+            return
+        if self.diagnostics:
+            # 依次选中带偏移的错误，到末尾后回到第一个
+            positioned = [i for i, error in enumerate(self.diagnostics)
+                          if isinstance(error, Zhenduan) and error.start is not None]
+            if not positioned:
+                return
+            later = [i for i in positioned if i > self.error_index]
+            self.error_index = later[0] if later else positioned[0]
+            error = self.diagnostics[self.error_index]
+            self.select_span(error.start, error.end)
+            self.statusBar().showMessage(error)
+            return
+        # 在种别码列中找下一个非法单词，找不到时从头再找
+        codes = self.tokens.codes
+        try:
+            index = codes.index(0, self.error_index + 1)
+        except ValueError:
+            try:
+                index = codes.index(0)
+            except ValueError:
+                return
+        self.error_index = index
+        self.select_span(*self.tokens.span(index))
+        line, column = self.tokens.position(index)
+        _, kind, value, _ = self.tokens[index]
+        self.statusBar().showMessage(f"第{line}行第{column}列：{kind} {value}")
+
+    def select_span(self, start, end):
+        """选中分析文本中 [start, end) 一段
+
+        偏移经单词序列的行首偏移表换算成行号、列号，再由行号直接找到文本块，不扫描全文。
+        Qt 的位置按 UTF-16 计，块内列号按该行前缀的 UTF-16 长度换算。
+        """
+        hangbiao = self.tokens.hangbiao
+        document = self.textEdit.document()
+
+        def qt_position(offset):
+            line, column = hangbiao.position(offset)
+            block = document.findBlockByNumber(line - 1)
+            prefix = hangbiao.line_text(line)[:column - 1]
+            return block.position() + len(prefix.encode('utf-16-le')) // 2
+
+        cursor = QTextCursor(document)
+        cursor.setPosition(qt_position(start))
+        cursor.setPosition(qt_position(max(end, start)), QTextCursor.KeepAnchor)
+        self.textEdit.setTextCursor(cursor)
+        self.textEdit.centerCursor()
+
+    def on_analysis_failed(self, message):
+        QMessageBox.warning(self, '分析失败', message)
+
+    def on_busy(self, busy):
+        if busy:
+            self.statusBar().showMessage('分析中……')
+        else:
+            self.show_status()
+
+    def toggle_live(self, checked):
+        if checked:
+            self.liveTimer.start()
+        else:
+            self.liveTimer.stop()
+
+    def apply_filter(self):
+        self.tokenModel.set_filter(self.filterEdit.text(), self.illegalOnly.isChecked())
+
+    def show_status(self):
+        """状态栏：各阶段统计和缓存命中情况"""
+        message = self.tongji.summary()
+        if self.huancun:
+            stats = self.huancun.stats()
+            message += f"  |  缓存命中 {stats['hits']}，未命中 {stats['misses']}"
+        self.statusBar().showMessage(message)
+
+    def on_contents_change(self, position, removed, added):
+        """记录修改范围，供下次词法分析增量进行"""
+        length = self.textEdit.document().characterCount() - 1
+        suffix = max(0, length - position - added)
+        if self.dirty is None:
+            self.dirty = (position, suffix)
+        else:
+            self.dirty = (min(self.dirty[0], position), min(self.dirty[1], suffix))
+        # 文本又变了：正在进行的分析作废，实时分析时重新计时
+        self.houtai.invalidate()
+        if self.liveAction.isChecked():
+            self.liveTimer.start()
+
+    def closeEvent(self, event):
+        self.liveTimer.stop()
+        self.houtai.invalidate()
+        self.houtai.wait()
+        super().closeEvent(event)
 
     def newFile(self):
         self.textEdit.clear()
         self.data = ""
         self.tokens = []
-        self.tableWidget.clear()
-        self.tableWidget.setRowCount(0)
+        self.dirty = None
+        self.diagnostics = []
+        self.error_index = -1
+        self.tokenModel.set_tokens([])
+        old = self.astModel.root
+        self.astModel.set_root(None)
+        self.structure = None
+        self.release_tree(old)
+        self.tongji = Tongji()
+        self.statusBar().clearMessage()
 
     def openFile(self):
         fname = QFileDialog.getOpenFileName(self, '打开文件')
@@ -293,11 +517,16 @@ class TextEditor(QMainWindow):
             try:
                 with open(fname[0], 'r', encoding='utf-8') as f:
                     self.data = f.read()
-                    self.textEdit.setText(self.data)
+                    self.textEdit.setPlainText(self.data)
             except Exception as e:
                 QMessageBox.warning(self, '错误', f'无法打开文件: {str(e)}')
 
 
-app = QApplication(sys.argv)
-editor = TextEditor()
-sys.exit(app.exec_())
\ No newline at end of file
+def main():
+    app = QApplication(sys.argv)
+    editor = TextEditor()
+    return app.exec_()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
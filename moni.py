@@ -0,0 +1,264 @@
+import re
+
+REGISTERS = ['$zero', '$at', '$v0', '$v1', '$a0', '$a1', '$a2', '$a3',
+             '$t0', '$t1', '$t2', '$t3', '$t4', '$t5', '$t6', '$t7',
+             '$s0', '$s1', '$s2', '$s3', '$s4', '$s5', '$s6', '$s7',
+             '$t8', '$t9', '$k0', '$k1', '$gp', '$sp', '$fp', '$ra']
+REGISTER_IDS = {name: i for i, name in enumerate(REGISTERS)}
+LO, HI = 32, 33
+
+# 流水线模型参数
+PIPELINE_FILL = 4       # 五级流水线首条指令流出前的填充周期
+LOAD_USE_STALL = 1      # lw 的结果紧接着被使用
+BRANCH_PENALTY = 1      # 分支成立或 j：取错的一条指令作废
+MULDIV_LATENCY = {'mult': 5, 'div': 20}   # mflo/mfhi 距 mult/div 不足该条数时等待
+
+BRANCHES = {'beq', 'bne', 'j'}
+READS = {
+    'sw': (0,), 'move': (1,), 'add': (1, 2), 'sub': (1, 2), 'and': (1, 2), 'or': (1, 2), 'slt': (1, 2),
+    'mult': (0, 1), 'div': (0, 1), 'beq': (0, 1), 'bne': (0, 1),
+}
+WORD = re.compile(r'\s*([\w.$]+)\s*:\s*\.word\s+(-?\d+)')
+
+
+def wrap(value):
+    """截成 32 位有符号整数"""
+    return ((value + 0x80000000) & 0xFFFFFFFF) - 0x80000000
+
+
+class Moni:
+    """Mubiao 所生成 MIPS 子集的模拟器，统计动态指令数和流水线周期
+
+    支持 li、lw、sw、move、add、sub、and、or、slt、mult、div、mflo、mfhi、beq、bne、j 和
+    syscall 10。载入时按标签和跳转把代码段划分成基本块，每个基本块翻译成一个 Python
+    函数并一次编译好，执行时只需循环调用基本块函数，并记录每个基本块的执行次数；
+    各操作码的动态条数和流水线停顿都是块内的静态量乘以执行次数，不在循环中逐条统计。
+
+    周期模型为经典五级流水线：每条指令1个周期，加流水线填充；lw 的结果被下一条指令
+    使用时停顿1个周期；分支成立和 j 作废1条已取指令；mflo/mfhi 与之前的 mult/div 距离
+    不足其延迟时等待。跨基本块的冒险不计。
+    """
+
+    def __init__(self, asm):
+        data, _, text = asm.partition('.text')
+        self.addresses = {}
+        self.initial = []
+        self.undeclared = set()
+        for line in data.splitlines():
+            match = WORD.match(line.split('#')[0])
+            if match:
+                self.addresses[match.group(1)] = len(self.initial)
+                self.initial.append(int(match.group(2)))
+
+        # 指令和标签
+        instructions = []
+        labels = {}
+        for line in text.splitlines():
+            line = line.split('#')[0].strip()
+            if not line or line.startswith('.'):
+                continue
+            if line.endswith(':'):
+                labels[line[:-1]] = len(instructions)
+                continue
+            op, _, rest = line.partition(' ')
+            instructions.append((op, [arg.strip() for arg in rest.split(',')] if rest else []))
+
+        # 基本块入口：第一条指令、标签处、跳转和 syscall 之后
+        leaders = {0} | set(labels.values())
+        for i, (op, _) in enumerate(instructions):
+            if op in BRANCHES or op == 'syscall':
+                leaders.add(i + 1)
+        starts = sorted(s for s in leaders if s < len(instructions))
+        self.blocks = list(zip(starts, starts[1:] + [len(instructions)]))
+        block_of = {start: b for b, (start, _) in enumerate(self.blocks)}
+        self.labels = {label: block_of.get(i, len(self.blocks)) for label, i in labels.items()}
+        self.program = instructions
+
+        self.block_ops = []
+        self.block_stalls = []
+        source = []
+        for b, (start, end) in enumerate(self.blocks):
+            source.extend(self._compile_block(b, instructions[start:end]))
+        namespace = {'wrap': wrap}
+        exec(compile('\n'.join(source), '<moni>', 'exec'), namespace)
+        self.functions = [namespace[f'b{b}'] for b in range(len(self.blocks))]
+
+    def _operand(self, arg):
+        if arg in REGISTER_IDS:
+            return f'r[{REGISTER_IDS[arg]}]'
+        if arg not in self.addresses:
+            if not re.fullmatch(r'[A-Za-z_]\w*', arg):
+                raise ValueError(f"未知的操作数：{arg}")
+            # 数据段中没有声明的变量也分配一个字，记下来供检查
+            self.addresses[arg] = len(self.initial)
+            self.initial.append(0)
+            self.undeclared.add(arg)
+        return f'm[{self.addresses[arg]}]'
+
+    def _compile_block(self, b, instructions):
+        """把一个基本块翻译成 Python 函数的源代码，返回值为下一个基本块的编号，-1 表示结束"""
+        lines = [f'def b{b}(r, m, taken):']
+        ops = {}
+        load_use = muldiv = 0
+        last_muldiv = None
+        fallthrough = b + 1
+        for k, (op, args) in enumerate(instructions):
+            ops[op] = ops.get(op, 0) + 1
+            # 停顿：上一条 lw 的目的寄存器被本条读取
+            if k and instructions[k - 1][0] == 'lw':
+                loaded = instructions[k - 1][1][0]
+                if any(args[j] == loaded for j in READS.get(op, ())):
+                    load_use += 1
+            if op in MULDIV_LATENCY:
+                last_muldiv = (k, MULDIV_LATENCY[op])
+            elif op in ('mflo', 'mfhi') and last_muldiv:
+                muldiv += max(0, last_muldiv[1] - (k - last_muldiv[0]))
+                last_muldiv = None
+
+            if op == 'li':
+                lines.append(f'    {self._operand(args[0])} = {int(float(args[1]))}')
+            elif op in ('lw', 'move'):
+                lines.append(f'    {self._operand(args[0])} = {self._operand(args[1])}')
+            elif op == 'sw':
+                lines.append(f'    {self._operand(args[1])} = {self._operand(args[0])}')
+            elif op in ('add', 'sub', 'and', 'or', 'slt'):
+                d, s, t = (self._operand(arg) for arg in args)
+                expression = {'add': f'wrap({s} + {t})', 'sub': f'wrap({s} - {t})', 'and': f'{s} & {t}',
+                              'or': f'{s} | {t}', 'slt': f'int({s} < {t})'}[op]
+                lines.append(f'    {d} = {expression}')
+            elif op == 'mult':
+                s, t = (self._operand(arg) for arg in args)
+                lines.append(f'    p = {s} * {t}')
+                lines.append(f'    r[{LO}] = wrap(p)')
+                lines.append(f'    r[{HI}] = wrap(p >> 32)')
+            elif op == 'div':
+                s, t = (self._operand(arg) for arg in args)
+                # 向零取整；除以零时结果不确定，这里取0
+                lines.append(f'    if {t}:')
+                lines.append(f'        q = abs({s}) // abs({t})')
+                lines.append(f'        if ({s} < 0) != ({t} < 0): q = -q')
+                lines.append(f'        r[{LO}], r[{HI}] = wrap(q), {s} - {t} * q')
+                lines.append(f'    else:')
+                lines.append(f'        r[{LO}] = r[{HI}] = 0')
+            elif op in ('mflo', 'mfhi'):
+                lines.append(f'    {self._operand(args[0])} = r[{LO if op == "mflo" else HI}]')
+            elif op in ('beq', 'bne'):
+                s, t = self._operand(args[0]), self._operand(args[1])
+                target = self.labels[args[2]]
+                lines.append(f'    if {s} {"==" if op == "beq" else "!="} {t}:')
+                lines.append(f'        taken[0] += 1')
+                lines.append(f'        return {target}')
+            elif op == 'j':
+                lines.append(f'    taken[0] += 1')
+                lines.append(f'    return {self.labels[args[0]]}')
+                fallthrough = None
+            elif op == 'syscall':
+                # 只支持 10 号系统调用（退出）
+                lines.append('    if r[2] == 10:')
+                lines.append('        return -1')
+            else:
+                raise ValueError(f"不支持的指令：{op}")
+        if fallthrough is not None:
+            lines.append(f'    return {fallthrough}')
+        self.block_ops.append(ops)
+        self.block_stalls.append((load_use, muldiv))
+        return lines
+
+    def run(self, max_instructions=None):
+        """从第一条指令执行到 syscall 10 或代码段末尾，返回最终内存 {变量: 值}"""
+        r = [0] * 34
+        m = list(self.initial)
+        taken = [0]
+        functions = self.functions
+        count = len(functions)
+        executions = [0] * count
+        sizes = [end - start for start, end in self.blocks]
+        budget = max_instructions if max_instructions is not None else -1
+        b = 0
+        while 0 <= b < count:
+            executions[b] += 1
+            if budget >= 0:
+                budget -= sizes[b]
+                if budget < 0:
+                    raise RuntimeError(f"超过 {max_instructions} 条指令仍未结束")
+            b = functions[b](r, m, taken)
+
+        self.registers = r
+        self.block_executions = executions
+        self.memory = {name: m[address] for name, address in self.addresses.items()}
+        self.counts = {}
+        load_use = muldiv = 0
+        for b, n in enumerate(executions):
+            if n:
+                for op, k in self.block_ops[b].items():
+                    self.counts[op] = self.counts.get(op, 0) + k * n
+                load_use += self.block_stalls[b][0] * n
+                muldiv += self.block_stalls[b][1] * n
+        self.instructions = sum(self.counts.values())
+        self.memory_accesses = self.counts.get('lw', 0) + self.counts.get('sw', 0)
+        self.stalls = {'load_use': load_use * LOAD_USE_STALL, 'branch': taken[0] * BRANCH_PENALTY,
+                       'muldiv': muldiv}
+        self.cycles = self.instructions + (PIPELINE_FILL if self.instructions else 0) + sum(self.stalls.values())
+        return self.memory
+
+    def report(self):
+        lines = [f"动态指令数 {self.instructions}，周期数 {self.cycles}，"
+                 f"CPI {self.cycles / max(self.instructions, 1):.2f}，访存 {self.memory_accesses} 次",
+                 "停顿：" + '，'.join(f'{kind} {n}' for kind, n in self.stalls.items()),
+                 "各指令条数：" + '，'.join(f'{op} {n}' for op, n in sorted(self.counts.items(), key=lambda item: -item[1])),
+                 "最终内存：" + '，'.join(f'{name}={value}' for name, value in sorted(self.memory.items()))]
+        return '\n'.join(lines)
+
+
+def run(asm):
+    """执行一段汇编，返回 (动态指令数, 访存次数, 最终内存)"""
+    moni = Moni(asm)
+    memory = moni.run()
+    return moni.instructions, moni.memory_accesses, memory
+
+
+# 测试代码
+if __name__ == '__main__':
+    import time
+    from zhongjian import bianyi
+    from Mubiao import Mubiao
+
+    source = '''
+    main() {
+        n = 30;
+        a = 0;
+        b = 1;
+        i = 0;
+        while (i < n) {
+            t = a + b;
+            a = b;
+            b = t % 1000007;
+            i = i + 1;
+        }
+        s = 0;
+        i = 1;
+        while (i < 2000) {
+            if (i % 3 == 0) {
+                s = s + i * i;
+            } else {
+                s = s - i / 2;
+            }
+            i = i + 1;
+        }
+    }
+    '''
+    quads = bianyi(source)['quads']
+    for allocator, peephole in (('memory', False), ('memory', True), ('linear', False), ('linear', True)):
+        moni = Moni(Mubiao(quads, allocator, peephole).generate())
+        moni.run()
+        print(f"[{allocator}，窥孔优化{'开' if peephole else '关'}]")
+        print(moni.report())
+        print()
+
+    # 执行速度
+    loop = 'main() { i = 0; s = 0; while (i < 300000) { s = s + i * 3 - (s & 255); i = i + 1; } }'
+    moni = Moni(Mubiao(bianyi(loop)['quads']).generate())
+    start = time.perf_counter()
+    moni.run()
+    elapsed = time.perf_counter() - start
+    print(f"{moni.instructions} 条指令用时 {elapsed:.2f} s，{moni.instructions / elapsed / 1e6:.2f} M 条/秒")
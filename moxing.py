@@ -0,0 +1,235 @@
+from array import array
+from itertools import repeat
+
+from PyQt5.QtCore import Qt, QAbstractTableModel, QAbstractItemModel, QModelIndex
+
+from cifa import TokenBuffer
+from yufa import Node, DECLARATION
+
+TOKEN_HEADERS = ('种别码', '类型', '值', '行数')
+AST_HEADERS = ('类型', '运算符/值', '说明')
+NODE_NAMES = {
+    'program': '程序', 'error': '错误', 'function_definition': '函数定义', 'expression_statement': '表达式语句',
+    'assignment': '赋值', 'declaration': '声明', 'if_statement': 'if语句', 'while_statement': 'while语句', 'condition': '条件',
+    'binary_expression': '运算符', 'unary_expression': '单目运算符', 'number': '数值', 'identifier': '标识符',
+}
+FIELD_NAMES = {
+    'left': '左操作数', 'right': '右操作数', 'operand': '操作数', 'condition': '条件', 'body': '语句',
+    'else_body': 'else语句', 'value': '值', 'expression': '表达式',
+}
+
+
+def node_children(node):
+    """结点的 [(字段说明, 列表下标, 子结点)]
+
+    单个子结点的下标为 None；说明文字在显示时才拼接，几十万条语句的函数体也只是一次 zip。
+    """
+    kids = []
+    for field in node.__slots__:
+        value = getattr(node, field)
+        name = FIELD_NAMES.get(field, field)
+        if isinstance(value, Node):
+            kids.append((name, None, value))
+        elif isinstance(value, list) and value and isinstance(value[0], Node):
+            # 语句列表（Program.errors 是字符串列表，不是子结点）
+            kids.extend(zip(repeat(name), range(1, len(value) + 1), value))
+    return kids
+
+
+def has_children(node):
+    """结点是否有子结点，不求出子结点列表"""
+    for field in node.__slots__:
+        value = getattr(node, field)
+        if isinstance(value, Node) or isinstance(value, list) and value and isinstance(value[0], Node):
+            return True
+    return False
+
+
+def node_label(node):
+    """结点的显示文字：中文类型名，以及运算符、数值或标识符名"""
+    name = NODE_NAMES.get(node.TYPE, node.TYPE)
+    if node.kind == DECLARATION:
+        return name, f'{node.var_type} {node.name}'
+    for field in ('operator', 'value', 'name', 'target'):
+        value = getattr(node, field, None)
+        if isinstance(value, str):
+            return name, value
+    return name, ''
+
+
+class TokenModel(QAbstractTableModel):
+    """单词表模型：直接以 Cifa 的单词序列（TokenBuffer 或元组列表）为数据
+
+    视图只向模型要可见的行，单元格在显示时才生成，不再为每个单元格建 QTableWidgetItem。
+    排序和筛选只维护一个“显示行 → 单词下标”的整数数组，不复制单词；TokenBuffer 的
+    种别码、类型和行号直接取自其列数组。纵向表头显示单词的原始序号。
+    """
+
+    def __init__(self, tokens=(), parent=None):
+        super().__init__(parent)
+        self.tokens = tokens
+        # 显示行对应的单词下标，None 表示原顺序、不筛选
+        self.rows = None
+        self.sort_column = None
+        self.sort_order = Qt.AscendingOrder
+        self.filter_text = ''
+        self.illegal_only = False
+
+    def set_tokens(self, tokens):
+        self.beginResetModel()
+        self.tokens = tokens
+        self._arrange()
+        self.endResetModel()
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self.tokens) if self.rows is None else len(self.rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(TOKEN_HEADERS)
+
+    def token_index(self, row):
+        return row if self.rows is None else self.rows[row]
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        if role == Qt.DisplayRole:
+            return str(self.tokens[self.token_index(index.row())][index.column()])
+        if role == Qt.TextAlignmentRole and index.column() in (0, 3):
+            return int(Qt.AlignRight | Qt.AlignVCenter)
+        return None
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole:
+            return None
+        if orientation == Qt.Horizontal:
+            return TOKEN_HEADERS[section]
+        return str(self.token_index(section) + 1)
+
+    def sort(self, column, order=Qt.AscendingOrder):
+        """column 为 -1 时恢复原顺序"""
+        self.beginResetModel()
+        self.sort_column = column if column >= 0 else None
+        self.sort_order = order
+        self._arrange()
+        self.endResetModel()
+
+    def set_filter(self, text='', illegal_only=False):
+        """只显示值或类型中含有 text 的单词；illegal_only 时只显示种别码为0的非法单词"""
+        self.beginResetModel()
+        self.filter_text = text
+        self.illegal_only = illegal_only
+        self._arrange()
+        self.endResetModel()
+
+    def _column(self, column):
+        """第 column 列的取值函数：单词下标 → 值"""
+        tokens = self.tokens
+        if isinstance(tokens, TokenBuffer):
+            tokens.flush()
+            if column == 0:
+                return tokens.codes.__getitem__
+            if column == 1:
+                kinds, names = tokens.kinds, TokenBuffer.KINDS
+                return lambda i: names[kinds[i]]
+            if column == 3:
+                return tokens.lines.__getitem__
+        return lambda i: tokens[i][column]
+
+    def _arrange(self):
+        count = len(self.tokens)
+        if not self.illegal_only and not self.filter_text and self.sort_column is None:
+            self.rows = None
+            return
+        rows = range(count)
+        if self.illegal_only:
+            code = self._column(0)
+            rows = [i for i in rows if code(i) == 0]
+        if self.filter_text:
+            text = self.filter_text
+            value, kind = self._column(2), self._column(1)
+            rows = [i for i in rows if text in value(i) or text in kind(i)]
+        if self.sort_column is not None:
+            rows = sorted(rows, key=self._column(self.sort_column), reverse=self.sort_order == Qt.DescendingOrder)
+        self.rows = array('I', rows)
+
+
+class AstModel(QAbstractItemModel):
+    """语法树模型：直接以 Yufa 的语法树为数据，结点的子结点在视图展开时才求出
+
+    每个结点的子结点列表按需计算并缓存；index() 创建索引时记下子结点的父结点和行号，
+    供 parent() 查找。顶层只有一行，即 Program（或 Error）结点。
+    """
+
+    def __init__(self, root=None, parent=None):
+        super().__init__(parent)
+        self.root = root
+        self._children = {}
+        self._parents = {}
+
+    def set_root(self, root):
+        self.beginResetModel()
+        self.root = root
+        self._children = {}
+        self._parents = {}
+        self.endResetModel()
+
+    def _kids(self, node):
+        """结点的子结点（见 node_children），node 为 None 时是顶层"""
+        if node is None:
+            return [('', None, self.root)] if self.root is not None else []
+        kids = self._children.get(id(node))
+        if kids is None:
+            kids = self._children[id(node)] = node_children(node)
+        return kids
+
+    def index(self, row, column, parent=QModelIndex()):
+        node = parent.internalPointer() if parent.isValid() else None
+        kids = self._kids(node)
+        if not 0 <= row < len(kids) or not 0 <= column < len(AST_HEADERS):
+            return QModelIndex()
+        child = kids[row][2]
+        self._parents[id(child)] = (node, row)
+        return self.createIndex(row, column, child)
+
+    def parent(self, index):
+        if not index.isValid():
+            return QModelIndex()
+        node, _ = self._parents.get(id(index.internalPointer()), (None, 0))
+        if node is None:
+            return QModelIndex()
+        return self.createIndex(self._parents[id(node)][1], 0, node)
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid() and parent.column() != 0:
+            return 0
+        return len(self._kids(parent.internalPointer() if parent.isValid() else None))
+
+    def hasChildren(self, parent=QModelIndex()):
+        # 视图对每个可见行都会问一次，这里不求出子结点列表
+        if not parent.isValid():
+            return self.root is not None
+        if parent.column() != 0:
+            return False
+        return has_children(parent.internalPointer())
+
+    def columnCount(self, parent=QModelIndex()):
+        return len(AST_HEADERS)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or role != Qt.DisplayRole:
+            return None
+        node = index.internalPointer()
+        column = index.column()
+        if column < 2:
+            return node_label(node)[column]
+        parent, row = self._parents.get(id(node), (None, 0))
+        name, number, _ = self._kids(parent)[row]
+        return name if number is None else f'{name}{number}'
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return AST_HEADERS[section]
+        return None
@@ -0,0 +1,219 @@
+"""批量编译：把大量源文件分给进程池并行编译
+
+    python piliang.py 目录或文件 ... [-j 进程数] [-d 输出目录] [--stats 统计.json]
+    python piliang.py --bench 10000          生成合成语料，测不同进程数下的吞吐量
+
+默认使用 huancun 磁盘缓存，各工作进程共用一个缓存目录，未改动的文件直接取缓存的结果。
+
+每个工作进程启动时导入编译器并先编译一个小程序预热，之后一直复用。主进程只传文件路径，
+源文件由工作进程自己读取，汇编也由工作进程直接写到输出目录，进程间只传回错误和统计。
+小文件按总字节数打包成一批再提交，减少进程间通信的次数；每批完成即返回结果，不等全部结束。
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from tongji import Tongji
+from zhongjian import bianyi
+from huancun import Huancun, DEFAULT_DIRECTORY, cached_bianyi
+
+CHUNK_BYTES = 64 * 1024     # 一批源文件的总字节数上限
+CHUNK_FILES = 64            # 一批最多的文件数
+WARMUP = 'main() { a = 1; while (a < 10) { if (a % 2 == 0) { a = a + 3; } else { a = a * 2; } } }'
+
+
+# 工作进程中的磁盘缓存
+_huancun = None
+
+
+def _warm(cache_dir=None):
+    """工作进程初始化：打开缓存，编译一个小程序，让正则、各模块的缓存都在第一批任务之前就绪"""
+    global _huancun
+    _huancun = Huancun(cache_dir) if cache_dir else None
+    bianyi(WARMUP)
+
+
+def compile_file(path, target=None, stats=False, huancun=None):
+    """编译一个文件，汇编写到 target（为 None 时不输出），返回可在进程间传递的结果字典
+
+    result['cached'] 表示结果是否取自缓存。
+    """
+    result = {'path': path, 'errors': [], 'bytes': 0, 'seconds': 0.0, 'cached': False}
+    start = time.perf_counter()
+    try:
+        with open(path, encoding='utf-8') as f:
+            source = f.read()
+    except (OSError, UnicodeDecodeError) as e:
+        result['errors'].append(f"无法读取：{e}")
+        return result
+    result['bytes'] = len(source)
+    tongji = Tongji() if stats else None
+    hits = huancun.hits if huancun else 0
+    try:
+        compiled = cached_bianyi(source, huancun, tongji)
+    except Exception as e:
+        # 一个文件出错不影响同批的其他文件
+        result['errors'].append(f"编译器内部错误：{type(e).__name__}: {e}")
+    else:
+        result['errors'] = list(compiled['errors'])
+        result['cached'] = bool(huancun) and huancun.hits > hits
+        if target and not compiled['errors']:
+            os.makedirs(os.path.dirname(target) or '.', exist_ok=True)
+            with open(target, 'w', encoding='utf-8') as f:
+                f.write(compiled['asm'] + '\n')
+    if tongji is not None:
+        result['stats'] = tongji.to_dict()
+    result['seconds'] = time.perf_counter() - start
+    return result
+
+
+def _compile_chunk(batch, stats):
+    return [compile_file(path, target, stats, _huancun) for path, target in batch]
+
+
+def output_paths(paths, outdir):
+    """各文件的汇编输出路径：保留相对于公共目录的子目录结构，不同目录下的同名文件不会互相覆盖"""
+    if not outdir:
+        return {path: None for path in paths}
+    absolute = [os.path.abspath(path) for path in paths]
+    common = os.path.dirname(absolute[0]) if len(absolute) == 1 else os.path.commonpath(absolute)
+    return {path: os.path.join(outdir, os.path.splitext(os.path.relpath(full, common))[0] + '.s')
+            for path, full in zip(paths, absolute)}
+
+
+def chunks(paths, chunk_bytes=CHUNK_BYTES, chunk_files=CHUNK_FILES):
+    """把文件按大小打包：大文件单独一批，小文件凑满 chunk_bytes 或 chunk_files 为一批
+
+    大文件先提交，避免最后只剩一个大文件在跑、其他进程空闲。
+    """
+    sized = sorted(((os.path.getsize(path) if os.path.exists(path) else 0, path) for path in paths),
+                   reverse=True)
+    batch = []
+    total = 0
+    for size, path in sized:
+        if size >= chunk_bytes:
+            yield [path]
+            continue
+        batch.append(path)
+        total += size
+        if total >= chunk_bytes or len(batch) >= chunk_files:
+            yield batch
+            batch = []
+            total = 0
+    if batch:
+        yield batch
+
+
+def piliang(paths, jobs=None, outdir=None, stats=False, chunk_bytes=CHUNK_BYTES, cache_dir=None):
+    """并行编译 paths，按完成顺序逐个产出每个文件的结果字典；jobs=1 时在本进程内顺序编译
+
+    cache_dir 为磁盘缓存目录，为 None 时不使用缓存。
+    """
+    outputs = output_paths(paths, outdir)
+    if jobs == 1:
+        huancun = Huancun(cache_dir) if cache_dir else None
+        for path in paths:
+            yield compile_file(path, outputs[path], stats, huancun)
+        return
+    with ProcessPoolExecutor(max_workers=jobs, initializer=_warm, initargs=(cache_dir,)) as pool:
+        futures = [pool.submit(_compile_chunk, [(path, outputs[path]) for path in batch], stats)
+                   for batch in chunks(paths, chunk_bytes)]
+        for future in as_completed(futures):
+            yield from future.result()
+
+
+def find_sources(targets, suffix='.c'):
+    """展开目录，返回所有源文件路径"""
+    paths = []
+    for target in targets:
+        if os.path.isdir(target):
+            for root, dirs, files in os.walk(target):
+                dirs.sort()
+                paths.extend(os.path.join(root, name) for name in sorted(files) if name.endswith(suffix))
+        else:
+            paths.append(target)
+    return paths
+
+
+def summarize(results, elapsed):
+    failed = [result for result in results if result['errors']]
+    total_bytes = sum(result['bytes'] for result in results)
+    cached = sum(1 for result in results if result.get('cached'))
+    lines = [f"{len(results)} 个文件，{len(results) - len(failed)} 个成功，{len(failed)} 个有错误，{cached} 个取自缓存；"
+             f"用时 {elapsed:.2f} s，{len(results) / elapsed if elapsed else 0:.0f} 个文件/秒，"
+             f"{total_bytes / 2 ** 20 / elapsed if elapsed else 0:.2f} MB/s"]
+    for result in sorted(failed, key=lambda result: result['path']):
+        lines.append(f"  {result['path']}：{len(result['errors'])} 个错误")
+    return '\n'.join(lines)
+
+
+def bench(count, jobs_list, seed=0):
+    """生成 count 个合成源文件，比较不同进程数的吞吐量"""
+    import random
+    import tempfile
+    from jizhun import Yuliao
+
+    rng = random.Random(seed)
+    with tempfile.TemporaryDirectory() as directory:
+        yuliao = Yuliao(seed)
+        for i in range(count):
+            with open(os.path.join(directory, f'f{i:05d}.c'), 'w', encoding='utf-8') as f:
+                f.write(yuliao.generate(rng.choice(('mixed', 'comment', 'numeric', 'errors')),
+                                        rng.choice((512, 1024, 2048, 4096))))
+        paths = find_sources([directory])
+        print(f"{count} 个文件，共 {sum(os.path.getsize(path) for path in paths) / 2 ** 20:.1f} MB")
+        print("进程数\t用时(s)\t文件/秒\t加速比")
+        base = None
+        for jobs in jobs_list:
+            start = time.perf_counter()
+            done = sum(1 for _ in piliang(paths, jobs))
+            elapsed = time.perf_counter() - start
+            assert done == len(paths)
+            base = base or elapsed
+            print(f"{jobs}\t{elapsed:.2f}\t{done / elapsed:.0f}\t{base / elapsed:.2f}x")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='piliang', description="批量并行编译")
+    parser.add_argument('targets', nargs='*', help="源文件或目录（目录下所有 .c 文件）")
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count(), help="进程数（默认 CPU 核数）")
+    parser.add_argument('-d', '--outdir', help="汇编输出目录")
+    parser.add_argument('--stats', metavar='PATH', help="把每个文件的错误和各阶段统计写成 JSON")
+    parser.add_argument('--no-cache', action='store_true', help="不使用磁盘缓存")
+    parser.add_argument('--cache-dir', default=DEFAULT_DIRECTORY, help="缓存目录（默认 %(default)s）")
+    parser.add_argument('-q', '--quiet', action='store_true', help="不逐个输出文件结果")
+    parser.add_argument('--bench', type=int, metavar='N', help="生成 N 个合成文件测吞吐量")
+    args = parser.parse_args(argv)
+
+    if args.bench:
+        jobs_list = sorted({1, 2, 4, 8, args.jobs} - {0})
+        bench(args.bench, [jobs for jobs in jobs_list if jobs <= max(args.jobs, 1)])
+        return 0
+    paths = find_sources(args.targets)
+    if not paths:
+        parser.error("没有找到源文件")
+
+    start = time.perf_counter()
+    results = []
+    cache_dir = None if args.no_cache else args.cache_dir
+    for result in piliang(paths, args.jobs, args.outdir, bool(args.stats), cache_dir=cache_dir):
+        results.append(result)
+        if not args.quiet:
+            status = f"{len(result['errors'])} 个错误" if result['errors'] else "成功"
+            if result['cached']:
+                status += "（缓存）"
+            print(f"[{len(results)}/{len(paths)}] {result['path']}：{status}", flush=True)
+    elapsed = time.perf_counter() - start
+    print(summarize(results, elapsed))
+
+    if args.stats:
+        with open(args.stats, 'w', encoding='utf-8') as f:
+            json.dump({result['path']: result for result in results}, f, ensure_ascii=False, indent=2)
+    return 1 if any(result['errors'] for result in results) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,333 @@
+"""语法树图：在 QGraphicsView 中绘制语法树，结点可折叠、展开
+
+只有展开的结点才求子结点、参与布局、建立图元，折叠的子树一个结点也不访问；子结点很多时
+先显示前 CHILD_LIMIT 个，点击末尾的“还有 N 个”再多显示一批。布局结果（可见结点的坐标和文字）
+按语法树的结构哈希缓存：重新打开同一棵树，或结构相同的重新分析结果时直接取用，不再访问语法树。
+结构哈希由后台分析任务随语法分析一起算出；每个视图拿到的是缓存布局的副本，折叠/展开后再写回缓存。
+"""
+import hashlib
+from collections import OrderedDict
+
+from PyQt5.QtCore import Qt, QRectF, QPointF
+from PyQt5.QtGui import QBrush, QColor, QFont, QPainter, QPainterPath, QPen
+from PyQt5.QtWidgets import QGraphicsItem, QGraphicsPathItem, QGraphicsScene, QGraphicsView
+
+from cifa import Cancelled
+from hangbiao import Zhenduan
+from yufa import Node
+from moxing import node_children, node_label, has_children
+
+NODE_WIDTH = 120
+NODE_HEIGHT = 38
+H_GAP = 14
+V_GAP = 46
+CHILD_LIMIT = 64        # 每次多显示的子结点数
+INITIAL_NODES = 200     # 初次打开时自动展开到大约这么多个可见结点
+INITIAL_DEPTH = 4       # 初次打开时最多自动展开的层数
+CACHE_SIZE = 16         # 缓存的布局数
+TEXT_LOD = 0.4          # 缩小到这个比例以下只画方块，不画文字
+
+# 结点的显示状态
+LEAF, COLLAPSED, EXPANDED, MORE = range(4)
+
+COLORS = {
+    'program': '#4a90e2', 'error': '#d9534f', 'function_definition': '#8e6bbf',
+    'expression_statement': '#3c8d7a', 'assignment': '#3c8d7a', 'declaration': '#3c8d7a', 'if_statement': '#c27c2c',
+    'while_statement': '#c27c2c', 'condition': '#b0903a', 'binary_expression': '#5a6f8c',
+    'unary_expression': '#5a6f8c', 'number': '#4f7a3a', 'identifier': '#4f7a3a', 'more': '#404040',
+}
+
+
+def structure_hash(root, cancel=None):
+    """语法树的结构哈希：结点种类、运算符/数值/名字、错误说明和子结点的排列，不含行号和出错位置
+
+    非递归遍历，深层表达式也可以计算；按先序把每个结点写成一段文字，分批送入哈希。
+    cancel 为可选的无参函数，每送入一批检查一次，返回真时抛出 Cancelled。
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    parts = []
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        if node is None:
+            parts.append('-')
+            continue
+        parts.append(node.TYPE)
+        for field in node.__slots__:
+            value = getattr(node, field)
+            if isinstance(value, Node):
+                parts.append('@')
+                stack.append(value)
+            elif isinstance(value, list):
+                parts.append(f'[{len(value)}')
+                for item in value:
+                    if isinstance(item, Node):
+                        stack.append(item)
+                    elif isinstance(item, Zhenduan):
+                        # 诊断的“第N行：”前缀随行号变化，只取说明
+                        parts.append(repr(item.message))
+                    else:
+                        parts.append(repr(item))
+            elif value is None:
+                parts.append('-')
+            elif field != 'line':
+                parts.append(repr(value))
+        if len(parts) >= 4096:
+            digest.update('\0'.join(parts).encode('utf-8', 'surrogatepass') + b'\0')
+            parts = []
+            if cancel is not None and cancel():
+                raise Cancelled()
+    digest.update('\0'.join(parts).encode('utf-8', 'surrogatepass'))
+    return digest.hexdigest()
+
+
+class Buju:
+    """一棵语法树的图布局：展开状态和可见结点的位置
+
+    结点用路径（从根到它的子结点序号元组）表示，与结点对象无关，所以结构相同的另一棵树
+    可以直接沿用。entries 是可见结点的 [(路径, x, y, 类型, 类型名, 值, 字段说明, 状态)]，
+    (x, y) 为结点顶边中点；edges 是父子结点之间的连线 [(x1, y1, x2, y2)]。
+
+    布局：叶结点（包括折叠的结点）从左到右依次占一格，父结点居于首末两个子结点的正上方，
+    纵坐标由深度决定。只遍历展开的部分，代价与可见结点数成正比。
+    """
+
+    def __init__(self):
+        self.expanded = set()
+        self.shown = {}
+        self.entries = []
+        self.edges = []
+
+    def copy(self):
+        """独立的副本：展开状态各自修改，互不影响；entries、edges 中的元组不可变，只复制列表"""
+        other = Buju()
+        other.expanded = set(self.expanded)
+        other.shown = dict(self.shown)
+        other.entries = list(self.entries)
+        other.edges = list(self.edges)
+        return other
+
+    def _visible_children(self, path, node):
+        """展开的结点当前显示的 [(路径, 子结点, 字段说明)]，被截断时末尾是子结点为 None 的占位项"""
+        kids = node_children(node)
+        limit = self.shown.get(path, CHILD_LIMIT)
+        visible = [(path + (i,), child, name if number is None else f'{name}{number}')
+                   for i, (name, number, child) in enumerate(kids[:limit])]
+        if len(kids) > limit:
+            visible.append((path + (limit,), None, f'还有 {len(kids) - limit} 个'))
+        return visible
+
+    def expand_initial(self, root):
+        """按层展开，直到可见结点数约为 INITIAL_NODES 或达到 INITIAL_DEPTH 层"""
+        level = [((), root)]
+        count = 1
+        for _ in range(INITIAL_DEPTH):
+            below = []
+            for path, node in level:
+                if node is None:
+                    continue
+                kids = self._visible_children(path, node)
+                if not kids:
+                    continue
+                if count + len(kids) > INITIAL_NODES and path:
+                    return
+                self.expanded.add(path)
+                count += len(kids)
+                below.extend((kid_path, child) for kid_path, child, _ in kids)
+            level = below
+
+    def layout(self, root):
+        entries = []
+        edges = []
+        columns = 0
+        positions = {}
+        stack = [((), root, '', 0, None)]
+        while stack:
+            path, node, label, depth, kids = stack.pop()
+            if kids is None:
+                kids = self._visible_children(path, node) if node is not None and path in self.expanded else []
+                if kids:
+                    # 先排子结点，再回到本结点
+                    stack.append((path, node, label, depth, kids))
+                    stack.extend((kid_path, child, name, depth + 1, None) for kid_path, child, name in reversed(kids))
+                    continue
+            y = depth * (NODE_HEIGHT + V_GAP)
+            if kids:
+                x = (positions[kids[0][0]] + positions[kids[-1][0]]) / 2
+                edges.extend((x, y + NODE_HEIGHT, positions[kid_path], y + NODE_HEIGHT + V_GAP)
+                             for kid_path, _, _ in kids)
+            else:
+                x = columns * (NODE_WIDTH + H_GAP)
+                columns += 1
+            positions[path] = x
+            if node is None:
+                entries.append((path, x, y, 'more', label, '', '', MORE))
+            else:
+                state = EXPANDED if kids else COLLAPSED if has_children(node) else LEAF
+                name, value = node_label(node)
+                entries.append((path, x, y, node.TYPE, name, value, label, state))
+        self.entries = entries
+        self.edges = edges
+
+    def toggle(self, path, root):
+        """折叠或展开 path 处的结点；path 是占位项时多显示一批子结点。之后重新布局"""
+        entry = next((entry for entry in self.entries if entry[0] == path), None)
+        if entry is None:
+            return
+        state = entry[7]
+        if state == MORE:
+            parent = path[:-1]
+            self.shown[parent] = self.shown.get(parent, CHILD_LIMIT) + CHILD_LIMIT
+        elif state == EXPANDED:
+            self.expanded.discard(path)
+        elif state == COLLAPSED:
+            self.expanded.add(path)
+        else:
+            return
+        self.layout(root)
+
+
+_layouts = OrderedDict()
+
+
+def buju_for(root, key=None):
+    """取 root 的布局，返回 (结构哈希, 布局)：结构相同的树取缓存中布局的副本，没有时新建并做初次布局
+
+    key 为已经算好的结构哈希（后台分析任务给出），为 None 时在这里计算。
+    """
+    if key is None:
+        key = structure_hash(root)
+    buju = _layouts.get(key)
+    if buju is None:
+        buju = Buju()
+        buju.expand_initial(root)
+        buju.layout(root)
+        remember(key, buju)
+    else:
+        _layouts.move_to_end(key)
+    return key, buju.copy()
+
+
+def remember(key, buju):
+    """把布局的副本存入缓存，超过 CACHE_SIZE 个时淘汰最久未用的"""
+    _layouts[key] = buju.copy()
+    _layouts.move_to_end(key)
+    while len(_layouts) > CACHE_SIZE:
+        _layouts.popitem(last=False)
+
+
+class JiedianItem(QGraphicsItem):
+    """语法树图中的一个结点：圆角方块，上行为类型名，下行为运算符/值，右侧 +/− 表示可展开/可折叠"""
+
+    def __init__(self, entry):
+        super().__init__()
+        self.path, x, y, self.type, self.title, self.detail, label, self.state = entry
+        self.setPos(x, y)
+        if label:
+            self.setToolTip(label)
+        if self.state != LEAF:
+            self.setCursor(Qt.PointingHandCursor)
+
+    def boundingRect(self):
+        return QRectF(-NODE_WIDTH / 2, 0, NODE_WIDTH, NODE_HEIGHT)
+
+    def paint(self, painter, option, widget=None):
+        rect = self.boundingRect()
+        color = QColor(COLORS.get(self.type, '#5a5a5a'))
+        lod = option.levelOfDetailFromTransform(painter.worldTransform())
+        if lod < TEXT_LOD:
+            painter.fillRect(rect, color)
+            return
+        painter.setPen(QPen(color.lighter(140), 1))
+        painter.setBrush(QBrush(color))
+        painter.drawRoundedRect(rect, 6, 6)
+        painter.setPen(QColor('#f0f0f0'))
+        font = QFont(painter.font())
+        font.setPointSize(9)
+        painter.setFont(font)
+        text = rect.adjusted(6, 2, -16, -2)
+        metrics = painter.fontMetrics()
+        if self.detail:
+            painter.drawText(text, Qt.AlignLeft | Qt.AlignTop, self.title)
+            painter.drawText(text, Qt.AlignLeft | Qt.AlignBottom,
+                             metrics.elidedText(self.detail, Qt.ElideRight, int(text.width())))
+        else:
+            painter.drawText(text, Qt.AlignLeft | Qt.AlignVCenter,
+                             metrics.elidedText(self.title, Qt.ElideRight, int(text.width())))
+        if self.state in (COLLAPSED, EXPANDED):
+            painter.drawText(rect.adjusted(0, 0, -5, 0), Qt.AlignRight | Qt.AlignVCenter,
+                             '+' if self.state == COLLAPSED else '−')
+
+
+class ShutuView(QGraphicsView):
+    """语法树图视图：点击结点折叠/展开，点击“还有 N 个”显示更多，滚轮缩放，拖动平移"""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setScene(QGraphicsScene(self))
+        self.setRenderHint(QPainter.Antialiasing)
+        self.setDragMode(QGraphicsView.ScrollHandDrag)
+        self.setTransformationAnchor(QGraphicsView.AnchorUnderMouse)
+        self.setBackgroundBrush(QColor('#252525'))
+        self.root = None
+        self.key = None
+        self.buju = None
+
+    def set_root(self, root, key=None):
+        """显示 root；key 为它的结构哈希，不给出时现算"""
+        self.root = root
+        if root is None:
+            self.key, self.buju = None, None
+        else:
+            self.key, self.buju = buju_for(root, key)
+        self.redraw()
+        if self.buju is not None and self.buju.entries:
+            # 根结点在最后，显示在视图上方正中
+            _, x, y = self.buju.entries[-1][:3]
+            self.centerOn(x, y + self.viewport().height() / 2 / max(self.transform().m22(), 1e-6) - NODE_HEIGHT)
+
+    def redraw(self):
+        scene = self.scene()
+        scene.clear()
+        if self.buju is None:
+            return
+        edges = QPainterPath()
+        for x1, y1, x2, y2 in self.buju.edges:
+            middle = (y1 + y2) / 2
+            edges.moveTo(x1, y1)
+            edges.cubicTo(x1, middle, x2, middle, x2, y2)
+        lines = QGraphicsPathItem(edges)
+        lines.setPen(QPen(QColor('#707070'), 1))
+        scene.addItem(lines)
+        for entry in self.buju.entries:
+            scene.addItem(JiedianItem(entry))
+        margin = NODE_WIDTH
+        scene.setSceneRect(scene.itemsBoundingRect().adjusted(-margin, -margin, margin, margin))
+
+    def toggle(self, item):
+        """折叠/展开 item，并保持它在视图中的位置不动"""
+        before = self.mapFromScene(item.pos())
+        self.buju.toggle(item.path, self.root)
+        remember(self.key, self.buju)
+        self.redraw()
+        entry = next((entry for entry in self.buju.entries if entry[0] == item.path), None)
+        if entry is None:
+            # 占位项展开后由新的占位项（或最后一个子结点）代替，保持父结点不动
+            return
+        delta = self.mapFromScene(QPointF(entry[1], entry[2])) - before
+        self.horizontalScrollBar().setValue(self.horizontalScrollBar().value() + delta.x())
+        self.verticalScrollBar().setValue(self.verticalScrollBar().value() + delta.y())
+
+    def mousePressEvent(self, event):
+        item = self.itemAt(event.pos())
+        if event.button() == Qt.LeftButton and isinstance(item, JiedianItem) and item.state != LEAF:
+            self.toggle(item)
+            event.accept()
+            return
+        super().mousePressEvent(event)
+
+    def wheelEvent(self, event):
+        factor = 1.15 ** (event.angleDelta().y() / 120)
+        scale = self.transform().m11() * factor
+        if 0.05 <= scale <= 4:
+            self.scale(factor, factor)
@@ -0,0 +1,90 @@
+import json
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+
+class Tongji:
+    """编译各阶段的统计：耗时、各类单词数、语法树结点数、四元式数、生成的指令数和错误数
+
+    Cifa、Yufa、Zhongjian、Mubiao 都接受可选的 tongji 参数。不传时各阶段只多一次 None 判断；
+    传入时阶段入口用 phase() 计时，计数在阶段结束后根据其输出统计，不计入该阶段的耗时。
+    同一阶段再次执行时覆盖上一次的记录。
+    """
+
+    def __init__(self):
+        self.phases = {}
+
+    @contextmanager
+    def phase(self, name):
+        """计时一个阶段，返回该阶段的记录字典"""
+        record = self.phases[name] = {}
+        start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record['seconds'] = time.perf_counter() - start
+
+    def tokens(self, tokens, phase='cifa'):
+        kinds = Counter(token[1] for token in tokens)
+        record = self.phases.setdefault(phase, {})
+        record['tokens'] = sum(kinds.values())
+        record['kinds'] = dict(kinds)
+        record['errors'] = sum(1 for token in tokens if token[0] == 0)
+
+    def ast(self, tokens, ast, phase='yufa'):
+        kinds = Counter()
+        stack = [ast]
+        while stack:
+            node = stack.pop()
+            kinds[node.TYPE] += 1
+            for field in node.__slots__:
+                value = getattr(node, field)
+                if isinstance(value, list):
+                    stack.extend(item for item in value if hasattr(item, 'TYPE'))
+                elif hasattr(value, 'TYPE'):
+                    stack.append(value)
+        record = self.phases.setdefault(phase, {})
+        record['tokens'] = len(tokens)
+        record['nodes'] = sum(kinds.values())
+        record['kinds'] = dict(kinds)
+        record['errors'] = len(ast.errors)
+
+    def quads(self, quads, phase='zhongjian'):
+        record = self.phases.setdefault(phase, {})
+        record['quads'] = len(quads)
+        record['labels'] = sum(1 for quad in quads if quad[0] == 'label')
+
+    def asm(self, quads, lines, phase='mubiao'):
+        record = self.phases.setdefault(phase, {})
+        record['quads'] = len(quads)
+        record['instructions'] = sum(1 for line in lines
+                                     if line.startswith('    ') and not line.lstrip().startswith('#'))
+        record['lines'] = len(lines)
+
+    def to_dict(self):
+        return {'phases': self.phases, 'seconds': sum(record.get('seconds', 0) for record in self.phases.values())}
+
+    def to_json(self, **kwargs):
+        return json.dumps(self.to_dict(), ensure_ascii=False, **kwargs)
+
+    def summary(self):
+        """一行摘要，供状态栏显示"""
+        parts = []
+        for name, record in self.phases.items():
+            counts = [f'{key} {record[key]}' for key in ('tokens', 'nodes', 'quads', 'instructions', 'errors')
+                      if key in record]
+            # 取自缓存的记录没有耗时
+            timing = f"{record['seconds'] * 1000:.1f} ms" if 'seconds' in record else '缓存'
+            parts.append(f"{name} {timing}" + (f"（{'，'.join(counts)}）" if counts else ''))
+        return '  |  '.join(parts)
+
+
+# 测试代码
+if __name__ == '__main__':
+    from zhongjian import bianyi
+
+    tongji = Tongji()
+    bianyi('main() { int a = 5; if (a > 0) { a = a + 1; } while (a < 10) { a = a * 2; } }', tongji)
+    print(tongji.summary())
+    print(tongji.to_json(indent=2))
@@ -0,0 +1,241 @@
+from Mubiao import ARITHMETIC_OPERATORS, is_constant
+
+HALT = -1
+
+
+class Xuniji:
+    """直接执行四元式的虚拟机
+
+    载入时把四元式编译成紧凑的指令序列：变量和常量都分配到同一个槽数组中（常量槽预先
+    填好值），操作数一律变成槽下标；标签解析成指令下标后删去，program start 也删去。
+    每条指令编译成一个闭包，直接绑定自己的处理代码和操作数，执行后返回下一条指令的
+    下标（直接线索化），执行循环只有 pc = code[pc]() 一句，不再解码、不再比较字符串。
+
+    算术语义与 Mubiao 生成的 MIPS 一致：+ - * 截成 32 位，/ 和 % 向零取整，除以零结果为0，
+    浮点常量按整数截断。
+    """
+
+    def __init__(self, quads):
+        self.slots = []
+        self.names = {}
+        self.constants = {}
+        # 标签指向其后第一条真正的指令
+        labels = {}
+        position = 0
+        for op, arg1, arg2, result in quads:
+            if op == 'label':
+                labels[result] = position
+            elif not (op == 'program' and result == 'start'):
+                position += 1
+        self.code = []
+        for op, arg1, arg2, result in quads:
+            if op == 'label' or (op == 'program' and result == 'start'):
+                continue
+            self.code.append(self._compile(len(self.code), op, arg1, arg2, result, labels))
+        # 顺序执行越过最后一条指令即停机
+        self.code.append(lambda: HALT)
+
+    def _slot(self, operand):
+        """变量或常量对应的槽下标"""
+        if not is_constant(operand):
+            slot = self.names.get(operand)
+            if slot is None:
+                slot = self.names[operand] = len(self.slots)
+                self.slots.append(0)
+            return slot
+        value = int(float(operand))
+        slot = self.constants.get(value)
+        if slot is None:
+            slot = self.constants[value] = len(self.slots)
+            self.slots.append(value)
+        return slot
+
+    def _compile(self, pc, op, arg1, arg2, result, labels):
+        s = self.slots
+        following = pc + 1
+        if op == '=':
+            a, c = self._slot(arg1), self._slot(result)
+
+            def instruction():
+                s[c] = s[a]
+                return following
+        elif op in ARITHMETIC_OPERATORS:
+            a, b, c = self._slot(arg1), self._slot(arg2), self._slot(result)
+            if op == '+':
+                def instruction():
+                    s[c] = ((s[a] + s[b] + 0x80000000) & 0xFFFFFFFF) - 0x80000000
+                    return following
+            elif op == '-':
+                def instruction():
+                    s[c] = ((s[a] - s[b] + 0x80000000) & 0xFFFFFFFF) - 0x80000000
+                    return following
+            elif op == '*':
+                def instruction():
+                    s[c] = ((s[a] * s[b] + 0x80000000) & 0xFFFFFFFF) - 0x80000000
+                    return following
+            elif op in ('/', '%'):
+                remainder = op == '%'
+
+                def instruction():
+                    x, y = s[a], s[b]
+                    if y:
+                        q = abs(x) // abs(y)
+                        if (x < 0) != (y < 0):
+                            q = -q
+                        s[c] = x - y * q if remainder else q
+                    else:
+                        s[c] = 0
+                    return following
+            elif op == '&':
+                def instruction():
+                    s[c] = s[a] & s[b]
+                    return following
+            else:
+                def instruction():
+                    s[c] = s[a] | s[b]
+                    return following
+        elif op == 'goto':
+            target = labels[result]
+
+            def instruction():
+                return target
+        elif op.startswith('if'):
+            a, b, target = self._slot(arg1), self._slot(arg2), labels[result]
+            cond = op[2:]
+            if cond == '>':
+                def instruction():
+                    return target if s[a] > s[b] else following
+            elif cond == '<':
+                def instruction():
+                    return target if s[a] < s[b] else following
+            elif cond == '>=':
+                def instruction():
+                    return target if s[a] >= s[b] else following
+            elif cond == '<=':
+                def instruction():
+                    return target if s[a] <= s[b] else following
+            elif cond == '!=':
+                def instruction():
+                    return target if s[a] != s[b] else following
+            else:
+                # 与 Mubiao 一致，其他条件按相等处理
+                def instruction():
+                    return target if s[a] == s[b] else following
+        elif op == 'program' and result == 'end':
+            def instruction():
+                return HALT
+        else:
+            raise ValueError(f"不支持的四元式：{(op, arg1, arg2, result)}")
+        return instruction
+
+    def run(self):
+        """从头执行到 program end，返回各变量的最终值 {变量: 值}"""
+        slots = self.slots
+        for slot in self.names.values():
+            slots[slot] = 0
+        code = self.code
+        pc = 0
+        while pc >= 0:
+            pc = code[pc]()
+        return {name: slots[slot] for name, slot in self.names.items()}
+
+
+def interpret(quads):
+    """逐条解释四元式元组的朴素实现：每步比较操作符字符串、解析操作数，用作对照"""
+    values = {}
+    labels = {quad[3]: i for i, quad in enumerate(quads) if quad[0] == 'label'}
+    for op, arg1, arg2, result in quads:
+        if op not in ('label', 'goto', 'program'):
+            for operand in (arg1, arg2) if op.startswith('if') else (arg1, arg2, result):
+                if operand is not None and not is_constant(operand):
+                    values[operand] = 0
+
+    def value(operand):
+        if is_constant(operand):
+            return int(float(operand))
+        return values.get(operand, 0)
+
+    pc = 0
+    while pc < len(quads):
+        op, arg1, arg2, result = quads[pc]
+        pc += 1
+        if op == '=':
+            values[result] = value(arg1)
+        elif op == '+':
+            values[result] = ((value(arg1) + value(arg2) + 0x80000000) & 0xFFFFFFFF) - 0x80000000
+        elif op == '-':
+            values[result] = ((value(arg1) - value(arg2) + 0x80000000) & 0xFFFFFFFF) - 0x80000000
+        elif op == '*':
+            values[result] = ((value(arg1) * value(arg2) + 0x80000000) & 0xFFFFFFFF) - 0x80000000
+        elif op in ('/', '%'):
+            x, y = value(arg1), value(arg2)
+            q = 0
+            if y:
+                q = abs(x) // abs(y) * (1 if (x < 0) == (y < 0) else -1)
+            values[result] = (x - y * q if y else 0) if op == '%' else q
+        elif op == '&':
+            values[result] = value(arg1) & value(arg2)
+        elif op == '|':
+            values[result] = value(arg1) | value(arg2)
+        elif op == 'goto':
+            pc = labels[result]
+        elif op.startswith('if'):
+            x, y = value(arg1), value(arg2)
+            cond = op[2:]
+            if ((cond == '>' and x > y) or (cond == '<' and x < y) or (cond == '>=' and x >= y)
+                    or (cond == '<=' and x <= y) or (cond == '!=' and x != y)
+                    or (cond not in ('>', '<', '>=', '<=', '!=') and x == y)):
+                pc = labels[result]
+        elif op == 'program' and result == 'end':
+            break
+    return values
+
+
+# 测试代码
+if __name__ == '__main__':
+    import random
+    import time
+    from cifa import Cifa
+    from yufa import Yufa
+    from zhongjian import Zhongjian, random_program
+    from moni import run
+    from Mubiao import Mubiao
+
+    def compile_quads(source):
+        return Zhongjian().generate(Yufa().parse(Cifa().cifafenxi(source)))
+
+    # 等价性检查：与朴素解释、MIPS 模拟执行结果一致
+    random.seed(14)
+    for _ in range(300):
+        quads = compile_quads(random_program(random))
+        values = Xuniji(quads).run()
+        assert values == interpret(quads), quads
+        memory = run(Mubiao(quads).generate())[2]
+        assert all(values[name] == memory[name] for name in memory), quads
+    # 形如浮点数特殊值的变量名
+    quads = compile_quads('main() { inf = 3; nan = 4; infinity = -2; x = inf + nan * infinity; }')
+    values = Xuniji(quads).run()
+    assert values == interpret(quads) and values['x'] == -5, values
+    memory = run(Mubiao(quads).generate())[2]
+    assert all(values[name] == memory[name] for name in memory), memory
+    print("300 个随机程序与朴素解释、MIPS 模拟执行结果一致\n")
+
+    programs = {
+        '循环累加': 'main() { i = 0; s = 0; while (i < 100000) { s = s + i * 3 - (s & 255); i = i + 1; } }',
+        '分支密集': 'main() { i = 0; a = 0; b = 0; while (i < 50000) { if (i % 3 == 0) { a = a + i; } '
+                    'else { if (i % 5 == 1) { b = b - 1; } else { b = b + a / 7; } } i = i + 1; } }',
+        '嵌套循环': 'main() { i = 0; t = 0; while (i < 200) { j = 0; while (j < 200) { t = t + (i | j) % 11; '
+                    'j = j + 1; } i = i + 1; } }',
+    }
+    print("程序\t\t朴素解释(ms)\t虚拟机(ms)\t加速比")
+    for name, source in programs.items():
+        quads = compile_quads(source)
+        start = time.perf_counter()
+        expected = interpret(quads)
+        naive = time.perf_counter() - start
+        vm = Xuniji(quads)
+        start = time.perf_counter()
+        values = vm.run()
+        fast = time.perf_counter() - start
+        assert values == expected
+        print(f"{name}\t{naive * 1000:.0f}\t\t{fast * 1000:.0f}\t\t{naive / fast:.1f}x")
@@ -1,31 +1,261 @@
+from cifa import Cancelled, TokenBuffer, TokenView
+from hangbiao import Zhenduan
+
+# 二元运算符的优先级，数值越大结合越紧，与C语言一致
+BINARY_PRECEDENCE = {
+    '*': 10, '/': 10, '%': 10,
+    '+': 9, '-': 9,
+    '<': 8, '<=': 8, '>': 8, '>=': 8,
+    '==': 7, '!=': 7,
+    '&': 6,
+    '|': 4,
+}
+# 前缀一元运算符，优先级高于所有二元运算符
+UNARY_OPERATORS = {'-', '!'}
+UNARY_PRECEDENCE = 11
+COMPARISON_OPERATORS = {'>', '<', '>=', '<=', '==', '!='}
+# 语句开头的关键字，也是错误恢复的同步点
+STATEMENT_KEYWORDS = {'if', 'else', 'while', 'for', 'return', 'int', 'float', 'double', 'char', 'void'}
+TYPE_KEYWORDS = {'int', 'float', 'double', 'char', 'void'}
+
+# 语法树结点种类
+(PROGRAM, ERROR, EXPRESSION_STATEMENT, IF_STATEMENT, WHILE_STATEMENT, CONDITION,
+ BINARY_EXPRESSION, UNARY_EXPRESSION, NUMBER, IDENTIFIER, ASSIGNMENT, FUNCTION_DEFINITION, DECLARATION) = range(13)
+
+
+class Node:
+    """语法树结点基类：用 __slots__ 存放字段，kind 为整数种类，TYPE 为原字典形式中的 type"""
+    __slots__ = ()
+    kind = None
+    TYPE = None
+
+    def to_dict(self):
+        """转换为原来的嵌套字典形式（非递归，深层表达式也可以转换）"""
+        root = {}
+        stack = [(self, root)]
+        while stack:
+            node, out = stack.pop()
+            out['type'] = node.TYPE
+            for field in node.__slots__:
+                value = getattr(node, field)
+                if isinstance(value, Node):
+                    out[field] = {}
+                    stack.append((value, out[field]))
+                elif isinstance(value, list):
+                    out[field] = []
+                    for item in value:
+                        if isinstance(item, Node):
+                            out[field].append({})
+                            stack.append((item, out[field][-1]))
+                        else:
+                            out[field].append(item)
+                else:
+                    out[field] = value
+        return root
+
+
+class Program(Node):
+    __slots__ = ('body', 'errors')
+    kind = PROGRAM
+    TYPE = 'program'
+
+    def __init__(self, body, errors):
+        self.body = body
+        self.errors = errors
+
+
+class Error(Node):
+    __slots__ = ('errors',)
+    kind = ERROR
+    TYPE = 'error'
+
+    def __init__(self, errors):
+        self.errors = errors
+
+
+class FunctionDefinition(Node):
+    __slots__ = ('line', 'name', 'body')
+    kind = FUNCTION_DEFINITION
+    TYPE = 'function_definition'
+
+    def __init__(self, line, name, body):
+        self.line = line
+        self.name = name
+        self.body = body
+
+
+class ExpressionStatement(Node):
+    __slots__ = ('line', 'expression')
+    kind = EXPRESSION_STATEMENT
+    TYPE = 'expression_statement'
+
+    def __init__(self, line, expression):
+        self.line = line
+        self.expression = expression
+
+
+class Assignment(Node):
+    __slots__ = ('line', 'target', 'value')
+    kind = ASSIGNMENT
+    TYPE = 'assignment'
+
+    def __init__(self, line, target, value):
+        self.line = line
+        self.target = target
+        self.value = value
+
+
+class Declaration(Node):
+    """变量声明：类型 name [= value]，不带初值时 value 为 None"""
+    __slots__ = ('line', 'var_type', 'name', 'value')
+    kind = DECLARATION
+    TYPE = 'declaration'
+
+    def __init__(self, line, var_type, name, value):
+        self.line = line
+        self.var_type = var_type
+        self.name = name
+        self.value = value
+
+
+class IfStatement(Node):
+    __slots__ = ('line', 'has_else', 'condition', 'body', 'else_body')
+    kind = IF_STATEMENT
+    TYPE = 'if_statement'
+
+    def __init__(self, line, has_else, condition, body, else_body):
+        self.line = line
+        self.has_else = has_else
+        self.condition = condition
+        self.body = body
+        self.else_body = else_body
+
+
+class WhileStatement(Node):
+    __slots__ = ('line', 'condition', 'body')
+    kind = WHILE_STATEMENT
+    TYPE = 'while_statement'
+
+    def __init__(self, line, condition, body):
+        self.line = line
+        self.condition = condition
+        self.body = body
+
+
+class Condition(Node):
+    __slots__ = ('operator', 'left', 'right')
+    kind = CONDITION
+    TYPE = 'condition'
+
+    def __init__(self, operator, left, right):
+        self.operator = operator
+        self.left = left
+        self.right = right
+
+
+class BinaryExpression(Node):
+    __slots__ = ('operator', 'left', 'right')
+    kind = BINARY_EXPRESSION
+    TYPE = 'binary_expression'
+
+    def __init__(self, operator, left, right):
+        self.operator = operator
+        self.left = left
+        self.right = right
+
+
+class UnaryExpression(Node):
+    __slots__ = ('operator', 'operand')
+    kind = UNARY_EXPRESSION
+    TYPE = 'unary_expression'
+
+    def __init__(self, operator, operand):
+        self.operator = operator
+        self.operand = operand
+
+
+class Number(Node):
+    __slots__ = ('value',)
+    kind = NUMBER
+    TYPE = 'number'
+
+    def __init__(self, value):
+        self.value = value
+
+
+class Identifier(Node):
+    __slots__ = ('name',)
+    kind = IDENTIFIER
+    TYPE = 'identifier'
+
+    def __init__(self, name):
+        self.name = name
+
+
 class Yufa:
-    def __init__(self):
-        self.keywords = {'if', 'else', 'while'}
+    def __init__(self, engine='pratt', tongji=None, cancel=None):
+        # engine: 'pratt' 为非递归的算符优先表达式分析，'recursive' 为原来的递归下降
+        self.engine = engine
+        # tongji: 可选的 Tongji 统计对象
+        self.tongji = tongji
+        # cancel: 可选的无参函数，每条语句开始时检查，返回真时抛出 Cancelled
+        self.cancel = cancel
 
     def parse(self, tokens):
-        self.tokens = tokens
+        if self.tongji is None:
+            return self._parse(tokens)
+        with self.tongji.phase('yufa'):
+            ast = self._parse(tokens)
+        self.tongji.ast(self.tokens, ast)
+        return ast
+
+    def _parse(self, tokens):
+        # 注释不参与语法分析；TokenBuffer 经视图跳过注释，单词在读取时才生成，诊断信息据此记录出错位置
+        if isinstance(tokens, TokenBuffer):
+            self.tokens = TokenView(tokens)
+        else:
+            self.tokens = [token for token in tokens if token[0] != 600]
+        self.count = len(self.tokens)
         self.current = 0
         self.errors = []
         try:
             statements = []
-            while self.current < len(self.tokens):
+            while self.current < self.count:
+                if self.tokens[self.current][2] == '}':
+                    self.error(self.current, "多余的右大括号")
+                    self.current += 1
+                    continue
                 stmt = self.statement()
                 if stmt:
                     statements.append(stmt)
-            return {
-                'type': 'program',
-                'body': statements,
-                'errors': self.errors
-            }
+            return Program(statements, self.errors)
+        except Cancelled:
+            raise
         except Exception as e:
-            self.errors.append(f"语法错误：{str(e)}")
-            return {
-                'type': 'error',
-                'errors': self.errors
-            }
+            # 分析器自身的意外错误也作为诊断记在当前单词上，与其他错误一样带位置
+            message = f"语法错误：{e}"
+            if self.count:
+                self.error(self.current, message)
+            else:
+                self.errors.append(Zhenduan(0, message))
+            return Error(self.errors)
+
+    def error(self, index, message):
+        """记录一条诊断：index 为出错单词在 self.tokens 中的下标，诊断的行号取自该单词
+
+        单词序列是 TokenBuffer 时附上该单词在源文本中的起止偏移。读到末尾才发现的错误记在最后一个单词上。
+        """
+        index = min(index, self.count - 1)
+        start = end = None
+        if isinstance(self.tokens, TokenView):
+            start, end = self.tokens.span(index)
+        self.errors.append(Zhenduan(self.tokens[index][3], message, start, end))
+
     # 总控判定
     def statement(self):
         """语句分析"""
+        if self.cancel is not None and self.cancel():
+            raise Cancelled()
         token = self.current_token()
         if not token:
             return None
@@ -35,28 +265,124 @@ class Yufa:
             return self.if_statement()
         elif token[2] == 'while':
             return self.while_statement()
+        elif token[2] == 'else':
+            self.error(self.current, "else没有对应的if")
+            self.current += 1
+            return None
+        elif self.at_function_definition():
+            return self.function_definition()
         else:
             return self.expression_statement()
 
     def expression_statement(self):
-        """表达式语句分析"""
+        """表达式语句分析
+
+        stmt -> [类型] identifier = expr ; | 类型 identifier ; | expr ; | ;
+        """
         start_token = self.current_token()
         if not start_token:
             return None
+        start = self.current
+        line = start_token[3]
+        if start_token[2] == ';':
+            self.current += 1
+            return ExpressionStatement(line, None)
 
-        # 跳过直到分号
-        while self.current < len(self.tokens):
-            token = self.current_token()
+        declared = start_token[2] in TYPE_KEYWORDS
+        if declared:
+            self.current += 1
+        token = self.current_token()
+        following = self.tokens[self.current + 1] if self.current + 1 < self.count else None
+        errors = len(self.errors)
+        if token and token[1] == '标识符' and following and following[2] == '=':
+            self.current += 2
+            value = self.expression()
+            if not value:
+                node = None
+            elif declared:
+                node = Declaration(line, start_token[2], token[2], value)
+            else:
+                node = Assignment(line, token[2], value)
+        elif declared and token and token[1] == '标识符' and following and following[2] == ';':
+            self.current += 1
+            node = Declaration(line, start_token[2], token[2], None)
+        else:
+            expr = self.expression()
+            node = ExpressionStatement(line, expr) if expr else None
+
+        if node is None:
+            if len(self.errors) == errors:
+                # 表达式分析停在第一个无法接受的单词上
+                self.error(self.current, "表达式错误")
+            self.skip_statement(start)
+            return None
+        token = self.current_token()
+        if not token or token[2] != ';':
+            # 记在语句的最后一个单词上
+            self.error(self.current - 1, "缺少分号")
+            self.skip_statement(start)
+            return None
+        self.current += 1
+        return node
+
+    def skip_statement(self, start):
+        """恐慌模式恢复：跳过出错语句的剩余部分，越过分号，或停在右大括号和下一条语句的开头"""
+        tokens = self.tokens
+        i = max(self.current, start + 1)
+        while i < self.count:
+            value = tokens[i][2]
+            if value == ';':
+                i += 1
+                break
+            if value == '}' or value in STATEMENT_KEYWORDS:
+                break
+            i += 1
+        self.current = i
+
+    def at_function_definition(self):
+        """是否为函数定义的开头：[类型] identifier ( ) {"""
+        tokens = self.tokens
+        i = self.current
+        if tokens[i][2] in TYPE_KEYWORDS:
+            i += 1
+        return (i + 3 < self.count and tokens[i][1] == '标识符' and tokens[i + 1][2] == '('
+                and tokens[i + 2][2] == ')' and tokens[i + 3][2] == '{')
+
+    def function_definition(self):
+        """函数定义分析：[类型] identifier ( ) { 语句序列 }"""
+        if self.current_token()[2] in TYPE_KEYWORDS:
+            self.current += 1
+        name_token = self.current_token()
+        self.current += 3
+        body = self.block(self.current, f"函数{name_token[2]}缺少右大括号")
+        return FunctionDefinition(name_token[3], name_token[2], body)
+
+    def block(self, index, missing_brace):
+        """{ 语句序列 } 分析，当前单词为左大括号；缺少右大括号时在第 index 个单词处记录 missing_brace"""
+        self.current += 1
+        body = []
+        while self.current < self.count:
+            if self.tokens[self.current][2] == '}':
+                self.current += 1
+                return body
+            stmt = self.statement()
+            if stmt:
+                body.append(stmt)
+        self.error(index, missing_brace)
+        return body
+
+    def recover(self, index, message):
+        """恐慌模式恢复：在第 index 个单词处记录错误，跳到语句体的左大括号或同步点；跳到语句体时把它整体分析掉"""
+        self.error(index, message)
+        tokens = self.tokens
+        while self.current < self.count:
+            value = tokens[self.current][2]
+            if value == '{':
+                self.block(self.current, "缺少右大括号")
+                return None
+            if value in (';', '}') or value in STATEMENT_KEYWORDS:
+                return None
             self.current += 1
-            
-            if token[2] == ';':
-                return {
-                    'type': 'expression_statement',
-                    'line': start_token[3]
-                }
-                
-        # 如果没有找到分号
-        self.errors.append(f"第{start_token[3]}行：缺少分号")
         return None
 
     def if_statement(self):
@@ -66,40 +392,24 @@ class Yufa:
 
         # 检查左括号
         if not self.current_token() or self.current_token()[2] != '(':
-            self.errors.append(f"第{if_token[3]}行：if后缺少左括号")
-            return None
+            return self.recover(self.current, "if后缺少左括号")
         self.current += 1
 
         # 检查条件表达式
         condition = self.condition()
         if not condition:
-            self.errors.append(f"第{if_token[3]}行：if条件表达式错误")
-            return None
+            return self.recover(self.current, "if条件表达式错误")
 
         # 检查右括号
         if not self.current_token() or self.current_token()[2] != ')':
-            self.errors.append(f"第{if_token[3]}行：if条件缺少右括号")
-            return None
+            return self.recover(self.current, "if条件缺少右括号")
         self.current += 1
 
         # 检查左大括号
         if not self.current_token() or self.current_token()[2] != '{':
-            self.errors.append(f"第{if_token[3]}行：缺少左大括号")
+            self.error(self.current, "缺少左大括号")
             return None
-        self.current += 1
-
-        # 检查语句体中的分号
-        self.current += 1  # 跳过左大括号
-        while self.current < len(self.tokens) and self.current_token()[2] != '}':
-            stmt = self.expression_statement()
-            if not stmt:
-                self.errors.append(f"第{self.current_token()[3]}行：语句缺少分号")
-            
-        # 检查右大括号
-        if not self.current_token() or self.current_token()[2] != '}':
-            self.errors.append(f"第{if_token[3]}行：缺少右大括号")
-            return None
-        self.current += 1
+        body = self.block(self.current, "缺少右大括号")
 
         # 检查是否有else
         else_part = None
@@ -107,29 +417,11 @@ class Yufa:
             self.current += 1
             # 检查else的左大括号
             if not self.current_token() or self.current_token()[2] != '{':
-                self.errors.append(f"第{if_token[3]}行：else后缺少左大括号")
-                return None
-            self.current += 1
-
-            # 检查语句体中的分号
-            self.current += 1  # 跳过左大括号
-            while self.current < len(self.tokens) and self.current_token()[2] != '}':
-                stmt = self.expression_statement()
-                if not stmt:
-                    self.errors.append(f"第{self.current_token()[3]}行：语句缺少分号")
-            
-            # 检查else的右大括号
-            if not self.current_token() or self.current_token()[2] != '}':
-                self.errors.append(f"第{if_token[3]}行：else后缺少右大括号")
+                self.error(self.current, "else后缺少左大括号")
                 return None
-            self.current += 1
-            else_part = True
+            else_part = self.block(self.current, "else后缺少右大括号")
 
-        return {
-            'type': 'if_statement',
-            'line': if_token[3],
-            'has_else': else_part is not None
-        }
+        return IfStatement(if_token[3], else_part is not None, condition, body, else_part)
 
     def while_statement(self):
         """while语句分析"""
@@ -138,49 +430,36 @@ class Yufa:
 
         # 检查左括号
         if not self.current_token() or self.current_token()[2] != '(':
-            self.errors.append(f"第{while_token[3]}行：while后缺少左括号")
-            return None
+            return self.recover(self.current, "while后缺少左括号")
         self.current += 1
 
         # 检查条件表达式
         condition = self.condition()
         if not condition:
-            self.errors.append(f"第{while_token[3]}行：while条件表达式错误")
-            return None
+            return self.recover(self.current, "while条件表达式错误")
 
         # 检查右括号
         if not self.current_token() or self.current_token()[2] != ')':
-            self.errors.append(f"第{while_token[3]}行：while条件缺少右括号")
-            return None
+            return self.recover(self.current, "while条件缺少右括号")
         self.current += 1
 
         # 检查左大括号
         if not self.current_token() or self.current_token()[2] != '{':
-            self.errors.append(f"第{while_token[3]}行：缺少左大括号")
-            return None
-        self.current += 1
-
-        # 检查语句体中的分号
-        self.current += 1  # 跳过左大括号
-        while self.current < len(self.tokens) and self.current_token()[2] != '}':
-            stmt = self.expression_statement()
-            if not stmt:
-                self.errors.append(f"第{self.current_token()[3]}行：语句缺少分号")
-            
-        # 检查右大括号
-        if not self.current_token() or self.current_token()[2] != '}':
-            self.errors.append(f"第{while_token[3]}行：缺少右大括号")
+            self.error(self.current, "缺少左大括号")
             return None
-        self.current += 1
+        body = self.block(self.current, "缺少右大括号")
 
-        return {
-            'type': 'while_statement',
-            'line': while_token[3],
-            'condition': condition
-        }
+        return WhileStatement(while_token[3], condition, body)
 
     def condition(self):
         """条件表达式分析"""
+        if self.engine == 'pratt':
+            # 算符优先分析会把比较运算一并读入，根结点须是比较运算
+            expr = self.expression()
+            if not expr or expr.kind != BINARY_EXPRESSION or expr.operator not in COMPARISON_OPERATORS:
+                return None
+            return Condition(expr.operator, expr.left, expr.right)
+
         left = self.expression()
         if not left:
             return None
@@ -194,15 +473,12 @@ class Yufa:
         if not right:
             return None
 
-        return {
-            'type': 'condition',
-            'operator': op[2],
-            'left': left,
-            'right': right
-        }
+        return Condition(op[2], left, right)
 
     def expression(self):
         """expr -> term rest"""
+        if self.engine == 'pratt':
+            return self.pratt_expression()
         term_val = self.term()
         if term_val is None:
             return None
@@ -219,12 +495,7 @@ class Yufa:
             term_val = self.term()
             if term_val is None:
                 return None
-            return self.rest({
-                'type': 'binary_expression',
-                'operator': token[2],
-                'left': left,
-                'right': term_val
-            })
+            return self.rest(BinaryExpression(token[2], left, term_val))
         return left
 
     def term(self):
@@ -245,12 +516,7 @@ class Yufa:
             factor_val = self.factor()
             if factor_val is None:
                 return None
-            return self.rest2({
-                'type': 'binary_expression',
-                'operator': token[2],
-                'left': left,
-                'right': factor_val
-            })
+            return self.rest2(BinaryExpression(token[2], left, factor_val))
         return left
 
     def factor(self):
@@ -258,26 +524,21 @@ class Yufa:
         if not self.current_token():
             return None
             
+        index = self.current
         token = self.current_token()
         self.current += 1
         
         if token[1] in ['整数', '浮点数']:
-            return {
-                'type': 'number',
-                'value': token[2]
-            }
+            return Number(token[2])
         elif token[1] == '标识符':
-            return {
-                'type': 'identifier',
-                'name': token[2]
-            }
+            return Identifier(token[2])
         elif token[2] == '(':
             expr_val = self.expression()
             if expr_val is None:
                 return None
                 
             if not self.current_token() or self.current_token()[2] != ')':
-                self.errors.append(f"第{token[3]}行：缺少右括号")
+                self.error(index, "缺少右括号")
                 return None
                 
             self.current += 1
@@ -286,8 +547,75 @@ class Yufa:
         self.current -= 1  # 回退一个token
         return None
 
+    def pratt_expression(self):
+        """非递归的算符优先表达式分析，用运算对象栈和运算符栈代替递归，时间与单词数成线性关系
+
+        operand -> number | identifier | (expr) | - operand | ! operand
+        expr -> operand (binop operand)*
+        """
+        tokens = self.tokens
+        count = self.count
+        operands = []
+        # 运算符栈的元素：(优先级, 运算符, 是否一元)；左括号记为 (0, 左括号单词的下标, None)
+        operators = []
+
+        def reduce():
+            precedence, op, unary = operators.pop()
+            if unary:
+                operands.append(UnaryExpression(op, operands.pop()))
+            else:
+                right = operands.pop()
+                operands.append(BinaryExpression(op, operands.pop(), right))
+
+        while True:
+            # 读入一个运算对象（前面可以有左括号和一元运算符）
+            if self.current >= count:
+                return None
+            token = tokens[self.current]
+            value = token[2]
+            if token[1] in ('整数', '浮点数'):
+                operands.append(Number(value))
+            elif token[1] == '标识符':
+                operands.append(Identifier(value))
+            elif value == '(':
+                operators.append((0, self.current, None))
+                self.current += 1
+                continue
+            elif value in UNARY_OPERATORS:
+                operators.append((UNARY_PRECEDENCE, value, True))
+                self.current += 1
+                continue
+            else:
+                return None
+            self.current += 1
+
+            # 读入右括号和一个二元运算符，遇到其它单词时表达式结束；每个单词只读一次
+            value = tokens[self.current][2] if self.current < count else None
+            while value == ')':
+                while operators and operators[-1][2] is not None:
+                    reduce()
+                if not operators:
+                    break  # 不属于本表达式的右括号
+                operators.pop()
+                self.current += 1
+                value = tokens[self.current][2] if self.current < count else None
+            precedence = BINARY_PRECEDENCE.get(value)
+            if precedence is None:
+                break
+            while operators and operators[-1][0] >= precedence:
+                reduce()
+            operators.append((precedence, value, False))
+            self.current += 1
+
+        while operators:
+            if operators[-1][2] is None:
+                self.error(operators[-1][1], "缺少右括号")
+                return None
+            reduce()
+        return operands[0]
+
     def current_token(self):
-        if self.current < len(self.tokens):
+        if self.current < self.count:
             return self.tokens[self.current]
         return None
 
@@ -359,12 +687,93 @@ if __name__ == '__main__':
 
     yufa = Yufa()
     result = yufa.parse(tokens)
-    if result['type'] == 'error':
+    if result.kind == ERROR:
         print("语法错误：")
-        for error in result['errors']:
+        for error in result.errors:
             print(error)
     else:
         print("语法分析成功！")
         print("语法树：")
         import json
-        print(json.dumps(result, indent=2, ensure_ascii=False))
+        print(json.dumps(result.to_dict(), indent=2, ensure_ascii=False))
+
+
+    # 算符优先分析与递归下降的对比：a+a*a-a/a... 形式的长表达式
+    import sys
+    import time
+    from cifa import Cifa
+
+    def long_condition(count):
+        ops = '+*-/'
+        expr = 'a' + ''.join(ops[k % 4] + 'a' for k in range(count - 1))
+        return Cifa().cifafenxi('while (' + expr + ' > 0) { y = 1; }')
+
+    print("\n运算对象数\t递归下降(ms)\t算符优先(ms)")
+    for count in (100, 500, 25000, 50000, 100000):
+        tokens = long_condition(count)
+        costs = []
+        for engine in ('recursive', 'pratt'):
+            begin = time.perf_counter()
+            result = Yufa(engine).parse(tokens)
+            cost = (time.perf_counter() - begin) * 1e3
+            costs.append(f"{cost:.1f}" if not result.errors else "失败")
+        print(f"{count}\t\t{costs[0]}\t\t{costs[1]}")
+
+    # 错误恢复：每段含三处错误（语句体缺分号、条件表达式错误、多余的右大括号），分析时间应随错误数线性增长
+    chunk = 'if (x > 0) { a = 1 } while (y < ) { b = 2; } c = 3; }\n'
+    print("\n错误数\t\t分析时间(ms)\t每个错误(us)")
+    per_error = []
+    for repeat in (1000, 2000, 4000, 8000):
+        tokens = Cifa().cifafenxi(chunk * repeat)
+        cost = None
+        for _ in range(3):
+            begin = time.perf_counter()
+            result = Yufa().parse(tokens)
+            elapsed = time.perf_counter() - begin
+            cost = elapsed if cost is None else min(cost, elapsed)
+        assert len(result.errors) == 3 * repeat
+        per_error.append(cost / len(result.errors))
+        print(f"{len(result.errors)}\t\t{cost * 1e3:.1f}\t\t{cost * 1e6 / len(result.errors):.2f}")
+    # 线性：错误数增加到 8 倍，每个错误的耗时基本不变（平方级时会增加到 8 倍）
+    assert per_error[-1] < 3 * per_error[0], per_error
+
+    # 错误位置：记在出错的单词上，缺少分号记在语句的最后一个单词上
+    source = 'main() {\n  y = x + * 3;\n  w = 4\n  z = 1;\n}\n'
+    buffer = Cifa().cifafenxi_buffer(source)
+    errors = Yufa().parse(buffer).errors
+    assert [(buffer.hangbiao.position(error.start), error.message) for error in errors] == \
+        [((2, 11), "表达式错误"), ((3, 7), "缺少分号")], errors
+
+    # 分析器自身出错（递归下降遇到极深的括号）时，诊断同样带位置
+    buffer = Cifa().cifafenxi_buffer('main() { x = ' + '(' * 5000 + '1' + ')' * 5000 + '; }')
+    result = Yufa('recursive').parse(buffer)
+    assert result.kind == ERROR and isinstance(result.errors[0], Zhenduan) and result.errors[0].start is not None
+
+    # 大型程序的结点数与内存：__slots__ 结点对比原来的嵌套字典（字符串与列表在两种形式中相同，不计入）
+    program = ''.join(f'while (a{k} + b * {k} - (c{k} / 2) > d % 3) {{ y = 1; }}\n' for k in range(20000))
+    result = Yufa().parse(Cifa().cifafenxi(program))
+    nodes = 0
+    node_bytes = 0
+    stack = [result]
+    while stack:
+        node = stack.pop()
+        nodes += 1
+        node_bytes += sys.getsizeof(node)
+        for field in node.__slots__:
+            value = getattr(node, field)
+            if isinstance(value, Node):
+                stack.append(value)
+            elif isinstance(value, list):
+                stack.extend(item for item in value if isinstance(item, Node))
+    dict_bytes = 0
+    stack = [result.to_dict()]
+    while stack:
+        node = stack.pop()
+        dict_bytes += sys.getsizeof(node)
+        for value in node.values():
+            if isinstance(value, dict):
+                stack.append(value)
+            elif isinstance(value, list):
+                stack.extend(item for item in value if isinstance(item, dict))
+    print(f"\n{nodes} 个结点：嵌套字典 {dict_bytes / nodes:.0f} 字节/结点，"
+          f"__slots__ 结点 {node_bytes / nodes:.0f} 字节/结点")
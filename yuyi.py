@@ -0,0 +1,213 @@
+"""语义分析：遍历 Yufa 的语法树，建立符号表，检查名字的声明和使用
+
+函数体和 if、else、while 的语句体各是一层作用域。发现的问题：
+    重复声明（同一作用域中同名变量声明两次）、把变量声明为 void —— 错误，不生成代码；
+    使用或赋值未声明的变量 —— 警告，该名字在全局作用域中隐式声明为 int，之后不再重复报告。
+这门语言原来不要求先声明后使用，所以未声明只作为警告。
+
+语法树保持原样：每个标识符、赋值和声明结点引用哪个符号记在符号表的 refs 中，
+Zhongjian 翻译时由此取得存储名（驻留后的同一个 str 对象），四元式中的操作数直接就是符号表中的名字。
+"""
+from fuhao import Fuhao, FUNCTION, VARIABLE
+from hangbiao import Zhenduan
+from yufa import (ASSIGNMENT, BINARY_EXPRESSION, DECLARATION, EXPRESSION_STATEMENT, FUNCTION_DEFINITION,
+                  IDENTIFIER, IF_STATEMENT, UNARY_EXPRESSION, WHILE_STATEMENT)
+
+
+class Yuyi:
+    def __init__(self, fuhao=None, tongji=None):
+        self.fuhao = fuhao if fuhao is not None else Fuhao()
+        # tongji: 可选的 Tongji 统计对象
+        self.tongji = tongji
+        self.errors = []
+        self.warnings = []
+
+    def check(self, program):
+        """分析整个程序，返回错误列表；警告在 self.warnings 中"""
+        if self.tongji is None:
+            self._check(program)
+            return self.errors
+        with self.tongji.phase('yuyi') as record:
+            self._check(program)
+        record['symbols'] = len(self.fuhao)
+        record['errors'] = len(self.errors)
+        record['warnings'] = len(self.warnings)
+        return self.errors
+
+    def _check(self, program):
+        fuhao = self.fuhao
+        # 函数名放在全局作用域，先于函数体登记
+        for node in program.body:
+            if node is not None and node.kind == FUNCTION_DEFINITION:
+                if fuhao.local(node.name) is not None:
+                    self.errors.append(Zhenduan(node.line, f"函数{node.name}重复定义"))
+                else:
+                    fuhao.declare(node.name, 'int', node.line, FUNCTION)
+        # 工作栈：('stmt', 结点) 为待分析的语句，'enter'、'leave' 进出作用域
+        work = [('stmt', node) for node in reversed(program.body)]
+        while work:
+            action, node = work.pop()
+            if action == 'enter':
+                fuhao.enter()
+                continue
+            if action == 'leave':
+                fuhao.leave()
+                continue
+            if node is None:
+                continue
+            kind = node.kind
+            if kind == FUNCTION_DEFINITION:
+                self._block(work, node.body)
+            elif kind == DECLARATION:
+                # 初值中的名字在声明之前查找：int x = x + 1; 右边的 x 是外层的 x
+                if node.value is not None:
+                    self.expression(node.value, node.line)
+                self.declare(node)
+            elif kind == ASSIGNMENT:
+                self.expression(node.value, node.line)
+                fuhao.refs[node] = self.resolve(node.target, node.line)
+            elif kind == EXPRESSION_STATEMENT:
+                if node.expression is not None:
+                    self.expression(node.expression, node.line)
+            elif kind == IF_STATEMENT:
+                self.expression(node.condition.left, node.line)
+                self.expression(node.condition.right, node.line)
+                if node.else_body is not None:
+                    self._block(work, node.else_body)
+                self._block(work, node.body)
+            elif kind == WHILE_STATEMENT:
+                self.expression(node.condition.left, node.line)
+                self.expression(node.condition.right, node.line)
+                self._block(work, node.body)
+
+    @staticmethod
+    def _block(work, body):
+        """语句体作为一层作用域压入工作栈"""
+        work.append(('leave', None))
+        work.extend(('stmt', child) for child in reversed(body or ()))
+        work.append(('enter', None))
+
+    def declare(self, node):
+        fuhao = self.fuhao
+        i = fuhao.local(node.name)
+        if i is not None:
+            self.errors.append(Zhenduan(node.line, f"变量{node.name}重复声明"))
+        else:
+            if node.var_type == 'void':
+                self.errors.append(Zhenduan(node.line, f"变量{node.name}不能声明为void"))
+            i = fuhao.declare(node.name, node.var_type, node.line)
+        fuhao.refs[node] = i
+
+    def resolve(self, name, line):
+        """查找名字，返回符号编号；未声明时报告警告并在全局作用域中隐式声明"""
+        fuhao = self.fuhao
+        i = fuhao.lookup(name)
+        if i is None:
+            self.warnings.append(Zhenduan(line, f"变量{name}未声明"))
+            i = fuhao.declare(name, 'int', line, scope=0)
+        elif fuhao.kind(i) != VARIABLE:
+            self.errors.append(Zhenduan(line, f"{name}是函数，不能作为变量使用"))
+        return i
+
+    def expression(self, root, line):
+        """记下表达式中每个标识符引用的符号（非递归）"""
+        refs = self.fuhao.refs
+        stack = [root]
+        while stack:
+            node = stack.pop()
+            kind = node.kind
+            if kind == IDENTIFIER:
+                refs[node] = self.resolve(node.name, line)
+            elif kind == BINARY_EXPRESSION:
+                stack.append(node.right)
+                stack.append(node.left)
+            elif kind == UNARY_EXPRESSION:
+                stack.append(node.operand)
+
+
+# 测试代码
+if __name__ == '__main__':
+    import time
+    from cifa import Cifa
+    from yufa import Yufa
+
+    source = '''
+    main() {
+        int a = 5;
+        float f;
+        int a;
+        void v;
+        b = a + c;
+        if (a > 0) {
+            int a = a + 1;
+            b = a;
+        } else {
+            c = main;
+        }
+    }
+    '''
+    yuyi = Yuyi()
+    errors = yuyi.check(Yufa().parse(Cifa().cifafenxi(source)))
+    print("错误：", errors)
+    print("警告：", yuyi.warnings)
+    fuhao = yuyi.fuhao
+    print("\n编号\t名字\t类型\t行号\t存储名")
+    for i in range(len(fuhao)):
+        print(f"{i}\t{fuhao.names[i]}\t{fuhao.types[i]}\t{fuhao.lines[i]}\t{fuhao.storage_name(i)}")
+
+    # 端到端：与 Zhongjian 生成的临时变量、标签同名或形如常数的用户变量，以及内层同名变量
+    import random
+    from changliang import Changliang
+    from liutu import Liutu
+    from moni import Moni, run
+    from Mubiao import Mubiao
+    from zhongjian import Zhongjian, bianyi, random_program
+
+    source = '''
+    main() {
+        Total = 0; L1 = 3; T1 = 4; inf = 2;
+        int i = 0;
+        while (i < 5) { int t = i * 2; Total = Total + t + L1 + T1 + inf; i = i + 1; }
+        if (Total > 0) { int Total = 1; x = Total; }
+    }
+    '''
+    yuyi = Yuyi()
+    ast = Yufa().parse(Cifa().cifafenxi(source))
+    before = ast.to_dict()
+    assert not yuyi.check(ast) and ast.to_dict() == before, "语义分析不应改动语法树"
+    quads = Zhongjian(fuhao=yuyi.fuhao).generate(ast)
+    for allocator in ('memory', 'linear'):
+        moni = Moni(Mubiao(quads, allocator, fuhao=yuyi.fuhao).generate())
+        memory = moni.run()
+        assert not moni.undeclared, moni.undeclared
+        assert (memory['Total'], memory['x'], memory['i']) == (65, 1, 5), memory
+    print("\n同名变量：", {name: memory[name] for name in sorted(memory)})
+
+    # 语句体结束后隐式声明的全局变量是另一个变量，读不到已出作用域的局部变量的值
+    for source, expected in (('main() { if (1 > 0) { int x = 100; } y = x; }', 0),
+                             ('main() { i = 0; while (i < 3) { if (i > 0) { int x = 100; } else { x = x + 1; } '
+                              'i = i + 1; } y = x; }', 1)):
+        result = bianyi(source)
+        assert "变量x未声明" in [warning.message for warning in result['warnings']], result['warnings']
+        for allocator in ('memory', 'linear'):
+            assert run(Mubiao(result['quads'], allocator).generate())[2]['y'] == expected, (source, allocator)
+
+    # 随机程序：经符号表编译与不经符号表编译的执行结果相同
+    random.seed(25)
+    for _ in range(200):
+        source = random_program(random)
+        quads = Zhongjian().generate(Yufa().parse(Cifa().cifafenxi(source)))
+        plain = Mubiao(Liutu(Changliang(quads).optimize()).optimize()).generate()
+        assert run(bianyi(source)['asm'])[2] == run(plain)[2], source
+    print("200 个随机程序经符号表编译的执行结果一致")
+
+    # 规模：每条语句都声明或使用变量
+    body = ''.join(f'int x{i} = x{i - 1} * 3 + y;\nif (x{i} > {i}) {{ int t = x{i}; y = y + t; }}\n'
+                   for i in range(1, 20001))
+    ast = Yufa().parse(Cifa().cifafenxi('main() {\nint x0 = 1;\nint y = 0;\n' + body + '}\n'))
+    start = time.perf_counter()
+    yuyi = Yuyi()
+    yuyi.check(ast)
+    cost = time.perf_counter() - start
+    print(f"\n{len(yuyi.fuhao)} 个符号，{len(yuyi.fuhao.storage)} 个存储单元，"
+          f"{len(yuyi.errors)} 个错误，{len(yuyi.warnings)} 个警告：{cost * 1000:.1f} ms")
@@ -0,0 +1,304 @@
+import time
+
+from cifa import Cifa
+from yufa import (Yufa, ASSIGNMENT, BINARY_EXPRESSION, DECLARATION, EXPRESSION_STATEMENT, FUNCTION_DEFINITION,
+                  IDENTIFIER, IF_STATEMENT, NUMBER, UNARY_EXPRESSION, WHILE_STATEMENT, COMPARISON_OPERATORS)
+from yuyi import Yuyi
+from Mubiao import Mubiao
+from liutu import Liutu
+from changliang import Changliang
+
+# 条件为假时跳转，使用取反后的比较运算
+INVERSE_COMPARISON = {'>': '<=', '<': '>=', '>=': '<', '<=': '>', '==': '!=', '!=': '=='}
+
+
+class Zhongjian:
+    """中间代码生成：把 Yufa 的语法树翻译成 Mubiao 使用的 (op, arg1, arg2, result) 四元式
+
+    四元式存放在预先分配的四个平行列表中，容量不足时成倍扩充。
+    前向跳转先以空目标生成，到达目标位置时再回填，因此只需一遍遍历语法树。
+    给出 fuhao（经 Yuyi 分析过的符号表）时，临时变量和标签由符号表分配，不与源程序中的名字重名。
+    """
+
+    def __init__(self, capacity=256, tongji=None, fuhao=None):
+        capacity = max(capacity, 16)
+        # tongji: 可选的 Tongji 统计对象
+        self.tongji = tongji
+        self.fuhao = fuhao
+        self.ops = [None] * capacity
+        self.arg1s = [None] * capacity
+        self.arg2s = [None] * capacity
+        self.results = [None] * capacity
+        self.count = 0
+        self.temp_count = 0
+        self.label_count = 0
+
+    def emit(self, op, arg1, arg2, result):
+        """生成一条四元式，返回其下标"""
+        i = self.count
+        if i == len(self.ops):
+            grow = [None] * i
+            self.ops.extend(grow)
+            self.arg1s.extend(grow)
+            self.arg2s.extend(grow)
+            self.results.extend(grow)
+        self.ops[i] = op
+        self.arg1s[i] = arg1
+        self.arg2s[i] = arg2
+        self.results[i] = result
+        self.count = i + 1
+        return i
+
+    def new_temp(self):
+        if self.fuhao is not None:
+            return self.fuhao.new_temp()
+        self.temp_count += 1
+        return f'T{self.temp_count}'
+
+    def place_label(self, *jumps):
+        """在当前位置放置新标签，并把待回填的跳转指向它"""
+        if self.fuhao is not None:
+            label = self.fuhao.new_label()
+        else:
+            self.label_count += 1
+            label = f'L{self.label_count}'
+        self.emit('label', None, None, label)
+        for j in jumps:
+            if j is not None:
+                self.results[j] = label
+        return label
+
+    def variable(self, node, name):
+        """结点引用的变量在四元式中的名字：有符号表时为语义分析确定的存储名，否则就是源程序中的名字"""
+        if self.fuhao is None:
+            return name
+        return self.fuhao.resolved(node)
+
+    def quads(self):
+        return list(zip(self.ops[:self.count], self.arg1s[:self.count],
+                        self.arg2s[:self.count], self.results[:self.count]))
+
+    def generate(self, program):
+        """翻译整个程序，返回四元式列表"""
+        if self.tongji is None:
+            return self._generate(program)
+        with self.tongji.phase('zhongjian'):
+            quads = self._generate(program)
+        self.tongji.quads(quads)
+        return quads
+
+    def _generate(self, program):
+        self.emit('program', None, None, 'start')
+        # 工作栈：('stmt', 结点) 为待翻译的语句，其余为语句翻译完一部分后的收尾动作
+        work = [('stmt', node) for node in reversed(program.body)]
+        while work:
+            action, node, *extra = work.pop()
+            if action == 'stmt':
+                if node is None:
+                    continue
+                kind = node.kind
+                if kind == FUNCTION_DEFINITION:
+                    work.extend(('stmt', child) for child in reversed(node.body or ()))
+                elif kind == ASSIGNMENT:
+                    value = self.expression(node.value)
+                    self.emit('=', value, None, self.variable(node, node.target))
+                elif kind == DECLARATION:
+                    # 不带初值的声明不生成代码
+                    if node.value is not None:
+                        value = self.expression(node.value)
+                        self.emit('=', value, None, self.variable(node, node.name))
+                elif kind == EXPRESSION_STATEMENT:
+                    if node.expression is not None:
+                        self.expression(node.expression)
+                elif kind == IF_STATEMENT:
+                    false_jump = self.condition(node.condition)
+                    work.append(('else', node, false_jump))
+                    work.extend(('stmt', child) for child in reversed(node.body or ()))
+                elif kind == WHILE_STATEMENT:
+                    begin = self.place_label()
+                    false_jump = self.condition(node.condition)
+                    work.append(('loop', begin, false_jump))
+                    work.extend(('stmt', child) for child in reversed(node.body or ()))
+            elif action == 'else':
+                false_jump = extra[0]
+                if node.else_body is None:
+                    self.place_label(false_jump)
+                else:
+                    end_jump = self.emit('goto', None, None, None)
+                    self.place_label(false_jump)
+                    work.append(('end', None, end_jump))
+                    work.extend(('stmt', child) for child in reversed(node.else_body))
+            elif action == 'end':
+                self.place_label(extra[0])
+            elif action == 'loop':
+                self.emit('goto', None, None, node)
+                self.place_label(extra[0])
+        self.emit('program', None, None, 'end')
+        return self.quads()
+
+    def condition(self, cond):
+        """翻译条件，生成条件为假时的跳转，返回待回填的下标"""
+        left = self.expression(cond.left)
+        right = self.expression(cond.right)
+        return self.emit('if' + INVERSE_COMPARISON[cond.operator], left, right, None)
+
+    def expression(self, root):
+        """后序遍历表达式树（非递归），返回保存结果的操作数"""
+        values = []
+        stack = [(root, False)]
+        while stack:
+            node, visited = stack.pop()
+            kind = node.kind
+            if kind == NUMBER:
+                values.append(node.value)
+            elif kind == IDENTIFIER:
+                values.append(self.variable(node, node.name))
+            elif not visited:
+                stack.append((node, True))
+                if kind == BINARY_EXPRESSION:
+                    stack.append((node.right, False))
+                    stack.append((node.left, False))
+                else:
+                    stack.append((node.operand, False))
+            elif kind == BINARY_EXPRESSION:
+                right = values.pop()
+                left = values.pop()
+                temp = self.new_temp()
+                if node.operator in COMPARISON_OPERATORS:
+                    # 比较运算的值：成立为1，否则为0
+                    self.emit('=', '1', None, temp)
+                    jump = self.emit('if' + node.operator, left, right, None)
+                    self.emit('=', '0', None, temp)
+                    self.place_label(jump)
+                else:
+                    self.emit(node.operator, left, right, temp)
+                values.append(temp)
+            elif kind == UNARY_EXPRESSION:
+                operand = values.pop()
+                temp = self.new_temp()
+                if node.operator == '-':
+                    self.emit('-', '0', operand, temp)
+                else:
+                    self.emit('=', '1', None, temp)
+                    jump = self.emit('if==', operand, '0', None)
+                    self.emit('=', '0', None, temp)
+                    self.place_label(jump)
+                values.append(temp)
+        return values.pop()
+
+
+def random_program(rng, depth=3):
+    """生成随机的合法程序（赋值、if-else、计数有界的while），用于各优化阶段的等价性检查"""
+    names = [f'v{i}' for i in range(rng.randint(1, 30))]
+    loops = iter(range(10 ** 9))
+
+    def expression(depth):
+        if depth == 0 or rng.random() < 0.3:
+            return rng.choice(names) if rng.random() < 0.6 else str(rng.randint(0, 9))
+        op = rng.choice(['+', '-', '*', '&', '|', '>', '<', '=='])
+        return f'({expression(depth - 1)} {op} {expression(depth - 1)})'
+
+    def statements(depth, count):
+        out = []
+        for _ in range(count):
+            r = rng.random()
+            if depth and r < 0.2:
+                out.append(f'if ({expression(2)} > {expression(2)}) '
+                           f'{{ {statements(depth - 1, 3)} }} else {{ {statements(depth - 1, 2)} }}')
+            elif depth and r < 0.3:
+                counter = f'c{next(loops)}'
+                out.append(f'{counter} = 0; while ({counter} < {rng.randint(1, 4)}) '
+                           f'{{ {statements(depth - 1, 3)} {counter} = {counter} + 1; }}')
+            else:
+                out.append(f'{rng.choice(names)} = {expression(3)};')
+        return ' '.join(out)
+
+    return 'main() { ' + statements(depth, rng.randint(1, 12)) + ' }'
+
+
+def bianyi(source, tongji=None):
+    """端到端编译：源程序 → 单词 → 语法树 → 语义分析 → 四元式 → 常量传播 → 删除死代码 → MIPS，
+    并记录各阶段耗时（毫秒）
+
+    有语法错误或语义错误时不生成代码；未声明变量等警告在 warnings 中。
+    tongji 为可选的 Tongji 统计对象，传给各阶段。
+    """
+    timings = {}
+    start = time.perf_counter()
+    # TokenBuffer 记录单词的偏移，语法错误的诊断信息因此带有出错位置
+    tokens = Cifa(tongji=tongji).cifafenxi_buffer(source)
+    timings['cifa'] = (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    ast = Yufa(tongji=tongji).parse(tokens)
+    timings['yufa'] = (time.perf_counter() - start) * 1000
+
+    quads = []
+    asm = ''
+    errors = ast.errors
+    warnings = []
+    if not errors:
+        # 符号表从语义分析一直用到目标代码生成
+        start = time.perf_counter()
+        yuyi = Yuyi(tongji=tongji)
+        errors = yuyi.check(ast)
+        warnings = yuyi.warnings
+        fuhao = yuyi.fuhao
+        timings['yuyi'] = (time.perf_counter() - start) * 1000
+
+    if not errors:
+        start = time.perf_counter()
+        quads = Zhongjian(len(tokens) * 2, tongji, fuhao).generate(ast)
+        timings['zhongjian'] = (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        quads = Changliang(quads, fuhao).optimize()
+        timings['changliang'] = (time.perf_counter() - start) * 1000
+
+        # 死代码删除要在 Mubiao 之前，否则无用的临时变量也会占用寄存器
+        start = time.perf_counter()
+        quads = Liutu(quads, fuhao).optimize()
+        timings['liutu'] = (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        asm = Mubiao(quads, tongji=tongji, fuhao=fuhao).generate()
+        timings['mubiao'] = (time.perf_counter() - start) * 1000
+
+    return {'tokens': tokens, 'ast': ast, 'quads': quads, 'asm': asm,
+            'errors': errors, 'warnings': warnings, 'timings': timings}
+
+
+# 测试代码
+if __name__ == '__main__':
+    source = '''
+    main() {
+        int a = 5;
+        if (a > 0) {
+            a = a + 1;
+        } else {
+            a = a - 1;
+        }
+        while (a < 10) {
+            a = a * 2 + (a - 3) % 4;
+        }
+    }
+    '''
+    result = bianyi(source)
+    print("四元式：")
+    for i, quad in enumerate(result['quads']):
+        print(f'{i:4d}  {quad}')
+    print("\n生成的MIPS汇编代码：")
+    print(result['asm'])
+
+    print("\n阶段\t\t耗时(ms)")
+    for stage, ms in result['timings'].items():
+        print(f'{stage}\t\t{ms:.3f}')
+
+    # 大规模输入：各阶段耗时
+    body = ''.join(f'x{i} = x{i - 1} * 3 + {i} % 7;\nif (x{i} > {i}) {{ y = y + x{i}; }} else {{ y = y - 1; }}\n'
+                   for i in range(1, 5001))
+    result = bianyi('main() {\nx0 = 1;\ny = 0;\n' + body + '}\n')
+    print(f"\n{len(result['tokens'])} 个单词，{len(result['quads'])} 条四元式，"
+          f"{result['asm'].count(chr(10)) + 1} 行汇编")
+    for stage, ms in result['timings'].items():
+        print(f'{stage}\t\t{ms:.1f}')